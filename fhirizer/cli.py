@@ -1,8 +1,7 @@
 import sys
 import os
 import json
-from gen3_tracker.common import ERROR_COLOR, INFO_COLOR
-from fhirizer import utils, mapping, entity2fhir, icgc2fhir, htan2fhir
+from fhirizer import utils, mapping
 import click
 from pathlib import Path
 import importlib.resources
@@ -41,6 +40,13 @@ class NotRequiredIf(click.Option):
             ctx, opts, args)
 
 
+def validate_validation(ctx, param, value):
+    try:
+        utils.ResourceValidation(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return value
+
 
 @click.group()
 def cli():
@@ -118,6 +124,7 @@ def file_init(field_path, out_path):
               show_default=True,
               help='Directory path to save generated resources')
 def resource(name, path, out_dir):
+    from fhirizer import entity2fhir
     assert Path(path).is_file(), f"Path {path} is not a valid file path."
     assert Path(out_dir).is_dir(), f"Path {out_dir} is not a valid directory path."
 
@@ -136,15 +143,44 @@ def resource(name, path, out_dir):
 @click.option('--out_path', required=False,
               show_default=True,
               help='Path to save mapped result')
+@click.option('--stream', is_flag=True, required=False,
+              default=False,
+              show_default=True,
+              help='Map and write one entity at a time with constant memory. Accepts .gz input.')
+@click.option('--workers', required=False,
+              default=1,
+              show_default=True,
+              type=click.IntRange(min=1),
+              help='Number of worker processes mapping entities. Output keeps the input order.')
 @click.option('--verbose', is_flag=True, required=False,
               default=False,
               show_default=True)
-def convert(name, in_path, out_path, verbose):
+def convert(name, in_path, out_path, stream, workers, verbose):
     name_list = ['project', 'case', 'file', 'cellosaurus', 'icgc']
     assert name in ['project', 'case', 'file', 'cellosaurus', 'icgc'], f'--name is not in {name_list}.'
     assert Path(in_path).is_file(), f"Path {in_path} is not a valid file path."
 
-    mapping.convert_maps(name=name, in_path=in_path, out_path=out_path, convert=True, verbose=verbose)
+    if stream:
+        assert out_path, "--out_path is required with --stream."
+        mapping.stream_convert_maps(name=name, in_path=in_path, out_path=out_path, verbose=verbose, workers=workers)
+    else:
+        mapping.convert_maps(name=name, in_path=in_path, out_path=out_path, convert=True, verbose=verbose,
+                             workers=workers)
+
+
+@cli.command('compile')
+@click.option('--name', required=True,
+              default='case',
+              show_default=True,
+              help='project, case, or file GDC entity name of the mapping schema to compile')
+def compile_mapping(name):
+    """Compiles a GDC entity mapping schema into the flat mapping plan used by convert and generate. Plans are
+    recompiled automatically when the schema json changes."""
+    name_list = ['project', 'case', 'file']
+    assert name in name_list, f'--name is not in {name_list}.'
+
+    plan = mapping.get_mapping_plan(name, recompile=True)
+    print(f"Compiled {len(plan['mappings'])} {name} Maps with schema hash {plan['schema_hash']}.")
 
 
 @cli.command('generate')
@@ -167,27 +203,73 @@ def convert(name, in_path, out_path, verbose):
 @click.option('--has_files', is_flag=True, help='Boolean indicating file metatda via new argo site is available @ '
                                                 'ICGC/{project}/data directory to FHIRize.')
 @click.option('--convert', is_flag=True, help='Boolean indicating to write converted keys to directory')
+@click.option('--workers', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Number of worker processes mapping GDC case or file keys, and transforming cases into FHIR '
+                   'ndjson shards merged into META.')
+@click.option('--validation', default='full', show_default=True, callback=validate_validation,
+              help='Validation of GDC case, file, cellosaurus, or HTAN FHIR resources: full, sample:<rate> ex. '
+                   'sample:0.1 to validate a deterministic sample, or none to build trusted re-runs without '
+                   'validation. ICGC resources are always validated.')
+@click.option('--stream', is_flag=True, default=False,
+              help='Transform and write GDC cases one at a time, or GDC files in chunks, with constant memory. '
+                   'Accepts .gz input.')
+@click.option('--id_index', required=False,
+              help='With --stream, path of an on-disk sqlite index of written case resource ids for runs with more '
+                   'ids than fit in memory.')
+@click.option('--compression', default='none', show_default=True, type=click.Choice(['none', 'gzip', 'zstd']),
+              help='Compression of the FHIR ndjson files ex. gzip writes <Type>.ndjson.gz. zstd requires python >= '
+                   '3.14 or the zstandard package.')
+@click.option('--compression_level', required=False, type=int,
+              help='Compression level, defaults to 6 for gzip and 3 for zstd.')
+@click.option('--max_file_mb', required=False, type=click.IntRange(min=1),
+              help='Roll FHIR ndjson files over to <Type>.part-0001.ndjson, <Type>.part-0002.ndjson ... once a file '
+                   'reaches this many MiB uncompressed.')
+@click.option('--index', is_flag=True, default=False,
+              help='Write the companion <Type>.ndjson.idx id index of uncompressed FHIR ndjson files, for NDJSONReader '
+                   'lookups by id without indexing on open.')
 @click.option('--verbose', is_flag=True)
-def generate(name, out_dir, entity_path, icgc, has_files, atlas, convert, verbose):
+def generate(name, out_dir, entity_path, icgc, has_files, atlas, convert, workers, validation, stream, id_index,
+             compression, compression_level, max_file_mb, index, verbose):
     name_list = ['case', 'file', 'cellosaurus', 'icgc', 'htan']
     assert name in name_list, f'--name is not in {name_list}.'
+    if name == 'icgc' and validation != 'full':
+        raise click.UsageError("--validation is not supported for --name icgc, its resources are validated as they "
+                               "are built.")
     if name != 'htan':
         assert Path(out_dir).is_dir(), f"Path {out_dir} is not a valid directory path."
         assert Path(entity_path).is_file(), f"Path {entity_path} is not a valid file path."
     else:
         assert Path("./projects/HTAN").is_dir()
 
+    utils.configure_ndjson_output(compression=None if compression == 'none' else compression,
+                                  compression_level=compression_level,
+                                  max_bytes=max_file_mb * 2 ** 20 if max_file_mb else None,
+                                  index=index)
+
+    # transformers and their reference resources are imported by the generate command only
+    from fhirizer import entity2fhir, icgc2fhir, htan2fhir
+
     spinner = Halo(text="🔥 Transforming data", spinner='dots', placement='right', color='white')
 
-    if name in 'case':
+    if name in 'case' and stream:
+        spinner.start()
+        entity2fhir.stream_case_gdc_to_fhir_ndjson(out_dir=out_dir, name=name, cases_path=entity_path, convert=convert,
+                                                   verbose=verbose, spinner=spinner, workers=workers,
+                                                   validation=validation, id_index=id_index)
+    elif name in 'case':
         spinner.start()
-        entity2fhir.case_gdc_to_fhir_ndjson(out_dir=out_dir, name=name, cases_path=entity_path, convert=convert, verbose=verbose, spinner=spinner)
-    if name in 'file':
+        entity2fhir.case_gdc_to_fhir_ndjson(out_dir=out_dir, name=name, cases_path=entity_path, convert=convert, verbose=verbose, spinner=spinner, workers=workers, validation=validation)
+    if name in 'file' and stream:
         spinner.start()
-        entity2fhir.file_gdc_to_fhir_ndjson(out_dir=out_dir, name=name, files_path=entity_path, convert=convert, verbose=verbose, spinner=spinner)
+        entity2fhir.stream_file_gdc_to_fhir_ndjson(out_dir=out_dir, name=name, files_path=entity_path, convert=convert,
+                                                   verbose=verbose, spinner=spinner, workers=workers,
+                                                   validation=validation)
+    elif name in 'file':
+        spinner.start()
+        entity2fhir.file_gdc_to_fhir_ndjson(out_dir=out_dir, name=name, files_path=entity_path, convert=convert, verbose=verbose, spinner=spinner, workers=workers, validation=validation)
     if name in 'cellosaurus':
         spinner.start()
-        entity2fhir.cellosaurus2fhir(out_dir=out_dir, path=entity_path, spinner=spinner)
+        entity2fhir.cellosaurus2fhir(out_dir=out_dir, path=entity_path, spinner=spinner, validation=validation)
     if name in 'icgc' and icgc:
         icgc2fhir.icgc2fhir(project_name=icgc, has_files=has_files)
     if name in 'htan':
@@ -200,7 +282,7 @@ def generate(name, out_dir, entity_path, icgc, has_files, atlas, convert, verbos
                 atlas = [atlas]
 
         spinner.start()
-        htan2fhir.htan2fhir(entity_atlas_name=atlas, verbose=verbose, spinner=spinner)
+        htan2fhir.htan2fhir(entity_atlas_name=atlas, verbose=verbose, spinner=spinner, validation=validation)
 
 
 
@@ -212,6 +294,7 @@ def generate(name, out_dir, entity_path, icgc, has_files, atlas, convert, verbos
 def validate(debug: bool, path):
     """Validate the output FHIR ndjson files."""
     from gen3_tracker.git import run_command
+    from gen3_tracker.common import ERROR_COLOR, INFO_COLOR
 
     if not path:
         path = str(Path(importlib.resources.files('cda2fhir').parent / 'data' / 'META'))
@@ -235,6 +318,29 @@ def validate(debug: bool, path):
             raise
 
 
+@cli.command('compact')
+@click.option("-p", '--path', required=True,
+              default='./META',
+              show_default=True,
+              help='Directory path to META folder.')
+@click.option('--name', required=False,
+              help='Resource type of the ndjson file to compact ex. Observation, with its rolled over or compressed '
+                   'parts. Defaults to every ndjson file with a .idx id index.')
+def compact(path, name):
+    """Removes resources superseded by appended updates from META ndjson files extended in append mode."""
+    assert Path(path).is_dir(), f"Path {path} is not a valid directory path."
+
+    if name:
+        ndjson_paths = [Path(path) / f"{name}.ndjson"]
+        assert utils.ndjson_paths(ndjson_paths[0]), f"Path {ndjson_paths[0]} has no ndjson file or parts."
+    else:
+        ndjson_paths = sorted(p for p in Path(path).glob("*.ndjson") if Path(f"{p}.idx").exists())
+
+    for ndjson_path in ndjson_paths:
+        removed = utils.compact_ndjson(ndjson_path)
+        print(f"Compacted {ndjson_path.name}: {removed} superseded resources removed.")
+
+
 @cli.command('study_group')
 @click.option("-p", '--path', required=True,
               default='./META',
@@ -0,0 +1,101 @@
+import os
+import gzip
+import json
+import hashlib
+from pathlib import Path
+from fhirizer import utils
+
+NCIT2MONDO_PATH = utils.package_dir / 'resources' / 'ncit2mondo.json.gz'
+
+# crosswalks loaded in this process keyed by source path
+_crosswalks = {}
+
+
+class Crosswalk:
+    """
+    One-to-many crosswalk of ontology ids ex. NCIt -> MONDO, keyed by source id.
+    Target ids are kept in the order of the source records.
+
+    ex. records [{'ncit_id': 'C1', 'mondo_id': 'MONDO_1'}, {'ncit_id': 'C1', 'mondo_id': 'MONDO_2'}]
+    get('C1') -> ['MONDO_1', 'MONDO_2']
+    """
+
+    def __init__(self, targets, source_hash=None):
+        self.targets = targets
+        self.source_hash = source_hash
+
+    @classmethod
+    def from_records(cls, records, source_key, target_key, source_hash=None):
+        targets = {}
+        for record in records:
+            targets.setdefault(record[source_key], []).append(record[target_key])
+        return cls(targets, source_hash=source_hash)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __contains__(self, source_id):
+        return source_id in self.targets
+
+    def get(self, source_id) -> list:
+        """Target ids of a source id, empty if it has no crosswalk."""
+        return self.targets.get(source_id, [])
+
+    def batch(self, source_ids) -> dict:
+        """Target ids of each source id ex. {'C1': ['MONDO_1', 'MONDO_2'], 'C2': []}"""
+        return {source_id: self.get(source_id) for source_id in source_ids}
+
+
+def source_signature(path) -> str:
+    """
+    Hash of a source file's size and modification time, changes when the file is rewritten without reading it.
+
+    :param path: Path to the source file
+    :return: sha256 hex digest
+    """
+    stat = os.stat(path)
+    return hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()
+
+
+def load_crosswalk(path, source_key, target_key, rebuild=False) -> Crosswalk:
+    """
+    Loads a json or json.gz list of source -> target id records into a Crosswalk.
+    The Crosswalk is cached in binary form in utils.cache_dir ex. ncit2mondo-1a2b3c4d5e6f7a8b.crosswalk.pickle
+    and rebuilt when it doesn't exist or the source file's size or modification time has changed.
+
+    :param path: Path to json or json.gz list of records
+    :param source_key: Record key of source ids ex. ncit_id
+    :param target_key: Record key of target ids ex. mondo_id
+    :param rebuild: Boolean to force rebuilding the Crosswalk from the source file
+    :return: Crosswalk
+    """
+    path = Path(path)
+    source_hash = source_signature(path)
+
+    crosswalk = _crosswalks.get(path)
+    if not rebuild and crosswalk and crosswalk.source_hash == source_hash:
+        return crosswalk
+
+    cache_path = utils.cache_path(path, ".crosswalk.pickle")
+    crosswalk = None if rebuild else utils.read_cache(cache_path)
+
+    if not isinstance(crosswalk, Crosswalk) or crosswalk.source_hash != source_hash:
+        with open(path, "rb") as f:
+            source = f.read()
+        records = json.loads(gzip.decompress(source) if path.suffix == ".gz" else source)
+        crosswalk = Crosswalk.from_records(records, source_key, target_key, source_hash=source_hash)
+        utils.write_cache(cache_path, crosswalk)
+
+    _crosswalks[path] = crosswalk
+    return crosswalk
+
+
+def load_ncit2mondo(path=NCIT2MONDO_PATH, rebuild=False) -> Crosswalk:
+    """
+    Loads the NCIt -> MONDO crosswalk of resources/ncit2mondo.json.gz
+
+    :param path: Path to ncit2mondo json.gz records
+    :param rebuild: Boolean to force rebuilding the Crosswalk from the source file
+    :return: Crosswalk of NCIt ids to MONDO ids
+    """
+    return load_crosswalk(path, source_key="ncit_id", target_key="mondo_id", rebuild=rebuild)
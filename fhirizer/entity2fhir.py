@@ -1,8 +1,7 @@
 import os
 import re
+import itertools
 import uuid
-import json
-import copy
 import orjson
 from iteration_utilities import unique_everseen  # unresolved in pycharm - ok in pip freeze and ipython import
 from fhir.resources.identifier import Identifier
@@ -28,43 +27,48 @@ from fhir.resources.documentreference import DocumentReference, DocumentReferenc
     DocumentReferenceContentProfile
 from fhir.resources.attachment import Attachment
 from fhir.resources.age import Age
-from fhirizer import utils, mapping
+from fhirizer import utils, mapping, crosswalk
 from datetime import datetime
-import icd10
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import importlib.resources
 from pathlib import Path
 from uuid import uuid3, NAMESPACE_DNS
 
-disease_types = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'case' / 'disease_types.json')))
-primary_sites = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'case' / 'primary_sites.json')))
-race = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'demographic' / 'race.json')))
-ethnicity = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'demographic' / 'ethnicity.json')))
-gender = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'demographic' / 'gender.json')))
-data_dict = utils.load_data_dictionary(path=utils.DATA_DICT_PATH)
-cancer_pathological_staging = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'diagnosis' / 'cancer_pathological_staging.json')))
-ncit2mondo = utils.ncit2mondo(
-    str(Path(importlib.resources.files('fhirizer').parent / 'resources' / 'ncit2mondo.json.gz')))
-biospecimen_observation = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'biospecimen' / 'biospecimen_observation.json')))
-biospecimen_imaging_observation = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'biospecimen' / 'biospecimen_imaging_observation.json')))
-social_histody_smoking_observation = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'case' / 'social_history_smoking_observations.json')))
-social_histody_alcohol_observation = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'case' / 'social_history_alcohol_observations.json')))
-aliquot = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'biospecimen' / 'aliquot.json')))
-file_observation = utils._read_json(
-    str(Path(importlib.resources.files('fhirizer').parent / 'resources' / 'gdc_resources'
-             / 'content_annotations' / 'files' / 'output_file_observation.json')))
-diagnosis_survey = utils._read_json(str(Path(importlib.resources.files(
-    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'case' / 'diagnosis_survey.json')))
+GDC_CONTENT_ANNOTATIONS_PATH = Path(importlib.resources.files(
+    'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations')
+
+# Reference resources are loaded on first access and cached for the process, ex. resources.gender_index
+resources = utils.LazyResources()
+for _name, _annotation in [('disease_types', 'case/disease_types'), ('primary_sites', 'case/primary_sites'),
+                           ('race', 'demographic/race'), ('ethnicity', 'demographic/ethnicity'),
+                           ('gender', 'demographic/gender'),
+                           ('cancer_pathological_staging', 'diagnosis/cancer_pathological_staging')]:
+    resources.register(f"{_name}_index", lambda _annotation=_annotation: utils.load_content_annotation_index(_annotation))
+    resources.register(_name, lambda _name=_name: getattr(resources, f"{_name}_index").annotations)
+resources.register('data_dict', utils.get_data_dictionary)
+resources.register('ncit2mondo', crosswalk.load_ncit2mondo)
+resources.register('icd10', lambda: importlib.import_module('icd10'))
+for _name, _path in [('biospecimen_observation', 'biospecimen/biospecimen_observation.json'),
+                     ('biospecimen_imaging_observation', 'biospecimen/biospecimen_imaging_observation.json'),
+                     ('social_histody_smoking_observation', 'case/social_history_smoking_observations.json'),
+                     ('social_histody_alcohol_observation', 'case/social_history_alcohol_observations.json'),
+                     ('aliquot', 'biospecimen/aliquot.json'),
+                     ('file_observation', 'files/output_file_observation.json'),
+                     ('diagnosis_survey', 'case/diagnosis_survey.json')]:
+    resources.register(_name, lambda _path=_path: utils._read_json(str(GDC_CONTENT_ANNOTATIONS_PATH / _path)))
+
+# Observation templates built fresh for every derived Observation
+for _name in ['biospecimen_observation', 'biospecimen_imaging_observation', 'social_histody_smoking_observation',
+              'social_histody_alcohol_observation', 'diagnosis_survey', 'file_observation']:
+    resources.register(f"{_name}_template", lambda _name=_name: utils.JSONTemplate(getattr(resources, _name)))
+
+
+def __getattr__(name):
+    """Module level access to the lazily loaded resources ex. entity2fhir.data_dict"""
+    if name in resources:
+        return getattr(resources, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def create_researchstudy(project_data) -> tuple[ResearchStudy | None]:
@@ -96,22 +100,21 @@ def create_researchstudy(project_data) -> tuple[ResearchStudy | None]:
     condition = []
     if 'ResearchStudy.condition' in project_data.keys() and project_data['ResearchStudy.condition']:
         for c in project_data['ResearchStudy.condition']:
-            for d in disease_types:
-                if c in d['value']:
-                    if d['sctid']:
-                        code = None
-                        if not isinstance(d['sctid'], str):
-                            code = str(d['sctid'])
-                            display = str(d['value'])
-                        else:
-                            code = d['sctid']
-                            display = d['value']
+            for d in resources.disease_types_index.find_containing(c):
+                if d['sctid']:
+                    code = None
+                    if not isinstance(d['sctid'], str):
+                        code = str(d['sctid'])
+                        display = str(d['value'])
+                    else:
+                        code = d['sctid']
+                        display = d['value']
 
-                        condition_code = CodeableConcept(**{"coding": [{'system': 'http://snomed.info/sct',
-                                                                        'display': display,
-                                                                        'code': code}]})
-                        if condition_code:
-                            condition.append(condition_code)
+                    condition_code = CodeableConcept(**{"coding": [{'system': 'http://snomed.info/sct',
+                                                                    'display': display,
+                                                                    'code': code}]})
+                    if condition_code:
+                        condition.append(condition_code)
 
     parent_reference = []
     if 'ResearchStudy' in project_data.keys() and project_data['ResearchStudy']:
@@ -129,6 +132,20 @@ def create_researchstudy(project_data) -> tuple[ResearchStudy | None]:
     return rs, _rs_parent  # only two hierarchy in GDC
 
 
+def cached_researchstudy(project_data, research_study_cache) -> tuple[ResearchStudy | None]:
+    """
+    Creates FHIR ResearchStudy and its parent ResearchStudy once per GDC project payload.
+
+    :param project_data: case['ResearchStudy'] mapped project payload
+    :param research_study_cache: dict of the run's created ResearchStudies keyed by project payload
+    :return: ResearchStudy, parent ResearchStudy tuple shared by every case of the project
+    """
+    key = orjson.dumps(project_data, option=orjson.OPT_SORT_KEYS)
+    if key not in research_study_cache:
+        research_study_cache[key] = create_researchstudy(project_data=project_data)
+    return research_study_cache[key]
+
+
 # projects_path="./tests/fixtures/project/project_key.ndjson"
 
 
@@ -176,6 +193,8 @@ def create_imaging_study(slide, patient, sample):
 
 
 def specimen_exists(specimen_id, specimen_list):
+    if isinstance(specimen_list, utils.ResourceList):
+        return specimen_list.has_id(specimen_id)
     return any(specimen.id == specimen_id for specimen in specimen_list)
 
 
@@ -193,20 +212,19 @@ def add_specimen(dat, name, id_key, has_parent, parent, patient, all_fhir_specim
 
 def get_disease_type_snomed_code(disease_text) -> CodeableConcept | None:
     _snomed_coding = None
-    for d in disease_types:
-        if disease_text in d['value']:
-            if d['sctid']:
-                code = None
-                if not isinstance(d['sctid'], str):
-                    code = str(d['sctid'])
-                    display = str(d['value'])
-                else:
-                    code = d['sctid']
-                    display = d['value']
+    for d in resources.disease_types_index.find_containing(disease_text):
+        if d['sctid']:
+            code = None
+            if not isinstance(d['sctid'], str):
+                code = str(d['sctid'])
+                display = str(d['value'])
+            else:
+                code = d['sctid']
+                display = d['value']
 
-                _snomed_coding = CodeableConcept(**{"coding": [{'system': 'http://snomed.info/sct',
-                                                                'display': display,
-                                                                'code': code}]})
+            _snomed_coding = CodeableConcept(**{"coding": [{'system': 'http://snomed.info/sct',
+                                                            'display': display,
+                                                            'code': code}]})
     return _snomed_coding
 
 # Case ---------------------------------------------------------------
@@ -214,8 +232,22 @@ def get_disease_type_snomed_code(disease_text) -> CodeableConcept | None:
 # cases = utils.load_ndjson("./tests/fixtures/case/case_key.ndjson")
 # case = cases[0]
 
-def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primary_sites, data_dict=data_dict,
-                         race=race, ethnicity=ethnicity):
+def assign_fhir_for_case(case, disease_types=None, primary_sites=None, data_dict=None,
+                         race=None, ethnicity=None, research_study_cache=None, validate=True):
+    if research_study_cache is None:
+        research_study_cache = {}
+    if primary_sites is None:
+        primary_sites = resources.primary_sites
+    if data_dict is None:
+        data_dict = resources.data_dict
+    if race is None:
+        race = resources.race
+    if ethnicity is None:
+        ethnicity = resources.ethnicity
+    primary_sites_index = utils.annotation_index(primary_sites)
+    race_index = utils.annotation_index(race)
+    ethnicity_index = utils.annotation_index(ethnicity)
+
     # create patient **
     project_id = "GDC"
     NAMESPACE_GDC = uuid3(NAMESPACE_DNS, 'gdc.cancer.gov')
@@ -251,7 +283,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
 
     if 'demographic' in case.keys() and 'Patient.birthDate' in case['demographic']:
         if case['demographic']['Patient.birthDate']:
-            birth_year_observation = copy.deepcopy(diagnosis_survey)
+            birth_year_observation = resources.diagnosis_survey_template.build()
             birth_year_observation_identifier = Identifier(
                 **{
                     "system": "".join(["https://gdc.cancer.gov/", "year_of_birth"]),
@@ -291,9 +323,8 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
 
     patient_gender = None
     if 'demographic' in case.keys() and 'Patient.gender' in case['demographic']:
-        for g in gender:
-            if g['value'] == case['demographic']['Patient.gender']:
-                patient_gender = g['fhir_display']
+        for g in resources.gender_index.find(case['demographic']['Patient.gender']):
+            patient_gender = g['fhir_display']
 
     patient.gender = patient_gender
 
@@ -316,7 +347,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
     if 'demographic' in case.keys() and 'Patient.deceasedDateTime' in case['demographic']:
         year_of_death = case['demographic']['Patient.deceasedDateTime']
         if year_of_death:
-            year_of_death_observation = copy.deepcopy(diagnosis_survey)
+            year_of_death_observation = resources.diagnosis_survey_template.build()
             year_of_death_identifier = Identifier(
                 **{
                     "system": "".join(["https://gdc.cancer.gov/", "year_of_death"]),
@@ -366,9 +397,8 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
         race_code = ""
         race_display = ""
         race_system = ""
-        for r in race:
-            if r['value'] in case['demographic']['Extension.extension:USCoreRaceExtension'] and re.match(
-                    r"[ \r\n\t\S]+", r['ombCategory-code']):
+        for r in race_index.find_within(case['demographic']['Extension.extension:USCoreRaceExtension']):
+            if re.match(r"[ \r\n\t\S]+", r['ombCategory-code']):
                 race_ext.valueString = str(r['value'])
 
         if race_ext not in race_ethnicity_sex:
@@ -381,9 +411,8 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
         ethnicity_code = ""
         ethnicity_display = ""
         ethnicity_system = ""
-        for e in ethnicity:
-            if e['value'] in case['demographic']['Extension:extension.USCoreEthnicity']:
-                ethnicity_ext.valueString = str(e['value'])
+        for e in ethnicity_index.find_within(case['demographic']['Extension:extension.USCoreEthnicity']):
+            ethnicity_ext.valueString = str(e['value'])
 
         if ethnicity_ext not in race_ethnicity_sex:
             race_ethnicity_sex.append(ethnicity_ext)
@@ -403,7 +432,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
 
     # gdc project for patient
     research_studies = []
-    rs, rs_parent = create_researchstudy(project_data=case['ResearchStudy'])
+    rs, rs_parent = cached_researchstudy(case['ResearchStudy'], research_study_cache)
     research_studies.append(rs)
     research_studies.append(rs_parent)
 
@@ -468,7 +497,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                 project_id=project_id,
                 namespace=NAMESPACE_GDC)
 
-            days_to_death_obervation = copy.deepcopy(diagnosis_survey)
+            days_to_death_obervation = resources.diagnosis_survey_template.build()
             days_to_death_obervation["id"] = observation_days_to_death_id
             days_to_death_obervation["identifier"] = [observation_days_to_death_identifier]
             days_to_death_obervation["code"] = {
@@ -512,7 +541,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                 project_id=project_id,
                 namespace=NAMESPACE_GDC)
 
-            days_to_birth_obervation = copy.deepcopy(diagnosis_survey)
+            days_to_birth_obervation = resources.diagnosis_survey_template.build()
             days_to_birth_obervation["id"] = days_to_birth_id
             days_to_birth_obervation["identifier"] = [days_to_birth_identifier]
             days_to_birth_obervation["code"] = {
@@ -580,7 +609,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
         if 'Condition.coding_icd_10_code' in case['diagnoses']:
             system = "https://terminology.hl7.org/5.1.0/NamingSystem-icd10CM.html"
             code = case['diagnoses']['Condition.coding_icd_10_code']
-            icd10code = icd10.find(case['diagnoses']['Condition.coding_icd_10_code'])
+            icd10code = resources.icd10.find(case['diagnoses']['Condition.coding_icd_10_code'])
             if icd10code:
                 display = icd10code.description
                 icd10_annotation = {'system': system, 'display': display, 'code': code}
@@ -607,7 +636,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                                   "code": ncit_condition_code}
                 condition_codes_list.append(ncit_condition)
 
-                mondo = [d["mondo_id"] for d in ncit2mondo if d["ncit_id"] == ncit_condition_code]
+                mondo = resources.ncit2mondo.get(ncit_condition_code)
                 if mondo:
                     mondo_code = str(mondo[0])
                     mondo_display = ncit_condition_display
@@ -647,7 +676,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                 project_id=project_id,
                 namespace=NAMESPACE_GDC)
 
-            days_to_last_follow_up = copy.deepcopy(diagnosis_survey)
+            days_to_last_follow_up = resources.diagnosis_survey_template.build()
             days_to_last_follow_up["category"][0]["coding"][0]["code"] = "exam"
             days_to_last_follow_up["category"][0]["coding"][0]["display"] = "exam"
             days_to_last_follow_up["id"] = observation_days_to_last_follow_up_id
@@ -691,7 +720,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                 project_id=project_id,
                 namespace=NAMESPACE_GDC)
 
-            days_to_last_known_disease_status_observation = copy.deepcopy(diagnosis_survey)
+            days_to_last_known_disease_status_observation = resources.diagnosis_survey_template.build()
             days_to_last_known_disease_status_observation["category"][0]["coding"][0]["code"] = "exam"
             days_to_last_known_disease_status_observation["category"][0]["coding"][0]["display"] = "exam"
             days_to_last_known_disease_status_observation["id"] = days_to_last_follow_up_id
@@ -733,7 +762,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                 project_id=project_id,
                 namespace=NAMESPACE_GDC)
 
-            days_to_diagnosis_observation = copy.deepcopy(diagnosis_survey)
+            days_to_diagnosis_observation = resources.diagnosis_survey_template.build()
             days_to_diagnosis_observation["category"][0]["coding"][0]["code"] = "exam"
             days_to_diagnosis_observation["category"][0]["coding"][0]["display"] = "exam"
             days_to_diagnosis_observation["id"] = days_to_diagnosis_id
@@ -826,14 +855,14 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
         body_struct = None
         for body_site in case['ResearchStudy']['Condition.bodySite']:
             # print("body_site", body_site)
-            for p in primary_sites:
+            for p in primary_sites_index.find_containing(body_site):
                 if not 'sctid' in p.keys():
                     code = "0000"
                 elif not p['sctid']:
                     code = "0000"
                 else:
                     code = p['sctid']
-                if body_site in p['value'] and 'sctid' in p.keys():
+                if 'sctid' in p.keys():
                     if code == "0000":
                         print(f"Condition body-site code for {body_site} for patient-id: {patient.id} not found.")
                     l_body_site.append({'system': "http://snomed.info/sct", 'display': p['value'], 'code': code})
@@ -904,23 +933,64 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                     sctid_code = "0000"
                     stage_type_sctid_code = "0000"
                     assessment_reference = None
-                    for dict_item in cancer_pathological_staging:
-                        if case['diagnoses'][key] == dict_item['value']:
-                            sctid_code = dict_item['sctid']
-                            stage_type_sctid_code = dict_item['stage_type_sctid']
-
-                            if staging_name in "ajcc_pathologic_stage":
-                                stage_parent_obs_identifier = Identifier(
-                                    **{"system": "".join(["https://gdc.cancer.gov/", "ajcc_pathologic_stage"]),
-                                       "value": f"{patient.identifier[0]}-{condition.identifier[0]}-{dict_item['value']}"})
-                                parent_stage_observation.identifier = [stage_parent_obs_identifier]
-                                parent_stage_observation.id = utils.mint_id(identifier=stage_parent_obs_identifier,
-                                                                            resource_type="Observation",
-                                                                            project_id=project_id,
-                                                                            namespace=NAMESPACE_GDC)
-
-                                assessment_reference = Reference(**{"reference": f"Observation/{parent_stage_observation.id}"})
-                                parent_stage_observation.valueCodeableConcept = {
+                    for dict_item in resources.cancer_pathological_staging_index.find(case['diagnoses'][key]):
+                        sctid_code = dict_item['sctid']
+                        stage_type_sctid_code = dict_item['stage_type_sctid']
+
+                        if staging_name in "ajcc_pathologic_stage":
+                            stage_parent_obs_identifier = Identifier(
+                                **{"system": "".join(["https://gdc.cancer.gov/", "ajcc_pathologic_stage"]),
+                                   "value": f"{patient.identifier[0]}-{condition.identifier[0]}-{dict_item['value']}"})
+                            parent_stage_observation.identifier = [stage_parent_obs_identifier]
+                            parent_stage_observation.id = utils.mint_id(identifier=stage_parent_obs_identifier,
+                                                                        resource_type="Observation",
+                                                                        project_id=project_id,
+                                                                        namespace=NAMESPACE_GDC)
+
+                            assessment_reference = Reference(**{"reference": f"Observation/{parent_stage_observation.id}"})
+                            parent_stage_observation.valueCodeableConcept = {
+                                "coding": [
+                                    {
+                                        "system": "http://snomed.info/sct",
+                                        "code": str(dict_item['sctid']),
+                                        "display": dict_item['sctid_display']
+                                    }
+                                ],
+                                "text": dict_item['value']
+                            }
+                        else:
+                            stage_obs = Observation(**{
+                                "status": "final",
+                                "category": [
+                                    {
+                                        "coding": [
+                                            {
+                                                "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                                                "code": "laboratory",
+                                                "display": "Laboratory"
+                                            }
+                                        ],
+                                        "text": "Laboratory"
+                                    }
+                                ],
+                                "code": {
+                                    "coding": [
+                                        {
+                                            "system": "http://snomed.info/sct",
+                                            "code": dict_item['stage_type_sctid'],
+                                            "display": dict_item['stage_type_display']
+                                        }
+                                    ]
+                                },
+                                "subject": {
+                                    "reference": f"Patient/{patient.id}"
+                                },
+                                "focus": [
+                                    {
+                                        "reference": f"Condition/{condition.id}"
+                                    }
+                                ],
+                                "valueCodeableConcept": {
                                     "coding": [
                                         {
                                             "system": "http://snomed.info/sct",
@@ -930,59 +1000,17 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                                     ],
                                     "text": dict_item['value']
                                 }
-                            else:
-                                stage_obs = Observation(**{
-                                    "status": "final",
-                                    "category": [
-                                        {
-                                            "coding": [
-                                                {
-                                                    "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                                                    "code": "laboratory",
-                                                    "display": "Laboratory"
-                                                }
-                                            ],
-                                            "text": "Laboratory"
-                                        }
-                                    ],
-                                    "code": {
-                                        "coding": [
-                                            {
-                                                "system": "http://snomed.info/sct",
-                                                "code": dict_item['stage_type_sctid'],
-                                                "display": dict_item['stage_type_display']
-                                            }
-                                        ]
-                                    },
-                                    "subject": {
-                                        "reference": f"Patient/{patient.id}"
-                                    },
-                                    "focus": [
-                                        {
-                                            "reference": f"Condition/{condition.id}"
-                                        }
-                                    ],
-                                    "valueCodeableConcept": {
-                                        "coding": [
-                                            {
-                                                "system": "http://snomed.info/sct",
-                                                "code": str(dict_item['sctid']),
-                                                "display": dict_item['sctid_display']
-                                            }
-                                        ],
-                                        "text": dict_item['value']
-                                    }
-                                })
-                                stage_obs_identifier = Identifier(
-                                    **{"system": "".join(["https://gdc.cancer.gov/", "ajcc_pathologic_stage"]),
-                                       "value": f"{patient.identifier[0]}-{condition.identifier[0]}-{dict_item['value']}",
-                                       "use": "official"})
-                                stage_obs.identifier = [stage_obs_identifier]
-                                stage_obs.id = utils.mint_id(identifier=stage_obs_identifier,
-                                                             resource_type="Observation", project_id=project_id,
-                                                             namespace=NAMESPACE_GDC)
-                                assessment_reference = Reference(**{"reference": f"Observation/{stage_obs.id}"})
-                                staging_observations.append(stage_obs)
+                            })
+                            stage_obs_identifier = Identifier(
+                                **{"system": "".join(["https://gdc.cancer.gov/", "ajcc_pathologic_stage"]),
+                                   "value": f"{patient.identifier[0]}-{condition.identifier[0]}-{dict_item['value']}",
+                                   "use": "official"})
+                            stage_obs.identifier = [stage_obs_identifier]
+                            stage_obs.id = utils.mint_id(identifier=stage_obs_identifier,
+                                                         resource_type="Observation", project_id=project_id,
+                                                         namespace=NAMESPACE_GDC)
+                            assessment_reference = Reference(**{"reference": f"Observation/{stage_obs.id}"})
+                            staging_observations.append(stage_obs)
 
                     if not parent_stage_observation.id:
                         stage_parent_obs_identifier = Identifier(
@@ -1238,7 +1266,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
     if 'exposures' in case.keys():
         if 'Observation.patient.pack_years_smoked' in case['exposures'][0] and case['exposures'][0][
             'Observation.patient.pack_years_smoked']:
-            sm_obs = copy.deepcopy(social_histody_smoking_observation)
+            sm_obs = resources.social_histody_smoking_observation_template.build()
             # if 'valueQuantity' in sm_obs.keys():
             #    sm_obs.pop('valueQuantity', None)
 
@@ -1253,11 +1281,11 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
             sm_obs['subject'] = {"reference": "".join(["Patient/", patient.id])}
             sm_obs['focus'] = [{"reference": "".join(["Patient/", patient.id])}]
             sm_obs['valueQuantity']['value'] = int(case['exposures'][0]['Observation.patient.pack_years_smoked'])
-            smoking_observation.append(copy.deepcopy(sm_obs))
+            smoking_observation.append(sm_obs)
 
         if 'Observation.patient.cigarettes_per_day' in case['exposures'][0] and isinstance(
                 case['exposures'][0]['Observation.patient.cigarettes_per_day'], float):
-            sm_pd_obs = copy.deepcopy(social_histody_smoking_observation)
+            sm_pd_obs = resources.social_histody_smoking_observation_template.build()
             if 'valueInteger' in sm_pd_obs.keys():
                 sm_pd_obs.pop('valueInteger', None)
             sm_pd_obs_code = "".join([case['exposures'][0]['Observation.patient.exposure_id'], patient.id,
@@ -1278,7 +1306,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                     }
                 ]
             }
-            smoking_observation.append(copy.deepcopy(sm_pd_obs))
+            smoking_observation.append(sm_pd_obs)
 
     # todo: change to alcohol intensity
     # https://docs.gdc.cancer.gov/Data_Dictionary/viewer/#?view=table-definition-view&id=exposure&anchor=alcohol_intensity
@@ -1286,7 +1314,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
     if 'exposures' in case.keys():
         if 'Observation.patient.alcohol_history' in case['exposures'][0] and case['exposures'][0][
             'Observation.patient.alcohol_history']:
-            al_obs = copy.deepcopy(social_histody_alcohol_observation)
+            al_obs = resources.social_histody_alcohol_observation_template.build()
             al_ob_identifier = Identifier(
                 **{"system": "".join(["https://gdc.cancer.gov/", "exposures.alcohol_history"]),
                    "value": case['exposures'][0]['Observation.patient.exposure_id'],
@@ -1307,16 +1335,16 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
     procedures = []
     if "samples" in case.keys():
         samples = case["samples"]
-        all_samples = []
-        all_portions = []
-        all_analytes = []
-        all_aliquots = []
+        all_samples = utils.ResourceList()
+        all_portions = utils.ResourceList()
+        all_analytes = utils.ResourceList()
+        all_aliquots = utils.ResourceList()
 
-        sample_observations = []
-        portion_observations = []
-        analyte_observations = []
-        aliquot_observations = []
-        slides_observations = []
+        sample_observations = utils.ResourceList()
+        portion_observations = utils.ResourceList()
+        analyte_observations = utils.ResourceList()
+        aliquot_observations = utils.ResourceList()
+        slides_observations = utils.ResourceList()
 
         for sample in samples:
             if 'Specimen.id.sample' in sample.keys() and sample["Specimen.id.sample"]:
@@ -1411,7 +1439,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
 
                 sample_observation = None
                 if sample_observation_components:
-                    sample_observation = copy.deepcopy(biospecimen_observation)
+                    sample_observation = resources.biospecimen_observation_template.build()
                     sample_observation['id'] = utils.mint_id(identifier=specimen_identifier,
                                                              resource_type="Observation",
                                                              project_id=project_id,
@@ -1424,7 +1452,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                     sample_observation['focus'][0] = {"reference": "/".join(["Specimen", specimen.id])}
 
                     if sample_observation not in sample_observations:
-                        sample_observations.append(copy.deepcopy(sample_observation))
+                        sample_observations.append(sample_observation)
 
                 specimen.subject = Reference(**{"reference": "/".join(["Patient", patient.id])})
 
@@ -1499,7 +1527,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
 
                             portions_observation = None
                             if portions_observation_components:
-                                portions_observation = copy.deepcopy(biospecimen_observation)
+                                portions_observation = resources.biospecimen_observation_template.build()
 
                                 portions_observation['id'] = utils.mint_id(identifier=portion_specimen_identifier,
                                                                            resource_type="Observation",
@@ -1515,7 +1543,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                                     "reference": "/".join(["Specimen", portion_specimen.id])}
 
                                 if portions_observation not in portion_observations:
-                                    portion_observations.append(copy.deepcopy(portions_observation))
+                                    portion_observations.append(portions_observation)
 
                             if "slides" in portion.keys():
                                 for slide in portion["slides"]:
@@ -1532,7 +1560,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
 
                                     slides_observation = None
                                     if slides_observation_components:
-                                        slides_observation = copy.deepcopy(biospecimen_imaging_observation)
+                                        slides_observation = resources.biospecimen_imaging_observation_template.build()
 
                                         slides_observation['id'] = utils.mint_id(identifier=Identifier(
                                             **{"system": "".join(["https://gdc.cancer.gov/", "slide_id"]),
@@ -1551,7 +1579,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                                             "reference": "/".join(["ImagingStudy", portion_img_study.id])}
 
                                         if slides_observation not in slides_observations:
-                                            slides_observations.append(copy.deepcopy(slides_observation))
+                                            slides_observations.append(slides_observation)
 
                             if "analytes" in portion.keys():
                                 for analyte in portion["analytes"]:
@@ -1671,7 +1699,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
 
                                         analyte_observation = None
                                         if analyte_observation_components:
-                                            analyte_observation = copy.deepcopy(biospecimen_observation)
+                                            analyte_observation = resources.biospecimen_observation_template.build()
                                             analyte_observation['id'] = utils.mint_id(
                                                 identifier=analyte_specimen_identifier,
                                                 resource_type="Observation",
@@ -1688,7 +1716,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                                                 "reference": "/".join(["Specimen", analyte_specimen.id])}
 
                                             if analyte_observation not in analyte_observations:
-                                                analyte_observations.append(copy.deepcopy(analyte_observation))
+                                                analyte_observations.append(analyte_observation)
 
                                         if "aliquots" in analyte.keys():
                                             for aliquot in analyte["aliquots"]:
@@ -1849,7 +1877,7 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
 
                                                 aliquot_observation = None
                                                 if aliquot_observation_components:
-                                                    aliquot_observation = copy.deepcopy(biospecimen_observation)
+                                                    aliquot_observation = resources.biospecimen_observation_template.build()
                                                     aliquot_observation['id'] = utils.mint_id(
                                                         identifier=aliquot_specimen_identifier,
                                                         resource_type="Observation",
@@ -1866,21 +1894,22 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
                                                         "reference": "/".join(["Specimen", aliquot_specimen.id])}
 
                                                     if aliquot_observation not in aliquot_observations:
-                                                        aliquot_observations.append(copy.deepcopy(aliquot_observation))
+                                                        aliquot_observations.append(aliquot_observation)
 
         sample_list = all_samples + all_portions + all_aliquots + all_analytes
         specimen_observations = sample_observations + portion_observations + slides_observations + analyte_observations + aliquot_observations
 
     def combine_observations(*observation_lists):
         """
-        combines multiple lists of observations in a valid FHIR Observation object using model_validate.
+        combines multiple lists of observations in a valid FHIR Observation object using model_validate, or
+        model_construct when the caller validates the written Observations.
         """
         combined = []
         for obs_list in observation_lists:
             for obs in obs_list:
                 if isinstance(obs, dict):
                     try:
-                        validated_obs = Observation.model_validate(obs)
+                        validated_obs = Observation.model_validate(obs) if validate else Observation.model_construct(**obs)
                         combined.append(validated_obs)
                     except Exception as e:
                         print(f"Failed to validate observation: {obs}, Error: {e}")
@@ -1905,24 +1934,36 @@ def assign_fhir_for_case(case, disease_types=disease_types, primary_sites=primar
             "med": treatments_med, "body_structure": body_structure}
 
 
-def case_gdc_to_fhir_ndjson(out_dir, name, cases_path, convert, verbose, spinner=None):
-    # cases = utils.load_ndjson(cases_path)
-    out_path = os.path.join(out_dir, os.pardir, "".join([name, "_keys.ndjson"])) if convert else None
-    cases = mapping.convert_maps(in_path=cases_path, out_path=out_path, name=name, convert=convert, verbose=verbose)
+# case resource types written to <Type>.ndjson, in writing order. Patients are not deduplicated by id.
+CASE_RESOURCE_TYPES = ["Specimen", "Patient", "Encounter", "Observation", "Condition", "ResearchSubject",
+                       "ResearchStudy", "ImagingStudy", "Procedure", "BodyStructure", "MedicationAdministration",
+                       "Medication"]
+CASE_SHARD_SIZE = 100
 
-    all_fhir_case_obj = []
-    [all_fhir_case_obj.append(assign_fhir_for_case(c)) for c in cases]
 
-    def deduplicate_entities(_entities):
-        return list({v['id']: v for v in _entities}.values())
+def deduplicate_entities(_entities):
+    return list({v['id']: v for v in _entities}.values())
+
+
+def case_resources(all_fhir_case_obj) -> dict:
+    """
+    Dumps the FHIR objects of assign_fhir_for_case results to resource dicts deduplicated by id.
+
+    :param all_fhir_case_obj: list of assign_fhir_for_case results
+    :return: dict of resource type to list of resource dicts, in CASE_RESOURCE_TYPES order
+    """
 
     def load_list_entities(_all_fhir_case_obj, _key):
         entity_list = []
+        dumped = set()
         for fhir_case in _all_fhir_case_obj:
             if fhir_case[_key]:
                 for entity in fhir_case[_key]:
-                    if entity:
-                        e = orjson.loads(entity.model_dump_json())
+                    # shared objects, ex. cached ResearchStudies, are dumped once
+                    if entity and id(entity) not in dumped:
+                        dumped.add(id(entity))
+                        # Observations built with model_construct keep nested elements as dicts
+                        e = orjson.loads(entity.model_dump_json(warnings=False))
                         entity_list.append(e)
         return deduplicate_entities(entity_list)
 
@@ -1949,9 +1990,7 @@ def case_gdc_to_fhir_ndjson(out_dir, name, cases_path, convert, verbose, spinner
     med_admins = load_list_entities(all_fhir_case_obj, "med_admin")
     meds = load_list_entities(all_fhir_case_obj, "med")
 
-    out_dir = out_dir if out_dir.endswith("/") else f"{out_dir}/"
-
-    entity_map = {
+    return {
         "Specimen": specimens,
         "Patient": patients,
         "Encounter": encounters,
@@ -1966,34 +2005,218 @@ def case_gdc_to_fhir_ndjson(out_dir, name, cases_path, convert, verbose, spinner
         "Medication": meds,
     }
 
+
+def _case_shard(task):
+    """
+    Worker process mapping and transforming a chunk of GDC cases, writing its finalized resources and, with convert,
+    mapped keys to <Type>.part-<shard>.ndjson files. Resources failing validation are written as {"id": ...} so the
+    merge drops them.
+    """
+    cases, shard, shard_dir, validation, convert, verbose = task
+    research_study_cache = {}
+    validation = utils.ResourceValidation(validation)
+    cases = mapping._map_chunk(cases, verbose)
+
+    if convert:
+        with utils.NDJSONWriter(utils.shard_path(shard_dir, "keys", shard), ensure_ascii=True) as keys_writer:
+            for case in cases:
+                keys_writer.write(case)
+
+    all_fhir_case_obj = [assign_fhir_for_case(c, research_study_cache=research_study_cache, validate=False)
+                         for c in cases]
+
+    for entity_name, entities in case_resources(all_fhir_case_obj).items():
+        if entities:
+            with utils.NDJSONWriter(utils.shard_path(shard_dir, entity_name, shard)) as writer:
+                for resource, cleaned in utils.finalize_resources(entities, resource_type=entity_name,
+                                                                  validation=validation):
+                    if cleaned is not None:
+                        writer.write(cleaned)
+                    elif entity_name != "Patient":
+                        writer.write({"id": resource['id']})
+    return validation.checked, validation.total
+
+
+def stream_case_gdc_to_fhir_ndjson(out_dir, name, cases_path, convert, verbose, spinner=None, workers=1,
+                                   validation="full", id_index=None):
+    """
+    Streaming case_gdc_to_fhir_ndjson - maps, transforms, and finalizes one GDC case at a time, writing its resources
+    to per type ndjson writers right away, so memory stays constant with cohort size.
+    Resources are deduplicated across cases as in a serial run, each id keeping its first position and latest
+    resource: a compact IdSet of written ids finds the repeated ids, whose files are compacted with
+    utils.compact_ndjson at the end. A repeated id whose latest resource fails validation keeps its former one.
+
+    :param out_dir: META directory to write <Type>.ndjson files to
+    :param name: GDC entity name ex. case
+    :param cases_path: path to GDC cases ndjson or ndjson.gz file
+    :param convert: write the mapped keys to <name>_keys.ndjson next to out_dir
+    :param verbose: print mapping details
+    :param spinner: Halo spinner stopped before reporting
+    :param workers: number of worker processes mapping cases
+    :param validation: ResourceValidation tier ex. full, sample:0.1, or none
+    :param id_index: sqlite path of an on-disk id index for runs with more ids than fit in memory
+    :return: dict of resource type to number of resources written
+    """
+    out_dir = out_dir if out_dir.endswith("/") else f"{out_dir}/"
+    keys_writer = utils.NDJSONWriter(os.path.join(out_dir, os.pardir, "".join([name, "_keys.ndjson"])),
+                                     ensure_ascii=True) if convert else None
+    writers = {entity_name: utils.ndjson_writer(f"{out_dir}{entity_name}.ndjson") for entity_name in
+               CASE_RESOURCE_TYPES}
+    if id_index and os.path.exists(id_index):
+        # ids written by a previous run
+        os.remove(id_index)
+    written = utils.IdSet(path=id_index)
+    validation = utils.ResourceValidation(validation)
+    # each project's ResearchStudy is created once per run and shared by its cases
+    research_study_cache = {}
+
+    # resource types with ids written more than once, compacted to their latest resources
+    repeated = set()
+
+    try:
+        for case in mapping.iter_convert_maps(in_path=cases_path, name=name, verbose=verbose, workers=workers):
+            if keys_writer:
+                keys_writer.write(case)
+            fhir_case = assign_fhir_for_case(case, research_study_cache=research_study_cache, validate=False)
+
+            for entity_name, entities in case_resources([fhir_case]).items():
+                if entity_name == "ResearchStudy":
+                    # created once per project by research_study_cache, a repeated id is the same resource
+                    entities = [e for e in entities if f"{entity_name}/{e['id']}" not in written]
+                for resource, cleaned in utils.finalize_resources(entities, resource_type=entity_name,
+                                                                  validation=validation):
+                    if cleaned is not None:
+                        if not written.add(f"{entity_name}/{resource['id']}") and entity_name != "Patient":
+                            repeated.add(entity_name)
+                        writers[entity_name].write(cleaned)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        if keys_writer:
+            keys_writer.close()
+        written.close()
+
+    counts = {entity_name: writer.count for entity_name, writer in writers.items()}
+    for entity_name in repeated:
+        path = f"{out_dir}{entity_name}.ndjson"
+        index_existed = os.path.exists(f"{path}.idx")
+        counts[entity_name] -= utils.compact_ndjson(path)
+        if not (utils.ndjson_output["index"] or index_existed) and os.path.exists(f"{path}.idx"):
+            os.remove(f"{path}.idx")
+
+    if spinner:
+        spinner.stop()
+
+    if keys_writer:
+        print(f"Successfully created mappings and saved to {keys_writer.path}")
+    for entity_name, count in counts.items():
+        if count:
+            print(f"Successfully converted GDC case info to FHIR's {entity_name} ndjson file!")
+    print(validation.report())
+    if verbose:
+        print(utils.mint_id_cache_report())
+
+    return {entity_name: count for entity_name, count in counts.items() if count}
+
+
+def case_gdc_to_fhir_ndjson(out_dir, name, cases_path, convert, verbose, spinner=None, workers=1, validation="full",
+                            shard_size=CASE_SHARD_SIZE):
+    """
+    Generates FHIR ndjson files of GDC cases.
+    With workers > 1, GDC cases are read in chunks, mapped and transformed by worker processes into per resource type
+    shards in a temporary utils.shard_directory next to out_dir, merged and deduplicated by id into the same
+    <Type>.ndjson files as a serial run. At most two chunks per worker are in flight, so cases aren't held in memory.
+
+    :param out_dir: META directory to write <Type>.ndjson files to
+    :param name: GDC entity name ex. case
+    :param cases_path: path to GDC cases ndjson file
+    :param convert: write the mapped keys to <name>_keys.ndjson next to out_dir
+    :param verbose: print mapping details
+    :param spinner: Halo spinner stopped before writing
+    :param workers: number of worker processes mapping and transforming cases
+    :param validation: ResourceValidation tier ex. full, sample:0.1, or none
+    :param shard_size: number of cases per worker shard
+    """
+    # cases = utils.load_ndjson(cases_path)
+    out_path = os.path.join(out_dir, os.pardir, "".join([name, "_keys.ndjson"])) if convert else None
+    out_dir = out_dir if out_dir.endswith("/") else f"{out_dir}/"
+
+    if workers > 1:
+        plan = mapping.get_mapping_plan(name)
+        if not plan:
+            return
+        map_index = mapping.plan_map_index(plan)
+        if verbose:
+            print("available_maps: ", map_index.maps)
+
+        validation_mode, validation = validation, utils.ResourceValidation(validation)
+        with utils.shard_directory(out_dir) as shard_dir:
+            cases = utils.iter_ndjson(cases_path)
+            tasks = ((chunk, shard, shard_dir, validation_mode, convert, verbose) for shard, chunk in
+                     enumerate(iter(lambda: list(itertools.islice(cases, shard_size)), [])))
+            shards = 0
+            with ProcessPoolExecutor(max_workers=workers, initializer=mapping._init_map_worker,
+                                     initargs=(map_index,)) as executor:
+                pending = deque()
+                for task in tasks:
+                    pending.append(executor.submit(_case_shard, task))
+                    shards += 1
+                    if len(pending) >= 2 * workers:
+                        validation.add(*pending.popleft().result())
+                while pending:
+                    validation.add(*pending.popleft().result())
+
+            if spinner:
+                spinner.stop()
+
+            if convert:
+                utils.merge_ndjson_shards([utils.shard_path(shard_dir, "keys", shard) for shard in range(shards)],
+                                          out_path, dedup=False, compression=None, max_bytes=None)
+                print(f"Successfully created mappings and saved to {out_path}")
+            for entity_name in CASE_RESOURCE_TYPES:
+                shard_paths = [utils.shard_path(shard_dir, entity_name, shard) for shard in range(shards)]
+                if utils.merge_ndjson_shards(shard_paths, f"{out_dir}{entity_name}.ndjson",
+                                             dedup=entity_name != "Patient"):
+                    print(f"Successfully converted GDC case info to FHIR's {entity_name} ndjson file!")
+
+        print(validation.report())
+        return
+
+    cases = mapping.convert_maps(in_path=cases_path, out_path=out_path, name=name, convert=convert, verbose=verbose,
+                                 workers=workers)
+    # each project's ResearchStudy is created once per run and shared by its cases
+    research_study_cache = {}
+    validation = utils.ResourceValidation(validation)
+    all_fhir_case_obj = []
+    # Observations are validated once, when finalized for writing
+    [all_fhir_case_obj.append(assign_fhir_for_case(c, research_study_cache=research_study_cache, validate=False))
+     for c in cases]
+
+    entity_map = case_resources(all_fhir_case_obj)
+
     if spinner:
         spinner.stop()
 
     for entity_name, entities in entity_map.items():
         if entities:
-            cleaned_resource = []
-            for resource in entities:
-                cleaned_resource_dict = utils.remove_empty_dicts(resource)
-                try:
-                    validated_resource = utils.validate_fhir_resource_from_type(entity_name, cleaned_resource_dict).model_dump_json()
-                except ValueError as e:
-                    print(f"Validation failed for {entity_name}: {e}")
-                    continue
-                # handle pydantic Decimal cases
-                validated_resource = utils.convert_decimal_to_float(orjson.loads(validated_resource))
-                validated_resource = utils.convert_value_to_float(validated_resource)
-                validated_resource = orjson.loads(orjson.dumps(validated_resource).decode("utf-8"))
-                cleaned_resource.append(validated_resource)
+            cleaned_resource = utils.clean_resources(entities, resource_type=entity_name, validation=validation)
             if cleaned_resource:
                 utils.fhir_ndjson(cleaned_resource, f"{out_dir}{entity_name}.ndjson")
                 print(f"Successfully converted GDC case info to FHIR's {entity_name} ndjson file!")
 
+    print(validation.report())
+    if verbose:
+        print(utils.mint_id_cache_report())
+
 
 # File ---------------------------------------------------------------
 # load file mapped key values
 # files = utils.load_ndjson("./tests/fixtures/file/file_key.ndjson")
 # file = files[0]
 
+# GDC files per stream_file_gdc_to_fhir_ndjson worker shard
+FILE_SHARD_SIZE = 1000
+
 def assign_fhir_for_file(file):
     project_id = "GDC"
     NAMESPACE_GDC = uuid3(NAMESPACE_DNS, 'gdc.cancer.gov')
@@ -2192,7 +2415,7 @@ def assign_fhir_for_file(file):
 
     docref_observations = []
     if 'read_groups' in file.keys() and file['read_groups']:
-        docref_observation = copy.deepcopy(file_observation)
+        docref_observation = resources.file_observation_template.build()
         for observation in file['read_groups']:
             observation_identifier = Identifier(
                 **{"system": "".join(["https://gdc.cancer.gov/", "files.analysis.metadata.read_groups"]),
@@ -2289,10 +2512,12 @@ def assign_fhir_for_file(file):
     return {'files': document, 'observations': docref_observations, 'group': group}
 
 
-def file_gdc_to_fhir_ndjson(out_dir, name, files_path, convert, verbose, spinner=None):
+def file_gdc_to_fhir_ndjson(out_dir, name, files_path, convert, verbose, spinner=None, workers=1, validation="full"):
     #  files = utils.load_ndjson(files_path)
     out_path = os.path.join(out_dir, os.pardir, "".join([name, "_keys.ndjson"])) if convert else None
-    files = mapping.convert_maps(in_path=files_path, out_path=out_path, name=name, convert=convert, verbose=verbose)
+    files = mapping.convert_maps(in_path=files_path, out_path=out_path, name=name, convert=convert, verbose=verbose,
+                                 workers=workers)
+    validation = utils.ResourceValidation(validation)
 
     all_fhir_file_obs_obj = []
     all_fhir_file_obj = []
@@ -2307,7 +2532,9 @@ def file_gdc_to_fhir_ndjson(out_dir, name, files_path, convert, verbose, spinner
             all_groups.append(obj['group'])
 
     doc_refs = [orjson.loads(fhir_file.model_dump_json()) for fhir_file in all_fhir_file_obj]
+    doc_refs = list({v['id']: v for v in doc_refs}.values())
     groups = [orjson.loads(group.json()) for group in all_groups]
+    groups = list({v['id']: v for v in groups}.values())
 
     observations_list = []
     for observations in all_fhir_file_obs_obj:
@@ -2322,23 +2549,151 @@ def file_gdc_to_fhir_ndjson(out_dir, name, files_path, convert, verbose, spinner
 
     if observations_list:
         utils.create_or_extend(new_items=observations_list, folder_path=out_dir, resource_type='Observation',
-                               update_existing=False)
+                               update_existing=False, append=True, keep_index=utils.ndjson_output["index"])
 
     if "/" not in out_dir[-1]:
         out_dir = out_dir + "/"
 
     if doc_refs:
-        cleaned_doc_refs = utils.clean_resources(doc_refs)
+        cleaned_doc_refs = utils.clean_resources(doc_refs, validation=validation)
         if cleaned_doc_refs:
             utils.fhir_ndjson(cleaned_doc_refs, "".join([out_dir, "DocumentReference.ndjson"]))
             print("Successfully converted GDC file info to FHIR's DocumentReference ndjson file!")
 
     if groups:
-        cleaned_groups = utils.clean_resources(groups)
+        cleaned_groups = utils.clean_resources(groups, validation=validation)
         if cleaned_groups:
             utils.fhir_ndjson(groups, "".join([out_dir, "Group.ndjson"]))
             print("Successfully converted GDC file's patients info to FHIR's Group ndjson file!")
 
+    print(validation.report())
+    if verbose:
+        print(utils.mint_id_cache_report())
+
+
+def _file_shard(task):
+    """
+    Worker mapping and transforming a chunk of GDC files, writing its DocumentReferences, Groups, Observations and,
+    with convert, mapped keys to <Type>.part-<shard>.ndjson files. Resources are deduplicated by id within the shard,
+    those failing validation are written as {"id": ...} so the merge drops them.
+    """
+    files, shard, shard_dir, validation, convert, verbose = task
+    validation = utils.ResourceValidation(validation)
+    files = mapping._map_chunk(files, verbose)
+
+    if convert:
+        with utils.NDJSONWriter(utils.shard_path(shard_dir, "keys", shard), ensure_ascii=True) as keys_writer:
+            for file in files:
+                keys_writer.write(file)
+
+    objs = [assign_fhir_for_file(file) for file in files]
+    doc_refs = {}
+    groups = {}
+    for obj in objs:
+        if obj['files']:
+            doc_ref = orjson.loads(obj['files'].model_dump_json())
+            doc_refs[doc_ref['id']] = doc_ref
+        if obj['group']:
+            group = orjson.loads(obj['group'].model_dump_json())
+            groups[group['id']] = group
+    observations = {}
+    for obj in objs:
+        for obs in obj['observations'] or []:
+            if isinstance(obs, dict):
+                observations.setdefault(obs['id'], obs)
+
+    for entity_name, entities in [("DocumentReference", doc_refs), ("Group", groups)]:
+        with utils.NDJSONWriter(utils.shard_path(shard_dir, entity_name, shard)) as writer:
+            for resource, cleaned in utils.finalize_resources(entities.values(), resource_type=entity_name,
+                                                              validation=validation):
+                writer.write(cleaned if cleaned is not None else {"id": resource['id']})
+    # Observations are extended into META without validation, as in file_gdc_to_fhir_ndjson
+    with utils.NDJSONWriter(utils.shard_path(shard_dir, "Observation", shard)) as writer:
+        for obs in observations.values():
+            writer.write(obs)
+    return validation.checked, validation.total
+
+
+def stream_file_gdc_to_fhir_ndjson(out_dir, name, files_path, convert, verbose, spinner=None, workers=1,
+                                   validation="full", shard_size=FILE_SHARD_SIZE):
+    """
+    Streaming file_gdc_to_fhir_ndjson - reads GDC files in chunks, mapped and transformed by worker processes into
+    DocumentReference, Group and Observation shards in a temporary utils.shard_directory next to out_dir as they go,
+    merged into META at the end.
+    At most two chunks per worker are in flight and Observations are appended with create_or_extend's on-disk id
+    index, so memory doesn't grow with the number of files.
+
+    :param out_dir: META directory to write <Type>.ndjson files to
+    :param name: GDC entity name ex. file
+    :param files_path: path to GDC files ndjson or ndjson.gz file
+    :param convert: write the mapped keys to <name>_keys.ndjson next to out_dir
+    :param verbose: print mapping details
+    :param spinner: Halo spinner stopped before merging
+    :param workers: number of worker processes mapping and transforming files
+    :param validation: ResourceValidation tier ex. full, sample:0.1, or none
+    :param shard_size: number of files per worker shard
+    :return: dict of resource type to number of resources written
+    """
+    out_dir = out_dir if out_dir.endswith("/") else f"{out_dir}/"
+    plan = mapping.get_mapping_plan(name)
+    if not plan:
+        return {}
+    map_index = mapping.plan_map_index(plan)
+    if verbose:
+        print("available_maps: ", map_index.maps)
+
+    validation_mode, validation = validation, utils.ResourceValidation(validation)
+    with utils.shard_directory(out_dir) as shard_dir:
+        files = utils.iter_ndjson(files_path)
+        tasks = ((chunk, shard, shard_dir, validation_mode, convert, verbose) for shard, chunk in
+                 enumerate(iter(lambda: list(itertools.islice(files, shard_size)), [])))
+        shards = 0
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=mapping._init_map_worker,
+                                     initargs=(map_index,)) as executor:
+                pending = deque()
+                for task in tasks:
+                    pending.append(executor.submit(_file_shard, task))
+                    shards += 1
+                    if len(pending) >= 2 * workers:
+                        validation.add(*pending.popleft().result())
+                while pending:
+                    validation.add(*pending.popleft().result())
+        else:
+            mapping._init_map_worker(map_index)
+            for task in tasks:
+                validation.add(*_file_shard(task))
+                shards += 1
+
+        if spinner:
+            spinner.stop()
+
+        counts = {}
+        shard_paths = {entity_name: [utils.shard_path(shard_dir, entity_name, shard) for shard in range(shards)]
+                       for entity_name in ["keys", "Observation", "DocumentReference", "Group"]}
+        if convert:
+            keys_path = os.path.join(out_dir, os.pardir, "".join([name, "_keys.ndjson"]))
+            utils.merge_ndjson_shards(shard_paths["keys"], keys_path, dedup=False, compression=None, max_bytes=None)
+            print(f"Successfully created mappings and saved to {keys_path}")
+        if any(os.path.exists(path) for path in shard_paths["Observation"]):
+            counts["Observation"] = utils.create_or_extend(
+                new_items=(orjson.loads(line) for line in utils.iter_shard_lines(shard_paths["Observation"])),
+                folder_path=out_dir, resource_type='Observation', update_existing=False, append=True,
+                keep_index=utils.ndjson_output["index"])
+        counts["DocumentReference"] = utils.merge_ndjson_shards(shard_paths["DocumentReference"],
+                                                                f"{out_dir}DocumentReference.ndjson")
+        if counts["DocumentReference"]:
+            print("Successfully converted GDC file info to FHIR's DocumentReference ndjson file!")
+        counts["Group"] = utils.merge_ndjson_shards(shard_paths["Group"], f"{out_dir}Group.ndjson")
+        if counts["Group"]:
+            print("Successfully converted GDC file's patients info to FHIR's Group ndjson file!")
+
+    print(validation.report())
+    if verbose:
+        print(utils.mint_id_cache_report())
+
+    return {entity_name: count for entity_name, count in counts.items() if count}
+
 
 # Cellosaurus ---------------------------------------------------------------
 
@@ -2362,7 +2717,10 @@ def cellosaurus_resource(path, out_dir):
     utils.fetch_cellines(ids, cells_dir)  # api call intensive - 1s per request + 0.5s delay
     cls = utils.cellosaurus_cancer_jsons(cells_dir)
     ndjson_path = os.path.join(out_dir, "cellosaurus_cellines.ndjson")
-    utils.fhir_ndjson(cls, os.path.join(out_dir, "cellosaurus_cellines.ndjson"))
+    # cell line json, not FHIR output, written as is whatever the configured ndjson_output
+    with utils.NDJSONWriter(ndjson_path) as writer:
+        for cl in cls or []:
+            writer.write(cl)
 
     if os.path.exists(ndjson_path):
         print("Successfully saved cell lines in cellosaurus_cellines.ndjson!")
@@ -2458,8 +2816,7 @@ def cellosaurus_fhir_mappping(cell_lines, verbose=False):
 
                                 disease_coding.append(coding)
 
-                                mondo = [d["mondo_id"] for d in ncit2mondo if
-                                         d["ncit_id"] == disease_annotation["accession"]]
+                                mondo = resources.ncit2mondo.get(disease_annotation["accession"])
                                 if mondo:
                                     mondo_code = str(mondo[0])
                                     mondo_display = display
@@ -2554,7 +2911,8 @@ def cellosaurus_fhir_mappping(cell_lines, verbose=False):
     return {"patients": patients, "conditions": conditions, "samples": samples}
 
 
-def cellosaurus_to_fhir_ndjson(out_dir, obj, spinner):
+def cellosaurus_to_fhir_ndjson(out_dir, obj, spinner, validation="full"):
+    validation = utils.ResourceValidation(validation)
     patients = [orjson.loads(patient.json()) for patient in obj["patients"]]
     samples = [orjson.loads(sample.json()) for sample in obj["samples"]]
     samples = list({v['id']: v for v in samples}.values())
@@ -2565,20 +2923,22 @@ def cellosaurus_to_fhir_ndjson(out_dir, obj, spinner):
         spinner.stop()
 
     if patients:
-        cleaned_patients = utils.clean_resources(patients)
+        cleaned_patients = utils.clean_resources(patients, validation=validation)
         utils.fhir_ndjson(cleaned_patients, os.path.join(out_dir, "Patient.ndjson"))
         print("Successfully converted Cellosaurus info to FHIR's Patient ndjson file!")
     if samples:
-        cleaned_samples = utils.clean_resources(samples)
+        cleaned_samples = utils.clean_resources(samples, validation=validation)
         utils.fhir_ndjson(cleaned_samples, os.path.join(out_dir, "Specimen.ndjson"))
         print("Successfully converted Cellosaurus info to FHIR's Specimen ndjson file!")
     if conditions:
-        cleaned_conditions = utils.clean_resources(conditions)
+        cleaned_conditions = utils.clean_resources(conditions, validation=validation)
         utils.fhir_ndjson(cleaned_conditions, os.path.join(out_dir, "Condition.ndjson"))
         print("Successfully converted Cellosaurus info to FHIR's Condition ndjson file!")
 
+    print(validation.report())
+
 
-def cellosaurus2fhir(path, out_dir, spinner=None):
+def cellosaurus2fhir(path, out_dir, spinner=None, validation="full"):
     cell_lines = utils.load_ndjson(path=path)
     cellosaurus_fhir_objects = cellosaurus_fhir_mappping(cell_lines)
-    cellosaurus_to_fhir_ndjson(out_dir=out_dir, obj=cellosaurus_fhir_objects, spinner=spinner)
+    cellosaurus_to_fhir_ndjson(out_dir=out_dir, obj=cellosaurus_fhir_objects, spinner=spinner, validation=validation)
@@ -53,7 +53,7 @@ from fhir.resources.quantity import Quantity
 
 
 class HTANTransformer:
-    def __init__(self, subprogram_name: str, out_dir: str, verbose: bool):
+    def __init__(self, subprogram_name: str, out_dir: str, verbose: bool, validation=None):
         self.mint_id = utils.mint_id
         self._mint_id = utils._mint_id
         self.get_data_type = utils.get_data_types
@@ -65,6 +65,7 @@ class HTANTransformer:
         assert Path(out_dir).is_dir(), f"Path to out_dir {out_dir} is not a directory."
         self.out_dir = out_dir
         self.verbose = verbose
+        self.validation = validation
         self.SYSTEM_HTAN = 'https://data.humantumoratlas.org'
         self.SYSTEM_SNOME = 'http://snomed.info/sct'
         self.SYSTEM_LOINC = 'http://loinc.org'
@@ -411,10 +412,9 @@ class HTANTransformer:
                               "specimen": specimen_ref})
 
     def get_patient_id(self, participant_id) -> str:
-        patient_identifier = Identifier(**{"system": self.SYSTEM_HTAN, "value": str(participant_id), "use": "official"})
-        patient_id = self.mint_id(identifier=patient_identifier, resource_type="Patient", project_id=self.project_id,
-                                  namespace=self.NAMESPACE_HTAN)
-        return patient_id
+        # same id as mint_id of Identifier(system=SYSTEM_HTAN, value=participant_id), without building the Identifier
+        return utils.mint_id(identifier=f"Patient/{self.SYSTEM_HTAN}|{participant_id}", resource_type="Patient",
+                             project_id=self.project_id, namespace=self.NAMESPACE_HTAN)
 
     @staticmethod
     def create_substance_definition_representations(df: pd.DataFrame) -> list:
@@ -514,7 +514,7 @@ class HTANTransformer:
         resource_type = entities[0].get_resource_type()
         entities = [orjson.loads(entity.model_dump_json()) for entity in entities]
         entities = list({v['id']: v for v in entities}.values())
-        cleaned_entity = utils.clean_resources(entities)
+        cleaned_entity = utils.clean_resources(entities, validation=self.validation)
         utils.fhir_ndjson(cleaned_entity, "".join([self.out_dir, "/", resource_type, ".ndjson"]))
         print(f"Successfully converted HTAN data to FHIR's {resource_type} ndjson file!")
 
@@ -905,8 +905,7 @@ class PatientTransformer(HTANTransformer):
         assessment = []
 
         # find fields w Condition.stage.summary mappings
-        cancer_pathological_staging = utils._read_json(str(Path(importlib.resources.files(
-            'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'diagnosis' / 'cancer_pathological_staging.json')))
+        cancer_pathological_staging_index = utils.load_content_annotation_index('diagnosis/cancer_pathological_staging')
 
         stage_fields = []
         for field, fhir_map, use, focus in self.get_fields_by_fhir_map(self.cases_mappings(),
@@ -928,24 +927,23 @@ class PatientTransformer(HTANTransformer):
 
                 types = []
                 summaries = []
-                for stage_info in cancer_pathological_staging:
-                    if _row[stage_field] == stage_info["value"]:
-                        type_system = {"code": stage_info["stage_type_sctid"],
-                                       "system": self.SYSTEM_SNOME,
-                                       "display": stage_info["stage_type_sctid_display"]}
-
-                        summary_htan_system = {"code": _row[stage_field],
-                                               "system": "/".join(
-                                                   [self.SYSTEM_HTAN, "_".join(stage_field.lower().split(" "))]),
-                                               "display": _row[stage_field]}
-
-                        summary_snomed_system = {"code": stage_info["sctid"],
-                                                 "system": self.SYSTEM_SNOME,
-                                                 "display": stage_info["sctid_display"]}
-
-                        types.append(type_system)
-                        summaries.append(summary_htan_system)
-                        summaries.append(summary_snomed_system)
+                for stage_info in cancer_pathological_staging_index.find(_row[stage_field]):
+                    type_system = {"code": stage_info["stage_type_sctid"],
+                                   "system": self.SYSTEM_SNOME,
+                                   "display": stage_info["stage_type_sctid_display"]}
+
+                    summary_htan_system = {"code": _row[stage_field],
+                                           "system": "/".join(
+                                               [self.SYSTEM_HTAN, "_".join(stage_field.lower().split(" "))]),
+                                           "display": _row[stage_field]}
+
+                    summary_snomed_system = {"code": stage_info["sctid"],
+                                             "system": self.SYSTEM_SNOME,
+                                             "display": stage_info["sctid_display"]}
+
+                    types.append(type_system)
+                    summaries.append(summary_htan_system)
+                    summaries.append(summary_snomed_system)
                 if not types:
                     types.append({"code": "_".join(stage_field.lower().split(" ")),
                                   "system": "/".join([self.SYSTEM_HTAN, "_".join(stage_field.lower().split(" "))]),
@@ -968,8 +966,7 @@ class PatientTransformer(HTANTransformer):
         observation_dict = {}
 
         # find fields w Condition.stage.summary mappings
-        cancer_pathological_staging = utils._read_json(str(Path(importlib.resources.files(
-            'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'diagnosis' / 'cancer_pathological_staging.json')))
+        cancer_pathological_staging_index = utils.load_content_annotation_index('diagnosis/cancer_pathological_staging')
 
         ajcc_pathologic_stage_fields = []
         grade_stage_fields = []
@@ -1001,16 +998,15 @@ class PatientTransformer(HTANTransformer):
 
                     code = None
                     value_code = None
-                    for stage_info in cancer_pathological_staging:
-                        if value == stage_info["value"]:
-                            code = CodeableConcept(**{"coding": [{"code": str(stage_info["stage_type_sctid"]),
-                                                                  "system": self.SYSTEM_SNOME,
-                                                                  "display": str(
-                                                                      stage_info["stage_type_sctid_display"])}]})
-
-                            value_code = CodeableConcept(**{"coding": [{"code": str(stage_info["sctid"]),
-                                                                        "system": self.SYSTEM_SNOME,
-                                                                        "display": str(stage_info["sctid_display"])}]})
+                    for stage_info in cancer_pathological_staging_index.find(value):
+                        code = CodeableConcept(**{"coding": [{"code": str(stage_info["stage_type_sctid"]),
+                                                              "system": self.SYSTEM_SNOME,
+                                                              "display": str(
+                                                                  stage_info["stage_type_sctid_display"])}]})
+
+                        value_code = CodeableConcept(**{"coding": [{"code": str(stage_info["sctid"]),
+                                                                    "system": self.SYSTEM_SNOME,
+                                                                    "display": str(stage_info["sctid_display"])}]})
                     if not code:
                         code = CodeableConcept(**{"coding": [{"code": str(stage),
                                                               "system": "/".join([self.SYSTEM_HTAN, stage]),
@@ -1044,15 +1040,14 @@ class PatientTransformer(HTANTransformer):
 
                 code = None
                 value_code = None
-                for stage_info in cancer_pathological_staging:
-                    if _row["AJCC Pathologic Stage"] == stage_info["value"]:
-                        code = CodeableConcept(**{"coding": [{"code": str(stage_info["stage_type_sctid"]),
-                                                              "system": self.SYSTEM_SNOME,
-                                                              "display": str(stage_info["stage_type_sctid_display"])}]})
-
-                        value_code = CodeableConcept(**{"coding": [{"code": str(stage_info["sctid"]),
-                                                                    "system": self.SYSTEM_SNOME,
-                                                                    "display": str(stage_info["sctid_display"])}]})
+                for stage_info in cancer_pathological_staging_index.find(_row["AJCC Pathologic Stage"]):
+                    code = CodeableConcept(**{"coding": [{"code": str(stage_info["stage_type_sctid"]),
+                                                          "system": self.SYSTEM_SNOME,
+                                                          "display": str(stage_info["stage_type_sctid_display"])}]})
+
+                    value_code = CodeableConcept(**{"coding": [{"code": str(stage_info["sctid"]),
+                                                                "system": self.SYSTEM_SNOME,
+                                                                "display": str(stage_info["sctid_display"])}]})
                 if not code:
                     code = CodeableConcept(**{"coding": [{"code": str(stage),
                                                           "system": "/".join([self.SYSTEM_HTAN, stage]),
@@ -1259,8 +1254,9 @@ class DocumentReferenceTransformer(HTANTransformer):
 
 # 2 Projects that don't have files download or cds manifest SRRS and TNP_TMA (Oct/2024)
 # 12/14 total Atlas
-def htan2fhir(verbose, entity_atlas_name, spinner):
+def htan2fhir(verbose, entity_atlas_name, spinner, validation="full"):
     warnings.filterwarnings('ignore')
+    validation = utils.ResourceValidation(validation)
 
     atlas_names = ["OHSU", "DFCI", "WUSTL", "BU", "CHOP", "Duke", "HMS", "HTAPP", "MSK", "Stanford",
                    "Vanderbilt", "TNP_SARDANA"]
@@ -1277,7 +1273,8 @@ def htan2fhir(verbose, entity_atlas_name, spinner):
             spinner.stop()
             print(f"\nTransforming {name}\n")
 
-        transformer = HTANTransformer(subprogram_name=name, out_dir=f"./projects/HTAN/{name}/META", verbose=verbose)
+        transformer = HTANTransformer(subprogram_name=name, out_dir=f"./projects/HTAN/{name}/META", verbose=verbose,
+                                      validation=validation)
         patient_transformer = PatientTransformer(subprogram_name=name, out_dir=f"./projects/HTAN/{name}/META",
                                                  verbose=verbose)
         specimen_transformer = SpecimenTransformer(subprogram_name=name, out_dir=f"./projects/HTAN/{name}/META",
@@ -1456,4 +1453,6 @@ def htan2fhir(verbose, entity_atlas_name, spinner):
         if med_admins:
             transformer.write_ndjson(med_admins)
 
+    print(validation.report())
+
 # for i in $(ls projects/HTAN); do fhirizer validate --path projects/HTAN/$i/META; done
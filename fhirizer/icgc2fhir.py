@@ -8,7 +8,6 @@ import pandas as pd
 import uuid
 import json
 import orjson
-import copy
 from fhir.resources.identifier import Identifier
 from fhir.resources.researchstudy import ResearchStudy
 from fhir.resources.codeableconcept import CodeableConcept
@@ -36,6 +35,10 @@ alcohol_obs = utils._read_json(
 biospecimen_observation = utils._read_json(str(Path(importlib.resources.files(
     'fhirizer').parent / 'resources' / 'gdc_resources' / 'content_annotations' / 'biospecimen' / 'biospecimen_observation.json')))
 
+smoking_obs_template = utils.JSONTemplate(smoking_obs)
+alcohol_obs_template = utils.JSONTemplate(alcohol_obs)
+biospecimen_observation_template = utils.JSONTemplate(biospecimen_observation)
+
 # smoking_obs = utils._read_json("resources/icgc/observations/smoking.json")
 # alcohol_obs = utils._read_json("resources/icgc/observations/alcohol.json")
 # NOTE: all url's are based on current site that will be-updated https://platform.icgc-argo.org/
@@ -156,6 +159,7 @@ exam = {
         ]
     }
 }
+exam_template = utils.JSONTemplate(exam)
 
 relapse_type = ["distant recurrence/metastasis",
                 "local recurrence",
@@ -404,17 +408,17 @@ def fhir_smoking_exposure_observations(row):
         if row['tobacco_smoking_history_indicator'] in ['Current reformed smoker for > 15 years',
                                                         'Current reformed smoker for <= 15 years',
                                                         'Current reformed smoker, duration not specified']:
-            obs = exposure_observation(obs=copy.deepcopy(smoking_obs), row=row, snomed=None, smoking=True)
+            obs = exposure_observation(obs=smoking_obs_template.build(), row=row, snomed=None, smoking=True)
         elif "Current smoker" in row['tobacco_smoking_history_indicator']:
             snomed = next((code for code in smoking_snomed_codes if
                            code['note_text'] == "Lifelong non-smoker (<100 cigarettes smoked in lifetime)"), None)
             if snomed:
-                obs = exposure_observation(obs=copy.deepcopy(smoking_obs), row=row, snomed=snomed, smoking=True)
+                obs = exposure_observation(obs=smoking_obs_template.build(), row=row, snomed=snomed, smoking=True)
         elif "Lifelong non-smoker" in row['tobacco_smoking_history_indicator']:
             snomed = next((code for code in smoking_snomed_codes if
                            code['note_text'] == "Lifelong non-smoker (<100 cigarettes smoked in lifetime)"), None)
             if snomed:
-                obs = exposure_observation(obs=copy.deepcopy(smoking_obs), row=row, snomed=snomed, smoking=True)
+                obs = exposure_observation(obs=smoking_obs_template.build(), row=row, snomed=snomed, smoking=True)
     if obs:
         return obs
 
@@ -425,18 +429,18 @@ def fhir_alcohol_exposure_observations(row):
             row['alcohol_history_intensity'], str):
         if 'Daily Drinker' in row['alcohol_history_intensity'] and row['alcohol_history_intensity']:
             snomed = [code for code in alcohol_snomed_codes if code['note_text'] == 'Daily Drinker'][0]
-            obs = exposure_observation(obs=copy.deepcopy(alcohol_obs), row=row, snomed=snomed, smoking=False)
+            obs = exposure_observation(obs=alcohol_obs_template.build(), row=row, snomed=snomed, smoking=False)
         elif 'Social Drinker' in row['alcohol_history_intensity']:
             snomed = [code for code in alcohol_snomed_codes if
                       code['note_text'] == 'Social Drinker (> once a month, < once a week)'][0]
-            obs = exposure_observation(obs=copy.deepcopy(alcohol_obs), row=row, snomed=snomed, smoking=False)
+            obs = exposure_observation(obs=alcohol_obs_template.build(), row=row, snomed=snomed, smoking=False)
         elif 'Weekly Drinker' in row['alcohol_history_intensity']:
             snomed = [code for code in alcohol_snomed_codes if code['note_text'] == 'Weekly Drinker (>=1x a week)'][0]
-            obs = exposure_observation(obs=copy.deepcopy(alcohol_obs), row=row, snomed=snomed, smoking=False)
+            obs = exposure_observation(obs=alcohol_obs_template.build(), row=row, snomed=snomed, smoking=False)
         elif 'Occasional Drinker' in row['alcohol_history_intensity']:
             snomed = \
                 [code for code in alcohol_snomed_codes if code['note_text'] == 'Occasional Drinker (< once a month)'][0]
-            obs = exposure_observation(obs=copy.deepcopy(alcohol_obs), row=row, snomed=snomed, smoking=False)
+            obs = exposure_observation(obs=alcohol_obs_template.build(), row=row, snomed=snomed, smoking=False)
     if obs:
         return obs
 
@@ -644,7 +648,7 @@ def fhir_condition(row):
         obs_ident = Identifier(**{"system": "".join(["https://platform.icgc-argo.org/", "donor_id"]),
                                   "value": "/".join([row['icgc_donor_id'], "exam"])})
 
-        obs_exam = copy.deepcopy(exam)
+        obs_exam = exam_template.build()
         obs_exam["id"] = utils.mint_id(
             identifier=[obs_ident, patient_ident],
             resource_type="Observation",
@@ -734,7 +738,7 @@ def fhir_specimen(row):
         sample_components.append(cpc)
 
     if sample_components:
-        sample_observation = copy.deepcopy(biospecimen_observation)
+        sample_observation = biospecimen_observation_template.build()
         # print(sample_components)
 
         sample_observation['id'] = utils.mint_id(
@@ -751,7 +755,7 @@ def fhir_specimen(row):
             "reference": "/".join(["Specimen", sample_id])}
         sample_observation['focus'][0] = {
             "reference": "/".join(["Specimen", sample_id])}
-        observations.append(copy.deepcopy(sample_observation))
+        observations.append(sample_observation)
 
     # child specimen
 
@@ -822,7 +826,7 @@ def fhir_specimen(row):
             specimen_components.append(cpc)
 
     if specimen_components:
-        specimen_observation = copy.deepcopy(biospecimen_observation)
+        specimen_observation = biospecimen_observation_template.build()
         specimen_observation['id'] = utils.mint_id(
             identifier=specimen_identifier_0,
             resource_type="Observation",
@@ -838,7 +842,7 @@ def fhir_specimen(row):
             "reference": "/".join(["Specimen", specimen_id])}
 
         if specimen_observation:
-            observations.append(copy.deepcopy(specimen_observation))
+            observations.append(specimen_observation)
 
     specimen = Specimen(
         **{"id": specimen_id, "identifier": [sample_identifier_0, specimen_identifier_1], "parent": parent,
@@ -889,32 +893,6 @@ def fhir_document_reference(row):
     return dr
 
 
-def patient_id(row):
-    patient_ident = Identifier(**{"system": "".join(["https://platform.icgc-argo.org/", "donor_id"]),
-                                  "value": row['icgc_donor_id']})
-
-    patient_id = utils.mint_id(
-        identifier=patient_ident,
-        resource_type="Patient",
-        project_id=project_id,
-        namespace=NAMESPACE_GDC)
-
-    return patient_id
-
-
-def sample_id(row):
-    # only applies to new data file and sample relations on argo site (sample vs. specimen where specimen is the child sample that is sequenced)
-    specimen_identifier_0 = Identifier(**{"system": "".join(["https://platform.icgc-argo.org/", "icgc_sample_id"]),
-                                          "value": row['icgc_sample_id']})
-
-    specimen_id = utils.mint_id(
-        identifier=specimen_identifier_0,
-        resource_type="Specimen",
-        project_id=project_id,
-        namespace=NAMESPACE_GDC)
-    return specimen_id
-
-
 def icgc2fhir(project_name, has_files):
     # project_name = "ESCA-UK"
     # has_files = True
@@ -1004,11 +982,18 @@ def icgc2fhir(project_name, has_files):
         file_metadata = file_metadata.merge(file_table, on='object_id', how="left")
         file_metadata = file_metadata.fillna('')
 
-        df_patient["patient_mintid"] = df_patient.apply(patient_id, axis=1)
+        # minted as the str value of their Identifier, rows without an id are left without one
+        df_patient["patient_mintid"] = utils.mint_ids(df_patient['icgc_donor_id'].dropna().astype(str),
+                                                      resource_type="Patient",
+                                                      system="https://platform.icgc-argo.org/donor_id",
+                                                      project_id=project_id, namespace=NAMESPACE_GDC)
         file_metadata_patient_info = file_metadata.merge(df_patient, on="icgc_donor_id", how="left",
                                                          suffixes=["", "_p"])
 
-        df_specimen["sample_mintid"] = df_specimen.apply(sample_id, axis=1)
+        df_specimen["sample_mintid"] = utils.mint_ids(df_specimen['icgc_sample_id'].dropna().astype(str),
+                                                      resource_type="Specimen",
+                                                      system="https://platform.icgc-argo.org/icgc_sample_id",
+                                                      project_id=project_id, namespace=NAMESPACE_GDC)
         file_metadata_patient_specimen_info = file_metadata_patient_info.merge(df_specimen, on='icgc_sample_id',
                                                                                how="left")
 
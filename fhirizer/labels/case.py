@@ -19,7 +19,7 @@ package_dir = utils.package_dir
 case_schema = utils.load_schema_from_json(path=os.path.join(package_dir, 'mapping', 'case.json'))
 keys_to_label_fields = [key for key in case_schema.obj_keys if
                         key not in [x.source.name for x in case_schema.mappings]]
-data_dict = utils.load_data_dictionary(path=os.path.join(package_dir, 'resources', 'gdc_resources', 'data_dictionary',  ''))
+data_dict = utils.get_data_dictionary()
 
 """
 Field labels mapped semi-computationally 
@@ -12,8 +12,7 @@ package_dir = utils.package_dir
 project_schema = utils.load_schema_from_json(path=os.path.join(package_dir, 'mapping', 'project.json'))
 keys_to_label_fields = [key for key in project_schema.obj_keys if
                         key not in [x.source.name for x in project_schema.mappings]]
-data_dict = utils.load_data_dictionary(
-    path=os.path.join(package_dir, 'resources', 'gdc_resources', 'data_dictionary', ''))
+data_dict = utils.get_data_dictionary()
 
 """
 Field labels mapped semi-computationally 
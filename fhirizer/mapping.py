@@ -1,4 +1,10 @@
+import os
 import json
+import orjson
+import hashlib
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import importlib.resources
 from fhirizer import utils
@@ -7,7 +13,27 @@ from fhir.resources.researchstudy import ResearchStudy
 from fhir.resources.patient import Patient
 from fhir.resources.documentreference import DocumentReference
 
-data_dict = utils.load_data_dictionary(path=utils.DATA_DICT_PATH)
+# GDC data dictionary loaded on first access ex. by the initialize_* schema builders
+resources = utils.LazyResources()
+resources.register('data_dict', utils.get_data_dictionary)
+MAPPING_PATH = Path(importlib.resources.files('fhirizer').parent / 'mapping')
+
+# compiled mapping plans loaded in this process keyed by plan path, and their MapIndex keyed by schema hash
+_mapping_plans = {}
+_map_indexes = {}
+
+# MapIndex sent once to each convert worker process
+_worker_map_index = None
+
+# number of entities sent to a convert worker process at a time
+CONVERT_CHUNK_SIZE = 64
+
+
+def __getattr__(name):
+    """Module level access to the lazily loaded resources ex. mapping.data_dict"""
+    if name in resources:
+        return getattr(resources, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def initialize_project(field_path=utils.FIELDS_PATH,
@@ -45,7 +71,7 @@ def initialize_project(field_path=utils.FIELDS_PATH,
     )
 
     source_ref = Reference(
-        reference_type=data_dict['administrative']['project']['links'][0]['target_type']
+        reference_type=resources.data_dict['administrative']['project']['links'][0]['target_type']
     )
 
     destination_ref = Reference(
@@ -53,10 +79,10 @@ def initialize_project(field_path=utils.FIELDS_PATH,
     )
 
     source = Source(
-        name=data_dict['administrative']['project']['id'],
-        description=data_dict['administrative']['project']['description'],
-        category=data_dict['administrative']['project']['category'],
-        type=data_dict['administrative']['project']['type'],
+        name=resources.data_dict['administrative']['project']['id'],
+        description=resources.data_dict['administrative']['project']['description'],
+        category=resources.data_dict['administrative']['project']['category'],
+        type=resources.data_dict['administrative']['project']['type'],
         reference=[source_ref]
     )
 
@@ -123,8 +149,8 @@ def initialize_case(field_path=utils.FIELDS_PATH,
         resource_links=["https://gdc.cancer.gov/about-gdc/gdc-overview", "https://www.hl7.org/fhir/overview.html"]
     )
 
-    references = [data_dict['case']['case']['links'][i]['target_type'] for i in
-                  range(0, len(data_dict['case']['case']['links']))]
+    references = [resources.data_dict['case']['case']['links'][i]['target_type'] for i in
+                  range(0, len(resources.data_dict['case']['case']['links']))]
     source_refs = []
     for r in references:
         source_refs.append(Reference(
@@ -132,10 +158,10 @@ def initialize_case(field_path=utils.FIELDS_PATH,
         ))
 
     source = Source(
-        name=data_dict['case']['case']['id'],
-        description=data_dict['case']['case']['description'],
-        category=data_dict['case']['case']['category'],
-        type=data_dict['case']['case']['type'],
+        name=resources.data_dict['case']['case']['id'],
+        description=resources.data_dict['case']['case']['description'],
+        category=resources.data_dict['case']['case']['category'],
+        type=resources.data_dict['case']['case']['type'],
         reference=source_refs
     )
 
@@ -203,7 +229,7 @@ def initialize_file(field_path=utils.FIELDS_PATH,
 
     references = [i['target_type'] if 'subgroup' not in i
                   else [subgroup['target_type'] for subgroup in i['subgroup']]
-                  for i in data_dict['file']['file']['links']]
+                  for i in resources.data_dict['file']['file']['links']]
 
     source_refs = []
     for r in references[0]:
@@ -212,10 +238,10 @@ def initialize_file(field_path=utils.FIELDS_PATH,
         ))
 
     source = Source(
-        name=data_dict['file']['file']['id'],
-        description=data_dict['file']['file']['description'],
-        category=data_dict['file']['file']['category'],
-        type=data_dict['file']['file']['type'],
+        name=resources.data_dict['file']['file']['id'],
+        description=resources.data_dict['file']['file']['description'],
+        category=resources.data_dict['file']['file']['category'],
+        type=resources.data_dict['file']['file']['type'],
         reference=source_refs
     )
 
@@ -261,7 +287,7 @@ def add_some_maps(out_path=str(Path(importlib.resources.files('fhirizer').parent
         source=Source(
             name='name',
             description='Display name for the project.',
-            category=data_dict['administrative']['project']['category'],
+            category=resources.data_dict['administrative']['project']['category'],
             type='string'
         ),
         destination=Destination(
@@ -274,9 +300,9 @@ def add_some_maps(out_path=str(Path(importlib.resources.files('fhirizer').parent
     ), Map(
         source=Source(
             name='project_id',
-            description=data_dict['administrative']['project']['properties']['id']['common']['description'],
-            category=data_dict['administrative']['project']['category'],
-            type=data_dict['administrative']['project']['properties']['id']['common']['termDef']['term']
+            description=resources.data_dict['administrative']['project']['properties']['id']['common']['description'],
+            category=resources.data_dict['administrative']['project']['category'],
+            type=resources.data_dict['administrative']['project']['properties']['id']['common']['termDef']['term']
         ),
         destination=Destination(
             name='ResearchStudy.identifier',
@@ -292,48 +318,169 @@ def add_some_maps(out_path=str(Path(importlib.resources.files('fhirizer').parent
     utils.validate_and_write(project_schema, out_path=out_path, update=True, generate=False)
 
 
-def convert_maps(in_path, out_path, name, convert, verbose):
+def compile_schema(schema: Schema, schema_hash: str = None) -> dict:
+    """
+    Compiles a mapping Schema into a flat source -> destination key rename plan.
+    Duplicate source names keep their last Map, same as Schema.find_map_by_source.
+
+    :param schema: Schema of a GDC entity ex. mapping/case.json
+    :param schema_hash: sha256 hex digest of the Schema json content the plan is keyed by
+    :return: Dictionary of the compiled mapping plan
+    """
+    return {
+        "schema_hash": schema_hash,
+        "obj_mapping": [schema.obj_mapping.source.name, schema.obj_mapping.destination.name],
+        "mappings": {m.source.name: m.destination.name for m in schema.mappings}
+    }
+
+
+def load_mapping_plan(path, recompile=False) -> dict:
+    """
+    Loads the compiled mapping plan saved next to a Schema json file ex. mapping/case.plan.json
+    The plan is (re)compiled and saved when it doesn't exist or the Schema json content hash has changed.
+
+    :param path: Path to Schema json file
+    :param recompile: Boolean to force compiling the plan from the Schema json file
+    :return: Dictionary of the compiled mapping plan
+    """
+    path = Path(path)
+    plan_path = path.with_name("".join([path.stem, ".plan.json"]))
+
+    with open(path, "rb") as f:
+        schema_hash = hashlib.sha256(f.read()).hexdigest()
+
+    plan = _mapping_plans.get(plan_path)
+    if not recompile and plan and plan["schema_hash"] == schema_hash:
+        return plan
+
+    plan = None
+    if not recompile and plan_path.exists():
+        try:
+            with open(plan_path, "rb") as f:
+                plan = orjson.loads(f.read())
+        except orjson.JSONDecodeError:
+            plan = None
+
+    if not plan or plan.get("schema_hash") != schema_hash:
+        plan = compile_schema(utils.load_schema_from_json(path=str(path)), schema_hash=schema_hash)
+        try:
+            tmp_path = plan_path.with_name("".join([plan_path.name, ".tmp"]))
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(plan))
+            os.replace(tmp_path, plan_path)
+        except OSError as e:
+            print(f"Compiled mapping plan {plan_path} was not saved: {e}")
+
+    _mapping_plans[plan_path] = plan
+    return plan
+
+
+def get_mapping_plan(name, recompile=False) -> dict | None:
+    """
+    Fetches the compiled mapping plan of a GDC entity
+
+    :param name: project, case, or file GDC entity
+    :param recompile: Boolean to force compiling the plan from the Schema json file
+    :return: Dictionary of the compiled mapping plan
+    """
+    if name in 'project':
+        return load_mapping_plan(MAPPING_PATH / 'project.json', recompile=recompile)
+    elif name in 'case':
+        return load_mapping_plan(MAPPING_PATH / 'case.json', recompile=recompile)
+    elif name in 'file':
+        return load_mapping_plan(MAPPING_PATH / 'file.json', recompile=recompile)
+
+
+def plan_map_index(plan) -> utils.MapIndex:
     """
-    - load updated schema
+    Fetches the MapIndex of all Maps in a compiled mapping plan, built once per plan in this process.
+    Maps are resolved lazily by the key paths visited while mapping, no key extraction pre-pass is needed.
+    The index is record scoped, a Map is only used if its source key path is in the record being mapped.
+
+    This differs on purpose from the former key union of every record in the file: a key path looked up while
+    mapping a record, but present only in other records of the file, no longer picks up their Map. A record maps the
+    same whichever file, stream, worker chunk or shard it's in, which a file wide union can't give without a full
+    pre-pass over the input. Mapped case, file and project fixtures are unchanged.
+
+    :param plan: Compiled mapping plan
+    :return: MapIndex of the plan's Maps
+    """
+    map_index = _map_indexes.get(plan["schema_hash"])
+    if map_index is None:
+        available_maps = list(plan["mappings"].items())
+        available_maps.append(tuple(plan["obj_mapping"]))
+        map_index = _map_indexes[plan["schema_hash"]] = utils.build_map_index(
+            available_maps, record_scoped=True, unscoped_sources=[plan["obj_mapping"][0]])
+    return map_index
+
+
+def _init_map_worker(map_index):
+    global _worker_map_index
+    _worker_map_index = map_index
+
+
+def _map_chunk(chunk, verbose=False):
+    return [utils.map_data(e, _worker_map_index, verbose=verbose)['mapped_data'] for e in chunk]
+
+
+def map_entities(entities, map_index, verbose=False, workers=1, chunk_size=CONVERT_CHUNK_SIZE):
+    """
+    Maps GDC entities with map_data and yields the mapped entities in input order.
+    With workers > 1, chunks of entities are mapped in a process pool, the MapIndex is sent to each worker once
+    and at most two chunks per worker are in flight, so iterables are consumed lazily.
+
+    :param entities: Iterable of GDC entities
+    :param map_index: MapIndex of the compiled mapping plan
+    :param verbose:
+    :param workers: Number of worker processes
+    :param chunk_size: Number of entities sent to a worker at a time
+    :return: Generator of mapped entities
+    """
+    if workers <= 1:
+        for entity in entities:
+            yield utils.map_data(entity, map_index, verbose=verbose)['mapped_data']
+        return
+
+    entities = iter(entities)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_map_worker, initargs=(map_index,)) as executor:
+        pending = deque()
+        while True:
+            chunk = list(itertools.islice(entities, chunk_size))
+            if chunk:
+                pending.append(executor.submit(_map_chunk, chunk, verbose))
+            if pending and (not chunk or len(pending) >= 2 * workers):
+                yield from pending.popleft().result()
+            elif not chunk:
+                break
+
+
+def convert_maps(in_path, out_path, name, convert, verbose, workers=1):
+    """
+    - load compiled mapping plan of the updated schema
     - load GDC bmeg script json file
-    - extract gdc key hierarchy
-    - check available Map sources
-    - map destination keys
+    - map destination keys, resolving Map sources by the visited gdc key hierarchy
 
     fhirizer convert --in_path "/Users/sanati/KCRB/fhir/cases.ndjson" --out_path "/Users/sanati/KCRB/fhir/case_key.ndjson" --verbose True
 
     :param name: project, case GDC entity
-    :param in_path: ndjson path of data scripted from GDC ex bmeg-etl script
+    :param in_path: ndjson or ndjson.gz path of data scripted from GDC ex bmeg-etl script
     :param out_path:
     :param verbose:
+    :param workers: Number of worker processes mapping entities, output keeps the input order
     :return:
     """
 
     mapped_entity_list = []
-    schema = None
+    plan = get_mapping_plan(name)
 
-    if name in 'project':
-        schema = utils.load_schema_from_json(
-            path=str(Path(importlib.resources.files('fhirizer').parent / 'mapping' / 'project.json')))
-    elif name in 'case':
-        schema = utils.load_schema_from_json(
-            path=str(Path(importlib.resources.files('fhirizer').parent / 'mapping' / 'case.json')))
-    elif name in 'file':
-        schema = utils.load_schema_from_json(
-            path=str(Path(importlib.resources.files('fhirizer').parent / 'mapping' / 'file.json')))
-    if schema:
-        entities = utils.load_ndjson(path=in_path)
-
-        all_keys = [list(utils.extract_keys(e)) for e in entities]
-        keys = list(set().union(*all_keys))  # union of all keys
-
-        available_maps = [schema.find_map_by_source(k) for k in keys]
-        available_maps.append(schema.obj_mapping)
+    if plan:
+        entities = list(utils.iter_ndjson(path=in_path))
+        map_index = plan_map_index(plan)
 
         if verbose:
-            print("available_maps: ", available_maps)
+            print("available_maps: ", map_index.maps)
 
-        mapped_entity_list = [utils.map_data(e, available_maps, verbose=verbose)['mapped_data'] for e in entities]
+        mapped_entity_list = list(map_entities(entities, map_index, verbose=verbose, workers=workers))
 
         if out_path and convert:
             with open(out_path, 'w') as file:
@@ -341,3 +488,50 @@ def convert_maps(in_path, out_path, name, convert, verbose):
                 print(f"Successfully created mappings and saved to {out_path}")
 
     return mapped_entity_list
+
+
+def iter_convert_maps(in_path, name, verbose=False, workers=1):
+    """
+    Streaming convert_maps - reads, maps, and yields one GDC entity at a time in a single pass,
+    so memory is bounded by one record and the compiled mapping plan.
+
+    :param in_path: ndjson or ndjson.gz path of data scripted from GDC ex bmeg-etl script
+    :param name: project, case, or file GDC entity
+    :param verbose:
+    :param workers: Number of worker processes mapping entities, output keeps the input order
+    :return: Generator of mapped entities
+    """
+    plan = get_mapping_plan(name)
+    if not plan:
+        return
+
+    map_index = plan_map_index(plan)
+
+    if verbose:
+        print("available_maps: ", map_index.maps)
+
+    yield from map_entities(utils.iter_ndjson(path=in_path), map_index, verbose=verbose, workers=workers)
+
+
+def stream_convert_maps(in_path, out_path, name, verbose, workers=1):
+    """
+    fhirizer convert --stream - writes each mapped GDC entity to out_path as soon as it's mapped.
+    Output is identical to convert_maps.
+
+    :param in_path: ndjson or ndjson.gz path of data scripted from GDC ex bmeg-etl script
+    :param out_path: Path to save mapped result
+    :param name: project, case, or file GDC entity
+    :param verbose:
+    :param workers: Number of worker processes mapping entities
+    :return: Number of mapped entities
+    """
+    count = 0
+    with open(out_path, 'w') as file:
+        for mapped_entity in iter_convert_maps(in_path=in_path, name=name, verbose=verbose, workers=workers):
+            if count:
+                file.write('\n')
+            file.write(json.dumps(mapped_entity))
+            count += 1
+
+    print(f"Successfully created mappings of {count} entities and saved to {out_path}")
+    return count
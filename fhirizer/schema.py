@@ -1,6 +1,7 @@
 from __future__ import annotations
-from typing import List, Optional, Union, Dict
-from pydantic import BaseModel, Field
+import weakref
+from typing import ClassVar, List, Optional, Union, Dict
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 
 
 class Reference(BaseModel):
@@ -37,12 +38,11 @@ class Map(BaseModel):
     source: Source
     destination: Destination
 
-    # store maps internally with source name as key to access faster
-    _map_dict: Dict[str, Map] = {}
+    # latest Map built for each source name, weakly referenced so Map(s) are freed with their Schema
+    _registry: ClassVar[weakref.WeakValueDictionary] = weakref.WeakValueDictionary()
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self._map_dict[self.source.name] = self
+    def model_post_init(self, context):
+        Map._registry[self.source.name] = self
 
     @staticmethod
     def update_fields(model: BaseModel, values: Dict):
@@ -51,20 +51,87 @@ class Map(BaseModel):
 
     @staticmethod
     def update_values(source_name: str, source_values: Optional[Dict] = None,
-                      destination_values: Optional[Dict] = None):
-        map_instance = Map._map_dict.get(source_name)
+                      destination_values: Optional[Dict] = None, *, schema: Optional[Schema] = None):
+        """
+        Updates the source and destination fields of a Map by its source name.
+        With schema, the Map is found by the schema's source index, which is rebuilt if the Map is renamed.
+        Without schema, the latest Map built for source_name is updated.
+        """
+        map_instance = Map._find(source_name, schema)
         if map_instance:
             if source_values:
                 Map.update_fields(map_instance.source, source_values)
             if destination_values:
                 Map.update_fields(map_instance.destination, destination_values)
+            if 'name' in (source_values or {}):
+                if Map._registry.get(source_name) is map_instance:
+                    del Map._registry[source_name]
+                Map._registry[map_instance.source.name] = map_instance
+            if schema is not None and ('name' in (source_values or {}) or 'name' in (destination_values or {})):
+                schema.reindex()
 
     @classmethod
-    def find_source(cls, source_name: str) -> Optional[Source]:
-        map_instance = cls._map_dict.get(source_name)
+    def find_source(cls, source_name: str, *, schema: Optional[Schema] = None) -> Optional[Source]:
+        """Source of a Map by its source name, in schema or else the latest Map built for source_name."""
+        map_instance = cls._find(source_name, schema)
         if map_instance:
             return map_instance.source
 
+    @staticmethod
+    def _find(source_name: str, schema: Optional[Schema] = None) -> Optional[Map]:
+        if schema is not None:
+            return schema.find_map_by_source(source_name)
+        return Map._registry.get(source_name)
+
+
+class MapList(list):
+    """
+    List of a Schema's Map(s) that counts changes other than appending, so that Schema indexes only need to index
+    appended Map(s) and are rebuilt after any other change ex. pop, insert, or item assignment.
+    """
+    changes = 0
+
+    def _changed(self):
+        self.changes += 1
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._changed()
+
+    def __imul__(self, n):
+        result = super().__imul__(n)
+        self._changed()
+        return result
+
+    def insert(self, index, value):
+        super().insert(index, value)
+        self._changed()
+
+    def pop(self, index=-1):
+        value = super().pop(index)
+        self._changed()
+        return value
+
+    def remove(self, value):
+        super().remove(value)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._changed()
+
 
 class Version(BaseModel):
     source_version: Optional[str] = Field(None, description='GDC data dictionary version.')
@@ -108,16 +175,55 @@ class Schema(BaseModel):
             '$schema': 'http://json-schema.org/draft-07/schema#'
         }
 
+    # source and destination name indexes of mappings, extended as Map(s) are appended to mappings
+    _source_index: Dict[str, Map] = PrivateAttr(default_factory=dict)
+    _destination_index: Dict[str, Map] = PrivateAttr(default_factory=dict)
+    _indexed_mappings: Optional[List[Map]] = PrivateAttr(default=None)
+    _indexed_count: int = PrivateAttr(default=0)
+    _indexed_changes: int = PrivateAttr(default=0)
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+    @field_validator('mappings')
+    @classmethod
+    def track_mappings(cls, mappings: List[Map]) -> MapList:
+        return MapList(mappings)
+
+    def __setattr__(self, name, value):
+        if name == 'mappings' and not isinstance(value, MapList):
+            value = MapList(value)
+        super().__setattr__(name, value)
+
+    def _sync_indexes(self):
+        """Indexes Map(s) appended since the last lookup, rebuilds if mappings was replaced or changed otherwise."""
+        mappings = self.mappings
+        if (mappings is not self._indexed_mappings or mappings.changes != self._indexed_changes
+                or len(mappings) < self._indexed_count):
+            self.reindex()
+            return
+        for mapping in mappings[self._indexed_count:]:
+            self._source_index[mapping.source.name] = mapping
+            self._destination_index[mapping.destination.name] = mapping
+        self._indexed_count = len(mappings)
+
+    def reindex(self):
+        """Rebuilds the source and destination indexes ex. after Map(s) in mappings are replaced or renamed in place."""
+        self._source_index = {mapping.source.name: mapping for mapping in self.mappings}
+        self._destination_index = {mapping.destination.name: mapping for mapping in self.mappings}
+        self._indexed_mappings = self.mappings
+        self._indexed_count = len(self.mappings)
+        self._indexed_changes = self.mappings.changes
+
     @property
     def source_map_dict(self):
-        return {mapping.source.name: mapping for mapping in self.mappings}
+        self._sync_indexes()
+        return self._source_index
 
     @property
     def destination_map_dict(self):
-        return {mapping.destination.name: mapping for mapping in self.mappings}
+        self._sync_indexes()
+        return self._destination_index
 
     def find_map_by_source(self, source_name: str) -> Optional[Map]:
         return self.source_map_dict.get(source_name)
@@ -126,7 +232,7 @@ class Schema(BaseModel):
         return self.destination_map_dict.get(destination_name)
 
     def has_map_for_source(self, source_key: str) -> bool:
-        return any(mapping.source.name == source_key for mapping in self.mappings)
+        return source_key in self.source_map_dict
 
     def has_map_for_destination(self, destination_key: str) -> bool:
-        return any(mapping.destination.name == destination_key for mapping in self.mappings)
+        return destination_key in self.destination_map_dict
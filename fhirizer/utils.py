@@ -1,16 +1,28 @@
 import os
+import sys
 import orjson
 import time
 import random
 import sqlite3
+import pickle
 import json
 import glob
 import gzip
+import io
+import mmap
+import re
+import heapq
+import itertools
+import shutil
+import tempfile
+import contextlib
 import uuid
+import hashlib
+import functools
 import pprint
 import requests
 from bs4 import BeautifulSoup
-from fhirizer.schema import Schema
+from fhirizer.schema import Schema, Map
 from importlib.resources import files
 import importlib
 from pathlib import Path
@@ -31,6 +43,10 @@ DATA_DICT_PATH = "".join(
 FIELDS_PATH = "".join(
     [str(Path(importlib.resources.files('fhirizer').parent / 'resources' / 'gdc_resources' / 'fields')), "/"])
 package_dir = Path(importlib.resources.files('fhirizer').parent)
+# binary caches of package resources, kept out of the installed package
+CACHE_DIR_ENV = "FHIRIZER_CACHE_DIR"
+# distinct identifiers kept by the mint_id cache
+MINT_ID_CACHE_SIZE = 2 ** 18
 
 
 def extract_keys(data, parent_key=None, seen_keys=None):
@@ -217,6 +233,88 @@ def _read_json(path):
         print("Error decoding JSON: {}".format(e))
 
 
+CONTENT_ANNOTATIONS_PATH = package_dir / 'resources' / 'gdc_resources' / 'content_annotations'
+
+
+class AnnotationIndex:
+    """
+    Index of a content annotation list (ex. disease_types, race, cancer_pathological_staging) by each annotation's value.
+    Lookups return the matching annotations in list order, so the last match still wins when callers keep the last one.
+    Substring lookups are memoized per queried text.
+
+    ex. annotations [{'value': 'Breast'}, {'value': 'Breast, NOS'}]
+    find('Breast') -> [{'value': 'Breast'}]
+    find_containing('Breast') -> [{'value': 'Breast'}, {'value': 'Breast, NOS'}]
+    find_within('Breast, NOS') -> [{'value': 'Breast'}, {'value': 'Breast, NOS'}]
+    """
+
+    def __init__(self, annotations, key='value'):
+        self.annotations = annotations
+        self.key = key
+        self.exact = {}
+        for annotation in annotations:
+            self.exact.setdefault(annotation[key], []).append(annotation)
+        self._containing = {}
+        self._within = {}
+
+    def find(self, value) -> list:
+        """Annotations with value equal to value."""
+        try:
+            return self.exact.get(value, [])
+        except TypeError:
+            return [a for a in self.annotations if a[self.key] == value]
+
+    def _memoized(self, memo, text, match):
+        try:
+            matches = memo.get(text)
+        except TypeError:
+            return [a for a in self.annotations if match(a[self.key], text)]
+        if matches is None:
+            matches = memo[text] = [a for a in self.annotations if match(a[self.key], text)]
+        return matches
+
+    def find_containing(self, text) -> list:
+        """Annotations with a value containing text ex. text in annotation['value']"""
+        return self._memoized(self._containing, text, lambda value, _text: _text in value)
+
+    def find_within(self, text) -> list:
+        """Annotations with a value contained in text ex. annotation['value'] in text"""
+        return self._memoized(self._within, text, lambda value, _text: value in _text)
+
+
+_annotation_indexes = {}
+_content_annotation_indexes = {}
+
+
+def load_content_annotation_index(name) -> AnnotationIndex:
+    """
+    Loads a content annotation json once per process and indexes it.
+
+    :param name: Content annotation path under resources/gdc_resources/content_annotations without the .json extension
+    ex. 'diagnosis/cancer_pathological_staging'
+    :return: AnnotationIndex, the loaded list is AnnotationIndex.annotations
+    """
+    index = _content_annotation_indexes.get(name)
+    if index is None:
+        annotations = _read_json(str(CONTENT_ANNOTATIONS_PATH / f"{name}.json"))
+        index = _content_annotation_indexes[name] = AnnotationIndex(annotations)
+        _annotation_indexes[id(annotations)] = index
+    return index
+
+
+def annotation_index(annotations) -> AnnotationIndex:
+    """
+    Fetches the AnnotationIndex of a loaded content annotation list or indexes a list passed in by the caller.
+
+    :param annotations: List of content annotation dicts
+    :return: AnnotationIndex
+    """
+    index = _annotation_indexes.get(id(annotations))
+    if index is None or index.annotations is not annotations:
+        index = AnnotationIndex(annotations)
+    return index
+
+
 # --------------------------------------------------------------------------
 # GDC Utility functions
 # --------------------------------------------------------------------------
@@ -494,6 +592,112 @@ def load_data_dictionary(path=DATA_DICT_PATH):
     return all_dat
 
 
+def cache_dir() -> Path:
+    """
+    Directory of fhirizer's binary caches ex. the data dictionary snapshot, $FHIRIZER_CACHE_DIR if set,
+    else $XDG_CACHE_HOME/fhirizer or ~/.cache/fhirizer. The installed package is never written to.
+
+    :return: Path of the cache directory, it may not exist yet
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV])
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "fhirizer"
+
+
+def cache_path(source_path, suffix) -> Path:
+    """
+    Cache file of a source file or directory, named after the source and a hash of its absolute path
+    ex. cache_dir()/data_dictionary-1a2b3c4d5e6f7a8b.pickle
+
+    :param source_path: Path of the cached source file or directory
+    :param suffix: Cache file suffix ex. .pickle
+    :return: Path of the cache file in cache_dir
+    """
+    source_path = Path(source_path).resolve()
+    key = hashlib.sha256(str(source_path).encode("utf-8")).hexdigest()[:16]
+    return cache_dir() / "".join([source_path.name.split(".")[0], "-", key, suffix])
+
+
+def write_cache(path, obj):
+    """
+    Pickles an object to a cache file via a temporary file, a failure is reported on stderr and otherwise ignored.
+
+    :param path: Path of the cache file
+    :param obj: Object to cache
+    """
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name("".join([path.name, ".tmp"]))
+        with open(tmp_path, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Cache {path} was not saved: {e}", file=sys.stderr)
+
+
+def read_cache(path):
+    """
+    Unpickles a cache file.
+
+    :param path: Path of the cache file
+    :return: Cached object, None if the file doesn't exist or can't be unpickled ex. written by another version
+    """
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+        return None
+
+
+# data dictionaries loaded in this process keyed by path
+_data_dictionaries = {}
+
+
+def data_dictionary_signature(path=DATA_DICT_PATH) -> str:
+    """
+    Hash of the relative path, size and modification time of each data_dictionary json file.
+    Changes when a file is added, removed or edited, without reading any of them.
+
+    :param path: Path string to data_dictionary files
+    :return: sha256 hex digest
+    """
+    signature = hashlib.sha256()
+    for json_path in sorted(glob.glob("".join([path, "**/*.json"]))):
+        stat = os.stat(json_path)
+        signature.update(f"{json_path.replace(path, '')}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return signature.hexdigest()
+
+
+def get_data_dictionary(path=DATA_DICT_PATH, rebuild=False) -> dict:
+    """
+    Process-wide GDC data dictionary shared by mapping, entity2fhir and labels, loaded once per process.
+    The dictionary is saved as one binary snapshot in cache_dir, and rebuilt from the json files when it doesn't exist
+    or the files have changed since. Changes to the json files are picked up by the next process.
+
+    :param path: Path string to data_dictionary files "./resources/gdc_resources/data_dictionary/"
+    :param rebuild: Boolean to force rebuilding the snapshot from the json files
+    :return: Dictionary of GDC data_dictionaries, the same object for every caller - don't modify it
+    """
+    if not rebuild and path in _data_dictionaries:
+        return _data_dictionaries[path]
+
+    signature = data_dictionary_signature(path)
+    snapshot_path = cache_path(path, ".pickle")
+    data_dict = None
+    if not rebuild:
+        snapshot = read_cache(snapshot_path)
+        if isinstance(snapshot, tuple) and len(snapshot) == 2 and snapshot[0] == signature:
+            data_dict = snapshot[1]
+
+    if data_dict is None:
+        data_dict = load_data_dictionary(path=path)
+        write_cache(snapshot_path, (signature, data_dict))
+
+    _data_dictionaries[path] = data_dict
+    return data_dict
+
+
 def load_fields(path=FIELDS_PATH):
     """
     loads GDC fields in resources
@@ -670,6 +874,106 @@ def load_schema_from_json(path) -> Schema:
         return Schema.model_validate(data)
 
 
+class JSONTemplate:
+    """
+    JSON resource template ex. an Observation content annotation, precompiled to json bytes once.
+    build() decodes a fresh copy, the same result as copy.deepcopy of the json loaded template at a fraction of the cost.
+
+    ex. observation = JSONTemplate(biospecimen_observation).build()
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self._compiled = orjson.dumps(template)
+
+    def build(self):
+        return orjson.loads(self._compiled)
+
+
+class LazyResources:
+    """
+    Registry of reference resources (content annotations, annotation indexes, templates, dictionaries) loaded on first
+    attribute access and cached for the life of the process, so importing a module only registers its loaders.
+
+    ex. resources = LazyResources()
+    resources.register('gender_index', lambda: load_content_annotation_index('demographic/gender'))
+    resources.gender_index -> loads demographic/gender.json once, later accesses return the cached AnnotationIndex
+    """
+
+    def __init__(self):
+        self._loaders = {}
+
+    def register(self, name, loader):
+        """
+        Registers a resource loader, replacing any loaded value of the same name.
+
+        :param name: Attribute name of the resource
+        :param loader: Callable without arguments returning the resource
+        """
+        self._loaders[name] = loader
+        self.__dict__.pop(name, None)
+
+    def __getattr__(self, name):
+        # only called for names not loaded yet, private names are never resources
+        if name.startswith('_') or name not in self._loaders:
+            raise AttributeError(f"{type(self).__name__} has no resource {name!r}")
+        value = self._loaders[name]()
+        setattr(self, name, value)
+        return value
+
+    def __contains__(self, name):
+        return name in self._loaders
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def is_loaded(self, name) -> bool:
+        return name in self.__dict__
+
+    def load_all(self):
+        """Loads every registered resource not loaded yet ex. before forking worker processes."""
+        for name in self._loaders:
+            getattr(self, name)
+
+
+class ResourceList(list):
+    """
+    Ordered list of FHIR resources (dicts or models) indexed by resource id.
+    `resource in resources` only compares the resources sharing its id, with the same result as a list scan, and
+    has_id is a set lookup, so guarded appends over a case's samples, portions, analytes, and aliquots stay linear.
+    Add resources with append or extend, other list mutations are not indexed.
+
+    ex. observations = ResourceList()
+        if observation not in observations:
+            observations.append(observation)
+    """
+
+    def __init__(self, resources=()):
+        super().__init__()
+        self._ids = {}
+        self.extend(resources)
+
+    @staticmethod
+    def _resource_id(resource):
+        if isinstance(resource, dict):
+            return resource.get("id")
+        return getattr(resource, "id", None)
+
+    def has_id(self, resource_id):
+        return resource_id in self._ids
+
+    def append(self, resource):
+        super().append(resource)
+        self._ids.setdefault(self._resource_id(resource), []).append(resource)
+
+    def extend(self, resources):
+        for resource in resources:
+            self.append(resource)
+
+    def __contains__(self, resource):
+        return any(r is resource or r == resource for r in self._ids.get(self._resource_id(resource), ()))
+
+
 def load_ndjson(path):
     try:
         with open(path, 'r') as file:
@@ -689,6 +993,38 @@ def load_ndjsongz(path):
         return None
 
 
+def open_ndjson(path):
+    """
+    Opens an ndjson file for reading text lines, gzip compressed if the path ends with .gz and zstd compressed if it
+    ends with .zst
+
+    :param path: Path to ndjson, ndjson.gz, or ndjson.zst file
+    :return: File object
+    """
+    if str(path).endswith(".gz"):
+        return gzip.open(path, 'rt')
+    if str(path).endswith(".zst"):
+        zstd = _zstd()
+        if hasattr(zstd.ZstdDecompressor, "stream_reader"):
+            # zstandard package
+            return io.TextIOWrapper(zstd.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True))
+        return zstd.open(path, 'rt')
+    return open(path, 'r')
+
+
+def iter_ndjson(path):
+    """
+    Lazily reads an ndjson or ndjson.gz file one record at a time.
+
+    :param path: Path to ndjson or ndjson.gz file
+    :return: Generator of json records, blank lines are skipped
+    """
+    with open_ndjson(path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
 def is_deeply_nested_dict_list(nested_value):
     return isinstance(nested_value, list) and all(isinstance(item, dict) for item in nested_value)
 
@@ -864,10 +1200,227 @@ def append_data_to_key(data, target_key, data_to_append, verbose):
             append_data_to_key(value, target_key, data_to_append, verbose)
 
 
+class NestedListMerge:
+    """
+    Merges the single key fragments process_nested_list maps from a nested GDC list (ex. samples, portions, analytes,
+    aliquots) into one list of dicts, with the same result as append_data_to_key on {target_key: items}.
+    Items with a single key, ex. a Specimen.id.* head key opening the next list element, and the index below which
+    every item has a key are tracked, so a fragment only visits the items it may update instead of re-sorting and
+    rescanning the whole list.
+
+    ex. [{'Specimen.id.sample': 'a', 'X.c': 1}, {'Specimen.id.sample': 'b'}] + {'X.c': 2}
+    -> [{'Specimen.id.sample': 'a', 'X.c': 1}, {'Specimen.id.sample': 'b', 'X.c': 2}]
+    """
+
+    def __init__(self, items=None, verbose=False):
+        self.items = [] if items is None else items
+        self.verbose = verbose
+        # index -> key of items with a single key
+        self.singletons = {i: next(iter(item)) for i, item in enumerate(self.items) if len(item) == 1}
+        # key -> index below which every item has the key
+        self.filled = {}
+
+    def _append(self, fragment):
+        self.singletons[len(self.items)] = next(iter(fragment))
+        self.items.append(fragment)
+
+    def _update(self, i, fragment):
+        item = self.items[i]
+        item.update(fragment)
+        if len(item) > 1:
+            self.singletons.pop(i, None)
+
+    def _lacking(self, key):
+        return [i for i in range(self.filled.get(key, 0), len(self.items)) if key not in self.items[i]]
+
+    def merge(self, fragment):
+        """
+        Merges a single key fragment ex. {destination_key: value} or a nested list result {'portions': [...]}
+
+        :param fragment: Single key dict
+        :return: None
+        """
+        items = self.items
+        (key, value), = fragment.items()
+        if self.verbose:
+            print("=========== NestedListMerge fragment =============", fragment)
+
+        if not items:
+            self._append(fragment)
+            return
+
+        first = items[0]
+        if first.keys() == fragment.keys() and not fragment.items() <= first.items():
+            self._append(fragment)
+            return
+
+        if key in items[-1]:
+            first_value = first[key]
+            if isinstance(first_value, str) and isinstance(value, str):
+                if first_value != value:
+                    # update a Specimen.id head key item with its metadata, or open a new item
+                    heads = sorted(i for i, k in self.singletons.items() if "Specimen.id" in k and k != key)
+                    for i in heads:
+                        self._update(i, fragment)
+                    if not heads:
+                        self._append(fragment)
+                elif len(items) == 1:
+                    self._append(fragment)
+                elif not fragment.items() <= items[-1].items():
+                    self._update(len(items) - 1, fragment)
+                return
+
+            if isinstance(first_value, list) and isinstance(value, list):
+                targets = set(self.singletons)
+                if key in ('portions', 'aliquots'):
+                    targets.update(self._lacking(key))
+                for i in sorted(targets):
+                    if key == 'aliquots' and len(items[i]) != 1:
+                        print("data_to_append.keys() - d.keys()", fragment.keys() - items[i].keys())
+                    self._update(i, fragment)
+                if key in ('portions', 'aliquots'):
+                    self.filled[key] = len(items)
+                return
+
+        if len(items) > 1 and len(items[-1]) == 1:
+            self._update(len(items) - 1, fragment)
+            return
+
+        for i in self._lacking(key):
+            self._update(i, fragment)
+        self.filled[key] = len(items)
+
+
+class MapIndex:
+    """
+    Hash index of available Map(s) source -> destination key names keyed by the source name dot notation hierarchy.
+    The first Map listed for a source name is kept, same as a linear scan.
+    Nested list child keys are resolved lazily on first lookup of a prefix and memoized,
+    including misses, so each seen key path is resolved once per index.
+
+    A record scoped index, ex. all Maps of a compiled mapping plan, only returns Maps of key paths present in the
+    record being mapped, see for_record, except for unscoped_sources ex. the plan's object Map.
+
+    ex. Map with source name 'a.b.c' and destination name 'X.c':
+    source: {'a.b.c': 'X.c'}
+    nested after looking up ('a.b', 'c') and ('a.b', 'd'): {'a.b': {'c': 'X.c', 'd': None}}
+    """
+
+    def __init__(self, available_maps, record_scoped=False, unscoped_sources=()):
+        self.maps = []
+        self.source = {}
+        self.nested = {}
+        self.record_scoped = record_scoped
+        self.unscoped_sources = set(unscoped_sources)
+
+        for m in available_maps:
+            if not m:
+                continue
+            name, destination = (m.source.name, m.destination.name) if isinstance(m, Map) else m
+            if name in self.source:
+                continue
+            self.maps.append((name, destination))
+            self.source[name] = destination
+
+    def __len__(self):
+        return len(self.maps)
+
+    def find(self, source_name):
+        return self.source.get(source_name)
+
+    def find_nested(self, prefix, key):
+        children = self.nested.get(prefix)
+        if children is None:
+            children = self.nested[prefix] = {}
+        elif key in children:
+            return children[key]
+        destination = children[key] = self.find('.'.join([prefix, key]))
+        return destination
+
+    def for_record(self, record):
+        """
+        Index used to map one GDC record, a RecordMapIndex view if this index is record scoped.
+
+        :param record: GDC record dictionary
+        :return: MapIndex or RecordMapIndex
+        """
+        return RecordMapIndex(self, record) if self.record_scoped else self
+
+
+class RecordMapIndex:
+    """
+    View of a record scoped MapIndex while mapping one GDC record.
+    map_data traversal joins key paths that may not exist in the record, ex. a child key to the key path of its
+    mapped parent, a Map found for such a path is dropped. Found paths are looked up in the record once, the same
+    key paths extract_keys yields, so the available Maps are the same as filtering the index by this record's
+    extracted keys up front, not by the keys of every record in its file.
+    """
+
+    def __init__(self, map_index, record):
+        self.map_index = map_index
+        self.maps = map_index.maps
+        self.record = record
+        self._paths = {}
+
+    def __len__(self):
+        return len(self.map_index)
+
+    def _in_record(self, source_name):
+        if source_name in self.map_index.unscoped_sources:
+            return True
+        found = self._paths.get(source_name)
+        if found is None:
+            found = self._paths[source_name] = has_key_path(self.record, source_name.split("."))
+        return found
+
+    def find(self, source_name):
+        destination = self.map_index.find(source_name)
+        if destination is not None and self._in_record(source_name):
+            return destination
+
+    def find_nested(self, prefix, key):
+        destination = self.map_index.find_nested(prefix, key)
+        if destination is not None and self._in_record('.'.join([prefix, key])):
+            return destination
+
+
+def has_key_path(data, keys):
+    """
+    Checks if a key hierarchy is in a nested dictionary, list items are searched under their parent key same as
+    extract_keys.
+
+    :param data: Nested dictionary
+    :param keys: List of keys ex. 'a.b.c'.split('.')
+    :return: True if the key hierarchy is present
+    """
+    if isinstance(data, list):
+        return any(has_key_path(item, keys) for item in data)
+    if not isinstance(data, dict) or keys[0] not in data:
+        return False
+    return len(keys) == 1 or has_key_path(data[keys[0]], keys[1:])
+
+
+def build_map_index(available_maps, record_scoped=False, unscoped_sources=()) -> MapIndex:
+    """
+    Builds the source key index of available Map(s) used through map_data traversal.
+
+    :param available_maps: List of Map(s), (source, destination) name pairs, or None(s) ex. convert_maps available_maps
+    or an existing MapIndex.
+    :param record_scoped: Only use Maps of key paths present in the mapped record, ex. for all Maps of a mapping plan.
+    :param unscoped_sources: Source names used regardless of the record's keys when record scoped.
+    :return: MapIndex of available Map(s)
+    """
+    if isinstance(available_maps, MapIndex):
+        return available_maps
+    return MapIndex(available_maps, record_scoped=record_scoped, unscoped_sources=unscoped_sources)
+
+
 def process_nested_list(traverse_key, nested_value, current_keys, available_maps, verbose):
     tks = traverse_key.split(".")
     tks = tks[-1]
     this_nest = {tks: []}
+    merged = NestedListMerge(this_nest[tks], verbose=verbose)
+    prefix = '.'.join(current_keys + [traverse_key])
 
     for elm in nested_value:
         if isinstance(elm, dict):
@@ -876,27 +1429,22 @@ def process_nested_list(traverse_key, nested_value, current_keys, available_maps
 
             for key, value in elm.items():
                 if isinstance(value, list):
-                    current_key = '.'.join(current_keys + [traverse_key] + [key])
+                    current_key = '.'.join([prefix, key])
                     tks = traverse_key.split(".")
                     tks = tks[-1]
 
                     result = process_nested_list(current_key, value, current_keys, available_maps, verbose)
                     if verbose:
                         print("----- RESULT ----- ", type(result), result)
-                    append_data_to_key(this_nest, tks, result, verbose)
+                    merged.merge(result)
                     continue
 
-                current_key = '.'.join(current_keys + [traverse_key] + [key])
-                schema_map = next((m for m in available_maps if m and m.source.name == current_key), None)
+                destination_key = available_maps.find_nested(prefix, key)
 
-                if schema_map:
-                    destination_key = schema_map.destination.name
+                if destination_key is not None:
 
                     if not is_deeply_nested_dict_list(value) and not isinstance(value, list):
-                        if isinstance(this_nest[tks], list):
-                            append_data_to_key(this_nest, tks, {destination_key: value}, verbose)
-                        elif isinstance(this_nest[tks], dict):
-                            append_data_to_key(this_nest, tks, {destination_key: value}, verbose)
+                        merged.merge({destination_key: value})
 
     return this_nest
 
@@ -920,11 +1468,10 @@ def traverse_and_map(node, current_keys, mapped_data, available_maps, changed_ke
             current_key = '.'.join([changed_key[0]] + [key])
         else:
             current_key = '.'.join(current_keys + [key])
-        schema_map = next((m for m in available_maps if m and m.source.name == current_key), None)
+        # fetch the Map's destination
+        destination_key = available_maps.find(current_key)
 
-        if schema_map:
-            # fetch the Map's destination
-            destination_key = schema_map.destination.name
+        if destination_key is not None:
             # separate hierarchy key to track
             hierarchy_key = current_keys[0] if current_keys else None
 
@@ -967,6 +1514,7 @@ def traverse_and_map(node, current_keys, mapped_data, available_maps, changed_ke
 
 
 def map_data(data, available_maps, verbose):
+    available_maps = build_map_index(available_maps).for_record(data)
     mapped_data = {}
     traverse_and_map(data, [], mapped_data, available_maps, changed_key=None, verbose=verbose)
     if verbose:
@@ -1142,13 +1690,736 @@ def get_component(key, value=None, component_type=None,
     return component
 
 
-def fhir_ndjson(entity, out_path):
-    if isinstance(entity, list):
-        with open(out_path, 'w', encoding='utf8') as file:
-            file.write('\n'.join(map(lambda e: json.dumps(e, ensure_ascii=False), entity)))
+def fhir_ndjson(entity, out_path, **writer_options):
+    """
+    Writes a resource or a list of resources to an ndjson file with ndjson_writer, one resource at a time.
+
+    :param entity: resource dict or list of resource dicts
+    :param out_path: ndjson file path, the compression suffix is appended ex. Observation.ndjson.gz
+    :param writer_options: NDJSONWriter options overriding the configured ndjson_output
+    """
+    with ndjson_writer(out_path, **writer_options) as writer:
+        for resource in (entity if isinstance(entity, list) else [entity]):
+            writer.write(resource)
+    if not writer.count:
+        # an empty list still creates an empty file
+        remove_ndjson_paths(writer.base_path)
+        open(writer.path, 'wb').close()
+
+
+# NDJSONWriter compression and their file suffixes
+NDJSON_COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# bytes of encoded lines an NDJSONWriter buffers before writing
+NDJSON_BUFFER_SIZE = 2 ** 20
+
+# NDJSONWriter options of the FHIR ndjson files written by the transformers, set by fhirizer generate
+ndjson_output = {"compression": None, "compression_level": None, "max_bytes": None, "index": False}
+
+
+def configure_ndjson_output(compression=None, compression_level=None, max_bytes=None, index=False):
+    """
+    Sets the compression and rolling size of the FHIR ndjson files written by fhir_ndjson, merged shards and the
+    streaming transformers in this process.
+
+    :param compression: None, gzip, or zstd
+    :param compression_level: compression level, the codec's default if None
+    :param max_bytes: uncompressed size at which a file rolls over to <Type>.part-0001.ndjson, unlimited if None
+    :param index: write the companion .idx of uncompressed files
+    """
+    if compression not in (None, *NDJSON_COMPRESSION_SUFFIXES):
+        raise ValueError(f"Compression {compression} is not one of {list(NDJSON_COMPRESSION_SUFFIXES)}.")
+    if compression == "zstd":
+        # fail before transforming anything
+        _zstd()
+    ndjson_output.update(compression=compression, compression_level=compression_level, max_bytes=max_bytes,
+                         index=index)
+
+
+def ndjson_writer(path, **writer_options):
+    """
+    NDJSONWriter of a FHIR ndjson output file with the configured ndjson_output options, with index uncompressed
+    files are written with their companion .idx
+    """
+    options = {**ndjson_output, **writer_options}
+    if options["compression"]:
+        options["index"] = False
+    return NDJSONWriter(path, **options)
+
+
+def ndjson_paths(path) -> List[str]:
+    """
+    Existing files of an ndjson output written by NDJSONWriter in part order, the file and its rolled over parts ex.
+    Observation.ndjson, Observation.part-0001.ndjson ... each uncompressed or with a .gz or .zst suffix.
+
+    :param path: ndjson file path ex. META/Observation.ndjson, with or without its compression suffix
+    :return: list of file paths, empty if there are none
+    """
+    path = str(path)
+    for suffix in NDJSON_COMPRESSION_SUFFIXES.values():
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    folder, name = os.path.split(path)
+    if not os.path.isdir(folder or "."):
+        return []
+    stem, ext = (name[:-len(".ndjson")], ".ndjson") if name.endswith(".ndjson") else (name, "")
+    suffixes = "|".join(re.escape(suffix) for suffix in NDJSON_COMPRESSION_SUFFIXES.values())
+    pattern = re.compile(rf"{re.escape(stem)}(?:\.part-(\d{{4,}}))?{re.escape(ext)}(?:{suffixes})?")
+    parts = []
+    for file_name in os.listdir(folder or "."):
+        match = pattern.fullmatch(file_name)
+        if match:
+            parts.append((int(match.group(1) or 0), file_name))
+    return [os.path.join(folder, file_name) for _, file_name in sorted(parts)]
+
+
+def is_compressed_ndjson(path) -> bool:
+    """True if path is a gzip or zstd compressed ndjson file ex. Observation.ndjson.gz"""
+    return str(path).endswith(tuple(NDJSON_COMPRESSION_SUFFIXES.values()))
+
+
+def iter_ndjson_parts(path):
+    """
+    Lazily reads the resources of an ndjson output and its rolled over parts, compressed or not, in part order.
+
+    :param path: ndjson file path ex. META/Patient.ndjson
+    :return: Generator of json records
+    """
+    paths = ndjson_paths(path)
+    if not paths:
+        raise FileNotFoundError(f"No ndjson file or parts of {path}")
+    for part_path in paths:
+        yield from iter_ndjson(part_path)
+
+
+def remove_ndjson_paths(path):
+    """Removes the files of an ndjson output found by ndjson_paths, and their companion .idx"""
+    for part_path in ndjson_paths(path):
+        os.remove(part_path)
+        if os.path.exists("".join([part_path, ".idx"])):
+            os.remove("".join([part_path, ".idx"]))
+
+
+def replace_ndjson(path, resources, **writer_options) -> List[str]:
+    """
+    Rewrites an ndjson output with ndjson_writer to a temporary directory next to its folder, then replaces the
+    existing files and parts of path with the written ones, so no stale parts of a former run are left.
+
+    :param path: ndjson file path ex. META/Observation.ndjson
+    :param resources: iterable of resource dicts
+    :param writer_options: NDJSONWriter options overriding the configured ndjson_output
+    :return: list of written file paths
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryDirectory(prefix=f".{os.path.basename(folder)}-", dir=os.path.dirname(folder)) as tmp_dir:
+        with ndjson_writer(os.path.join(tmp_dir, os.path.basename(str(path))), **writer_options) as writer:
+            for resource in resources:
+                writer.write(resource)
+        remove_ndjson_paths(path)
+        written = []
+        for part_path in writer.paths:
+            target = os.path.join(os.path.dirname(str(path)), os.path.basename(part_path))
+            os.replace(part_path, target)
+            if os.path.exists("".join([part_path, ".idx"])):
+                os.replace("".join([part_path, ".idx"]), "".join([target, ".idx"]))
+            written.append(target)
+    return written
+
+
+def _zstd():
+    try:
+        from compression import zstd  # python >= 3.14
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise ImportError("zstd compression requires python >= 3.14 or the zstandard package: "
+                          "pip install zstandard")
+
+
+def _json_default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if hasattr(obj, "tolist"):
+        # numpy scalars and arrays ex. of pandas columns
+        return obj.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class NDJSONWriter:
+    """
+    Writes resources to an ndjson file one at a time as json.dumps encoded lines, with the same bytes and layout as
+    the former fhir_ndjson, so META files and their goldens don't change with the writer.
+    Lines are buffered up to buffer_size bytes, optionally gzip or zstd compressed, and with max_bytes the file rolls
+    over to <stem>.part-0001.ndjson, <stem>.part-0002.ndjson ... once a part would exceed max_bytes uncompressed.
+    With index, each uncompressed file is written with its companion .idx ex. Observation.ndjson.idx.
+    The file is created on the first write, so a writer without resources leaves no file, and files of a former run
+    with other parts or compression ex. Observation.part-0003.ndjson or Observation.ndjson.gz are removed then.
+
+    ex. with NDJSONWriter("META/Observation.ndjson", compression="gzip") as writer:
+            writer.write(observation)
+    writer.paths -> ['META/Observation.ndjson.gz']
+    """
+
+    def __init__(self, path, ensure_ascii=False, compression=None, compression_level=None, max_bytes=None,
+                 buffer_size=NDJSON_BUFFER_SIZE, index=False):
+        """
+        :param path: ndjson file path, the compression suffix is appended if missing
+        :param ensure_ascii: escape non-ASCII characters ex. for mapped keys, written as UTF-8 otherwise
+        :param compression: None, gzip, or zstd
+        :param compression_level: compression level, the codec's default if None
+        :param max_bytes: uncompressed bytes per file before rolling over to the next part, unlimited if None
+        :param buffer_size: bytes of encoded lines buffered before writing
+        :param index: write the companion .idx of each file, for uncompressed files only
+        """
+        if compression not in (None, *NDJSON_COMPRESSION_SUFFIXES):
+            raise ValueError(f"Compression {compression} is not one of {list(NDJSON_COMPRESSION_SUFFIXES)}.")
+        if index and compression:
+            raise ValueError("Only uncompressed ndjson files are indexed.")
+        self.suffix = NDJSON_COMPRESSION_SUFFIXES.get(compression, "")
+        path = str(path)
+        self.base_path = path[:-len(self.suffix)] if self.suffix and path.endswith(self.suffix) else path
+        self.path = "".join([self.base_path, self.suffix])
+        self.ensure_ascii = ensure_ascii
+        self.compression = compression
+        self.compression_level = compression_level
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.index = index
+        self.count = 0
+        self.paths = []
+        self._file = None
+        self._raw = None
+        self._buffer = []
+        self._buffered = 0
+        self._part_bytes = 0
+        self._id_index = None
+        self._indexed = []
+
+    def part_path(self, part) -> str:
+        """Path of a rolled over part, part 0 is path ex. Observation.part-0001.ndjson.gz"""
+        if not part:
+            return self.path
+        stem, ext = (self.base_path[:-len(".ndjson")], ".ndjson") if self.base_path.endswith(".ndjson") \
+            else (self.base_path, "")
+        return f"{stem}.part-{part:04d}{ext}{self.suffix}"
+
+    def _open(self):
+        if not self.paths:
+            # parts or other compressions of a former run
+            remove_ndjson_paths(self.base_path)
+        path = self.part_path(len(self.paths))
+        if self.compression == "gzip":
+            level = 6 if self.compression_level is None else self.compression_level
+            self._file = gzip.open(path, 'wb', compresslevel=level)
+        elif self.compression == "zstd":
+            zstd = _zstd()
+            level = 3 if self.compression_level is None else self.compression_level
+            if hasattr(zstd.ZstdCompressor, "stream_writer"):
+                # zstandard package
+                self._raw = open(path, 'wb')
+                self._file = zstd.ZstdCompressor(level=level).stream_writer(self._raw)
+            else:
+                self._file = zstd.open(path, 'wb', level=level)
+        else:
+            self._file = open(path, 'wb')
+        if self.index:
+            self._id_index = NDJSONIdIndex(path)
+        self.paths.append(path)
+        self._part_bytes = 0
+
+    def _dumps(self, resource) -> bytes:
+        return json.dumps(resource, ensure_ascii=self.ensure_ascii, default=_json_default).encode()
+
+    def write(self, resource):
+        self._write(self._dumps(resource), resource.get("id") if isinstance(resource, dict) else None)
+
+    def write_line(self, line: bytes):
+        """Writes an encoded json line without its newline ex. a line copied from an ndjson shard."""
+        resource_id = None
+        if self.index:
+            resource = orjson.loads(line)
+            resource_id = resource.get("id") if isinstance(resource, dict) else None
+        self._write(line, resource_id)
+
+    def _write(self, line, resource_id):
+        if self._file is None:
+            self._open()
+        elif self.max_bytes and self._part_bytes + 1 + len(line) > self.max_bytes:
+            self._close_part()
+            self._open()
+        else:
+            self._buffer.append(b'\n')
+            self._buffered += 1
+            self._part_bytes += 1
+        if self._id_index is not None and resource_id is not None:
+            self._indexed.append((str(resource_id), self._part_bytes, len(line)))
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self._part_bytes += len(line)
+        self.count += 1
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(b''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+        if self._indexed:
+            self._id_index.record(self._indexed)
+            self._indexed = []
+
+    def _close_part(self):
+        self.flush()
+        self._file.close()
+        if self._raw is not None:
+            self._raw.close()
+            self._raw = None
+        self._file = None
+        if self._id_index is not None:
+            self._id_index.commit()
+            self._id_index.close()
+            self._id_index = None
+
+    def close(self):
+        if self._file is not None:
+            self._close_part()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class IdSet:
+    """
+    Compact set of resource keys ex. Observation/<id>, kept as 16 byte blake2b digests instead of resources or id
+    strings. With path, the digests are kept in an on-disk sqlite index instead, for runs with more ids than fit in
+    memory.
+
+    ex. seen = IdSet()
+        if seen.add(f"Observation/{observation['id']}"):
+            writer.write(observation)
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._ids = set()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path)
+            self._db.execute("PRAGMA journal_mode=OFF")
+            self._db.execute("PRAGMA synchronous=OFF")
+            self._db.execute("CREATE TABLE IF NOT EXISTS ids (id BLOB PRIMARY KEY) WITHOUT ROWID")
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+    def __contains__(self, key):
+        digest = self._digest(key)
+        if self._db is None:
+            return digest in self._ids
+        return self._db.execute("SELECT 1 FROM ids WHERE id = ?", (digest,)).fetchone() is not None
+
+    def add(self, key) -> bool:
+        """Adds key, returns False if key was already in the set."""
+        digest = self._digest(key)
+        if self._db is None:
+            if digest in self._ids:
+                return False
+            self._ids.add(digest)
+            return True
+        return self._db.execute("INSERT OR IGNORE INTO ids VALUES (?)", (digest,)).rowcount == 1
+
+    def __len__(self):
+        if self._db is None:
+            return len(self._ids)
+        return self._db.execute("SELECT COUNT(*) FROM ids").fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class NDJSONIdIndex:
+    """
+    Companion .idx of an ndjson file ex. META/Observation.ndjson.idx, a sqlite index of the byte offset and length
+    of each id's latest line. NDJSONWriter writes it alongside META files, NDJSONReader fetches resources by id with
+    it, and create_or_extend(append=True) appends resources with new ids instead of rewriting the file.
+
+    The index records the file size and a hash of its last bytes when committed. On open, lines appended after the
+    last commit ex. by an interrupted run are indexed, a partially written last line is truncated, and a file
+    rewritten by another writer is indexed again from the start.
+    Opened read_only ex. by NDJSONReader, neither the .idx nor the ndjson file are written: an up to date .idx is
+    read as is, a missing or stale one is built or brought up to date in memory, and a partially written last line
+    ex. of a writer mid-flush is skipped.
+
+    ex. with NDJSONIdIndex("META/Observation.ndjson") as index:
+            index.append(observations)
+    """
+
+    TAIL_SIZE = 4096
+
+    def __init__(self, ndjson_path, read_only=False):
+        """
+        :param ndjson_path: ndjson file path ex. META/Observation.ndjson
+        :param read_only: never write the .idx or the ndjson file
+        """
+        self.ndjson_path = str(ndjson_path)
+        self.path = "".join([self.ndjson_path, ".idx"])
+        self.read_only = read_only
+        if not read_only:
+            self._db = sqlite3.connect(self.path)
+        elif os.path.exists(self.path):
+            self._db = sqlite3.connect(f"{Path(self.path).absolute().as_uri()}?mode=ro", uri=True)
+            if not self._is_current():
+                # brought up to date in a memory copy
+                memory = sqlite3.connect(":memory:")
+                self._db.backup(memory)
+                self._db.close()
+                self._db = memory
+        else:
+            self._db = sqlite3.connect(":memory:")
+        self._db.execute("CREATE TABLE IF NOT EXISTS ids (id TEXT PRIMARY KEY, offset INTEGER, length INTEGER) "
+                         "WITHOUT ROWID")
+        self._db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value)")
+        self.sync()
+
+    def _tail_hash(self, size) -> str:
+        if not size:
+            return ""
+        with open(self.ndjson_path, 'rb') as file:
+            file.seek(max(0, size - self.TAIL_SIZE))
+            return hashlib.blake2b(file.read(size - file.tell()), digest_size=16).hexdigest()
+
+    def _state(self) -> dict:
+        return dict(self._db.execute("SELECT key, value FROM state").fetchall())
+
+    def commit(self):
+        """Commits the indexed lines with the current size and tail hash of the ndjson file."""
+        size = os.path.getsize(self.ndjson_path) if os.path.exists(self.ndjson_path) else 0
+        self._db.executemany("INSERT OR REPLACE INTO state VALUES (?, ?)",
+                             [("size", size), ("tail", self._tail_hash(size))])
+        self._db.commit()
+
+    def _is_current(self) -> bool:
+        size = os.path.getsize(self.ndjson_path) if os.path.exists(self.ndjson_path) else 0
+        try:
+            state = self._state()
+        except sqlite3.OperationalError:
+            # an empty .idx being created by a writer
+            return False
+        return bool(state) and state.get("size") == size and state["tail"] == self._tail_hash(size)
+
+    def sync(self):
+        """Brings the index up to date with the ndjson file."""
+        if self._is_current():
+            return
+        size = os.path.getsize(self.ndjson_path) if os.path.exists(self.ndjson_path) else 0
+        state = self._state()
+        indexed_size = state.get("size", 0)
+        if state and indexed_size < size and state["tail"] == self._tail_hash(indexed_size):
+            start = indexed_size
+        else:
+            self._db.execute("DELETE FROM ids")
+            start = 0
+
+        if size:
+            partial = None
+            with open(self.ndjson_path, 'rb') as file:
+                file.seek(start)
+                offset = start
+                for line in file:
+                    content = line.rstrip(b'\n')
+                    try:
+                        item = orjson.loads(content)
+                    except orjson.JSONDecodeError:
+                        if not line.endswith(b'\n'):
+                            partial = offset
+                        offset += len(line)
+                        continue
+                    if isinstance(item, dict) and "id" in item:
+                        self._db.execute("INSERT OR REPLACE INTO ids VALUES (?, ?, ?)",
+                                         (str(item["id"]), offset, len(content)))
+                    offset += len(line)
+            if partial is not None and not self.read_only:
+                # last line of an interrupted append
+                os.truncate(self.ndjson_path, partial)
+        self.commit()
+
+    def _ends_with_newline(self, size) -> bool:
+        with open(self.ndjson_path, 'rb') as file:
+            file.seek(size - 1)
+            return file.read(1) == b'\n'
+
+    def record(self, entries):
+        """
+        Indexes lines written to the ndjson file, committed by commit().
+
+        :param entries: iterable of (id, offset, length) of each line
+        """
+        self._db.executemany("INSERT OR REPLACE INTO ids VALUES (?, ?, ?)", entries)
+
+    def ids(self):
+        """Indexed ids in id order."""
+        for (resource_id,) in self._db.execute("SELECT id FROM ids ORDER BY id"):
+            yield resource_id
+
+    def get(self, resource_id):
+        """(offset, length) of the latest line of resource_id, None if it isn't in the file."""
+        return self._db.execute("SELECT offset, length FROM ids WHERE id = ?", (str(resource_id),)).fetchone()
+
+    def __contains__(self, resource_id):
+        return self.get(resource_id) is not None
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM ids").fetchone()[0]
+
+    def append(self, items, update_existing=False) -> tuple[int, int]:
+        """
+        Appends resources with new ids, and with update_existing new versions of existing ids superseding their
+        former lines until compact().
+
+        :param items: iterable of resource dicts
+        :param update_existing: append new versions of resources already in the file
+        :return: (number of resources added, number of resources updated)
+        """
+        added, updated = 0, 0
+        offset = os.path.getsize(self.ndjson_path) if os.path.exists(self.ndjson_path) else 0
+        file = None
+        try:
+            for item in items:
+                resource_id = item["id"]
+                existing = resource_id in self
+                if existing and not update_existing:
+                    continue
+                if file is None:
+                    # opened on the first new resource, so nothing to append leaves no file
+                    file = open(self.ndjson_path, 'ab')
+                    if offset and not self._ends_with_newline(offset):
+                        file.write(b'\n')
+                        offset += 1
+                line = orjson.dumps(item)
+                file.write(line + b'\n')
+                self._db.execute("INSERT OR REPLACE INTO ids VALUES (?, ?, ?)", (str(resource_id), offset, len(line)))
+                offset += len(line) + 1
+                if existing:
+                    updated += 1
+                else:
+                    added += 1
+        finally:
+            if file is not None:
+                file.flush()
+                os.fsync(file.fileno())
+                file.close()
+        self.commit()
+        return added, updated
+
+    def compact(self) -> int:
+        """
+        Rewrites the ndjson file without superseded lines, each id keeping its first position and latest resource,
+        the same result as create_or_extend(update_existing=True). The file is replaced atomically, ending with a
+        newline only if it did, ex. as written by NDJSONWriter.
+
+        :return: number of lines removed
+        """
+        if not os.path.exists(self.ndjson_path):
+            return 0
+        with open(self.ndjson_path, 'rb') as file:
+            if sum(1 for line in file if line.strip()) == len(self):
+                # nothing superseded
+                return 0
+        lines, kept = 0, 0
+        trailing_newline = self._ends_with_newline(os.path.getsize(self.ndjson_path))
+        tmp_path = "".join([self.ndjson_path, ".tmp"])
+        written = IdSet()
+        with open(self.ndjson_path, 'rb') as file, open(self.ndjson_path, 'rb') as latest, open(tmp_path, 'wb') as tmp:
+            for line in file:
+                content = line.rstrip(b'\n')
+                lines += 1
+                try:
+                    resource_id = str(orjson.loads(content)["id"])
+                except (orjson.JSONDecodeError, KeyError, TypeError):
+                    continue
+                if written.add(resource_id):
+                    offset, length = self.get(resource_id)
+                    latest.seek(offset)
+                    tmp.write((b'\n' if kept else b'') + latest.read(length))
+                    kept += 1
+            if kept and trailing_newline:
+                tmp.write(b'\n')
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.ndjson_path)
+        self._db.execute("DELETE FROM state")
+        self.sync()
+        return lines - kept
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NDJSONReader:
+    """
+    Random access to the resources of an ndjson file and its rolled over parts by id, through their companion .idx
+    and memory-mapped files, so only the requested lines are parsed. A missing or stale .idx is built or brought up to
+    date in memory on open, a reader never writes to META, so it may be read-only or written concurrently.
+    A resource id in several parts is read from the latest part. Compressed files can't be mapped and are read with
+    iter_ndjson_parts instead.
+
+    ex. with NDJSONReader("META/Observation.ndjson") as observations:
+            observation = observations.get(observation_id)
+            focus_observations = list(observations.iter_ids(observation_ids))
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.paths = ndjson_paths(self.path)
+        if not self.paths:
+            raise FileNotFoundError(f"No ndjson file or parts of {self.path}")
+        compressed = [part_path for part_path in self.paths if is_compressed_ndjson(part_path)]
+        if compressed:
+            raise ValueError(f"{compressed[0]} is compressed, NDJSONReader reads uncompressed ndjson files.")
+        self._parts = []
+        try:
+            for part_path in self.paths:
+                index = NDJSONIdIndex(part_path, read_only=True)
+                file = open(part_path, 'rb')
+                # an empty file can't be mapped
+                mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(part_path) else None
+                self._parts.append((index, file, mm))
+        except BaseException:
+            self.close()
+            raise
+
+    def get(self, resource_id, default=None):
+        """Resource of resource_id, default if it isn't in the file."""
+        for index, _, mm in reversed(self._parts):
+            entry = index.get(resource_id)
+            if entry is not None:
+                offset, length = entry
+                return orjson.loads(mm[offset:offset + length])
+        return default
+
+    def __getitem__(self, resource_id):
+        resource = self.get(resource_id)
+        if resource is None:
+            raise KeyError(resource_id)
+        return resource
+
+    def __contains__(self, resource_id):
+        return any(resource_id in index for index, _, _ in self._parts)
+
+    def __len__(self):
+        if len(self._parts) == 1:
+            return len(self._parts[0][0])
+        return sum(1 for _ in self.ids())
+
+    def iter_ids(self, resource_ids):
+        """Resources of resource_ids in the given order, ids not in the file are skipped."""
+        for resource_id in resource_ids:
+            resource = self.get(resource_id)
+            if resource is not None:
+                yield resource
+
+    def ids(self):
+        """Ids in the file and its parts in id order."""
+        if len(self._parts) == 1:
+            return self._parts[0][0].ids()
+        return (resource_id for resource_id, _ in
+                itertools.groupby(heapq.merge(*(index.ids() for index, _, _ in self._parts))))
+
+    def close(self):
+        for index, file, mm in self._parts:
+            if mm is not None:
+                mm.close()
+            file.close()
+            index.close()
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@contextlib.contextmanager
+def shard_directory(out_dir):
+    """
+    Temporary directory for worker shards of a META directory, created next to it ex. ./.META-shards-k2j4h1, so that
+    shards are merged on the same file system and tools scanning META never see them. It's removed when the block
+    exits, also on errors.
+
+    :param out_dir: META directory the shards are merged into
+    :return: Context manager of the shard directory path
+    """
+    out_dir = os.path.abspath(out_dir)
+    shard_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(out_dir)}-shards-", dir=os.path.dirname(out_dir))
+    try:
+        yield shard_dir
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+def shard_path(shard_dir, resource_type, shard) -> str:
+    """Path of a resource type's ndjson shard ex. Observation.part-0003.ndjson"""
+    return os.path.join(shard_dir, f"{resource_type}.part-{shard:04d}.ndjson")
+
+
+def iter_shard_lines(shard_paths):
+    """Non-empty encoded lines of ndjson shard files in shard order, missing shards are skipped."""
+    for path in shard_paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as shard:
+            for line in shard:
+                line = line.rstrip(b'\n')
+                if line:
+                    yield line
+
+
+def merge_ndjson_shards(shard_paths, out_path, dedup=True, **writer_options) -> int:
+    """
+    Merges ndjson shard files, in shard order, into one ndjson file with the fhir_ndjson layout, written by
+    ndjson_writer.
+    With dedup, each id keeps its first position and the line of its last shard, the same result as deduplicating
+    the resources of all shards by id. A shard line without a resourceType ex. {"id": "..."} drops its id, for
+    resources that failed validation after they were deduplicated within their shard.
+
+    :param shard_paths: ordered list of ndjson shard paths, missing shards are skipped
+    :param out_path: path of the merged ndjson file, written only if there are resources
+    :param dedup: deduplicate resources by id, without dedup lines are copied as they're read
+    :param writer_options: NDJSONWriter options overriding the configured ndjson_output
+    :return: number of resources written
+    """
+    if dedup:
+        lines = {}
+        for line in iter_shard_lines(shard_paths):
+            resource = orjson.loads(line)
+            lines[resource["id"]] = line if "resourceType" in resource else None
+        lines = (line for line in lines.values() if line is not None)
     else:
-        with open(out_path, 'w', encoding='utf8') as file:
-            file.write(json.dumps(entity, ensure_ascii=False))
+        lines = iter_shard_lines(shard_paths)
+
+    with ndjson_writer(out_path, **writer_options) as writer:
+        for line in lines:
+            writer.write_line(line)
+    return writer.count
 
 
 def mint_id(identifier, resource_type, project_id, namespace) -> str:
@@ -1163,9 +2434,45 @@ def mint_id(identifier, resource_type, project_id, namespace) -> str:
 
 def _mint_id(identifier_string: str, project_id: str, namespace: UUID) -> str:
     """Create a UUID from an identifier, insert project_id."""
+    if isinstance(identifier_string, str):
+        return _mint_id_cached(identifier_string, project_id, namespace)
+    # ex. a list of Identifier(s) minted by its repr
     return str(uuid5(namespace, f"{project_id}/{identifier_string}"))
 
 
+@functools.lru_cache(maxsize=MINT_ID_CACHE_SIZE)
+def _mint_id_cached(identifier_string: str, project_id: str, namespace: UUID) -> str:
+    """Memoized _mint_id of identifier strings ex. a Patient id minted for each of its files."""
+    return str(uuid5(namespace, f"{project_id}/{identifier_string}"))
+
+
+def mint_ids(values, resource_type, system, project_id, namespace):
+    """
+    Batch mint_id of identifier values sharing a system ex. a pandas column of donor ids, minting each distinct value
+    once. Ids are the same as mint_id of Identifier(system=system, value=value).
+
+    :param values: list or pandas Series of identifier values
+    :param resource_type: FHIR resource type of the identified resources
+    :param system: identifier system
+    :param project_id: project id inserted in the minted name
+    :param namespace: UUID5 namespace
+    :return: list of ids, or a pandas Series of ids with the values' index
+    """
+    minted = {value: _mint_id_cached(f"{resource_type}/{system}|{value}", project_id, namespace)
+              for value in set(values)}
+    if hasattr(values, "map"):
+        return values.map(minted)
+    return [minted[value] for value in values]
+
+
+def mint_id_cache_report() -> str:
+    """Reports the mint_id cache hit rate of this process."""
+    info = _mint_id_cached.cache_info()
+    calls = info.hits + info.misses
+    hit_rate = info.hits / calls if calls else 0.0
+    return f"Minted ids: {calls} calls, {info.misses} minted, {hit_rate:.1%} cache hit rate"
+
+
 def is_valid_fhir_resource_type(resource_type):
     try:
         model_class = get_fhir_model_class(resource_type)
@@ -1174,33 +2481,69 @@ def is_valid_fhir_resource_type(resource_type):
         return False
 
 
-def create_or_extend(new_items, folder_path='META', resource_type='Observation', update_existing=False):
+def create_or_extend(new_items, folder_path='META', resource_type='Observation', update_existing=False,
+                     append=False, keep_index=True):
+    """
+    Creates or extends META/<resource_type>.ndjson with new_items by id.
+
+    By default the file is read, merged and rewritten to a temporary file renamed over it. With append, only
+    resources with new ids (or with update_existing, new versions) are appended, using the .idx NDJSONIdIndex
+    of the file, superseded versions are removed by compact_ndjson.
+    Rolled over or compressed files ex. META/Observation.ndjson.gz, or a configured ndjson_output rolling over or
+    compressing files, are always read with their parts, merged and rewritten with replace_ndjson.
+
+    :param new_items: iterable of resource dicts
+    :param folder_path: META directory
+    :param resource_type: FHIR resource type of the ndjson file
+    :param update_existing: replace resources already in the file by the new version of their id
+    :param append: append to the file using its .idx id index instead of rewriting it
+    :param keep_index: keep the .idx built by append, an .idx that already existed is always kept
+    :return: number of new_items added or updated
+    """
     assert is_valid_fhir_resource_type(resource_type), f"Invalid resource type: {resource_type}"
 
     file_name = "".join([resource_type, ".ndjson"])
     file_path = os.path.join(folder_path, file_name)
 
-    file_existed = os.path.exists(file_path)
-
-    existing_data = {}
-
-    if file_existed:
-        with open(file_path, 'r') as file:
-            for line in file:
-                try:
-                    item = orjson.loads(line)
-                    existing_data[item.get("id")] = item
-                except orjson.JSONDecodeError:
-                    continue
-
-    for new_item in new_items:
-        new_item_id = new_item["id"]
-        if new_item_id not in existing_data or update_existing:
-            existing_data[new_item_id] = new_item
+    paths = ndjson_paths(file_path)
+    file_existed = bool(paths)
+    # a single uncompressed file, and no configured ndjson_output to roll over or compress it to
+    plain = (not paths or [os.path.basename(path) for path in paths] == [file_name]) and \
+        not (ndjson_output["compression"] or ndjson_output["max_bytes"])
+
+    if plain and append:
+        index_existed = os.path.exists("".join([file_path, ".idx"]))
+        with NDJSONIdIndex(file_path) as index:
+            written = sum(index.append(new_items, update_existing=update_existing))
+        if not (keep_index or index_existed):
+            os.remove(index.path)
+    else:
+        existing_data = {}
+
+        for path in paths:
+            with open_ndjson(path) as file:
+                for line in file:
+                    try:
+                        item = orjson.loads(line)
+                        existing_data[item.get("id")] = item
+                    except orjson.JSONDecodeError:
+                        continue
 
-    with open(file_path, 'w') as file:
-        for item in existing_data.values():
-            file.write(orjson.dumps(item).decode('utf-8') + '\n')
+        written = 0
+        for new_item in new_items:
+            new_item_id = new_item["id"]
+            if new_item_id not in existing_data or update_existing:
+                existing_data[new_item_id] = new_item
+                written += 1
+
+        if plain:
+            tmp_path = "".join([file_path, ".tmp"])
+            with open(tmp_path, 'w') as file:
+                for item in existing_data.values():
+                    file.write(orjson.dumps(item).decode('utf-8') + '\n')
+            os.replace(tmp_path, file_path)
+        else:
+            replace_ndjson(file_path, existing_data.values())
 
     if file_existed:
         if update_existing:
@@ -1209,6 +2552,32 @@ def create_or_extend(new_items, folder_path='META', resource_type='Observation',
             print(f"{file_name} has been extended, without updating existing data.")
     else:
         print(f"{file_name} has been created.")
+    return written
+
+
+def compact_ndjson(path) -> int:
+    """
+    Removes superseded resources of an ndjson file extended with create_or_extend(append=True), keeping each id's
+    latest resource at its first position. Files without a .idx id index are indexed first.
+
+    Rolled over or compressed files are read with their parts and rewritten with replace_ndjson in the same
+    compression.
+
+    :param path: ndjson file path ex. META/Observation.ndjson
+    :return: number of lines removed
+    """
+    paths = ndjson_paths(path)
+    if len(paths) > 1 or (paths and is_compressed_ndjson(paths[0])):
+        resources, lines = {}, 0
+        for resource in iter_ndjson_parts(path):
+            resources[resource["id"]] = resource
+            lines += 1
+        compression = next((compression for compression, suffix in NDJSON_COMPRESSION_SUFFIXES.items()
+                            if paths[0].endswith(suffix)), None)
+        replace_ndjson(path, resources.values(), compression=compression)
+        return lines - len(resources)
+    with NDJSONIdIndex(path) as index:
+        return index.compact()
 
 
 def get_chembl_compound_info(db_file_path: str, drug_names: list, limit: int) -> list:
@@ -1276,39 +2645,48 @@ def create_researchstudy_group(patient_references: list, study_name: str, projec
 
 
 def study_groups(meta_path: str, out_path: str) -> List[Group]:
+    """
+    Creates a Group of study participant Patients per ResearchStudy in a META folder and writes them to Group.ndjson.
+
+    ResearchSubject and Patient files are joined in one streaming pass on hashed ids: Patient ids are counted, then
+    each ResearchSubject whose Patient exists is added to its study's members, so membership keeps the
+    ResearchSubject file order.
+
+    :param meta_path: Path to META folder with ResearchStudy, ResearchSubject, and Patient ndjson files
+    :param out_path: Path to folder to save the Group.ndjson file
+    :return: List of Group resources
+    """
     assert os.path.exists(meta_path), "META folder for ResearchStudy, ResearchSubject, and Patient ndjson files path doesn't exist."
     assert os.path.exists(out_path), "Path Does not exist."
 
-    researchstudy = load_ndjson(os.path.join(meta_path, "ResearchStudy.ndjson"))
-    researchsubjects = load_ndjson(os.path.join(meta_path, "ResearchSubject.ndjson"))
-    patients = load_ndjson(os.path.join(meta_path, "Patient.ndjson"))
-
     study_info = {}
-    for study in researchstudy:
+    for study in iter_ndjson_parts(os.path.join(meta_path, "ResearchStudy.ndjson")):
         submitter_id = [r['value'] for r in study['identifier'] if r['use'] == 'official'][0]
         study_info.update({study['id']: submitter_id})
 
-    l = []
+    # a Patient id repeated in an appended META file is a member once per line
+    patient_counts = {}
+    for patient in iter_ndjson_parts(os.path.join(meta_path, "Patient.ndjson")):
+        patient_counts[patient['id']] = patient_counts.get(patient['id'], 0) + 1
+
+    study_members = {}
+    for researchsubject in iter_ndjson_parts(os.path.join(meta_path, "ResearchSubject.ndjson")):
+        study_id = researchsubject['study']['reference'].replace("ResearchStudy/", "")
+        patient_id = researchsubject["subject"]['reference'].replace("Patient/", "")
+        if study_id in study_info and patient_id in patient_counts:
+            study_members.setdefault(study_id, []).extend([patient_id] * patient_counts[patient_id])
+
     groups = []
     project_id = "GDC"
     NAMESPACE_GDC = uuid3(NAMESPACE_DNS, 'gdc.cancer.gov')
     for study_id, study_submitter_id in study_info.items():
-        study_researchsubjects = {study_id: []}
-        study_patient_references = []
-        study_group = None
-        for researchstubject in researchsubjects:
-            if researchstubject['study']['reference'].replace("ResearchStudy/", "") == study_id:
-                for patient in patients:
-                    if researchstubject["subject"]['reference'].replace("Patient/", "") == patient['id']:
-                        study_researchsubjects[study_id].append(researchstubject['id'])
-                        study_patient_references.append(Reference(**({"reference": f"Patient/{patient['id']}"})))
-        if len(study_patient_references) > 0:
-            study_group = create_researchstudy_group(study_patient_references, study_name=study_submitter_id, project_id=project_id, namespace=NAMESPACE_GDC)
-        if study_group:
+        members = study_members.get(study_id, [])
+        if members:
+            study_patient_references = [Reference(**({"reference": f"Patient/{patient_id}"})) for patient_id in members]
+            groups.append(create_researchstudy_group(study_patient_references, study_name=study_submitter_id,
+                                                     project_id=project_id, namespace=NAMESPACE_GDC))
             print(f"Created Group for {study_submitter_id}")
-            groups.append(study_group)
-        print(f"ReseachStudy: {study_submitter_id} with N = {len(study_researchsubjects[study_id])} ResearchSubjects.")
-        l.append(study_researchsubjects)
+        print(f"ReseachStudy: {study_submitter_id} with N = {len(members)} ResearchSubjects.")
 
     json_groups = [orjson.loads(group.model_dump_json()) for group in groups]
 
@@ -1398,6 +2776,23 @@ def convert_value_to_float(data):
     return data
 
 
+UTC_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\+00:00")
+
+
+def normalize_utc_datetimes(data):
+    """
+    Recursively rewrites the +00:00 offset of whole second dateTime and instant strings in a nested dictionary or
+    list as Z, as pydantic dumps validated FHIR datetimes.
+    """
+    if isinstance(data, list):
+        return [normalize_utc_datetimes(item) for item in data]
+    elif isinstance(data, dict):
+        return {key: normalize_utc_datetimes(value) for key, value in data.items()}
+    elif isinstance(data, str) and UTC_DATETIME.fullmatch(data):
+        return f"{data[:-6]}Z"
+    return data
+
+
 def validate_fhir_resource_from_type(resource_type: str, resource_data: dict) -> FHIRAbstractModel:
     """
     Generalized function to validate any FHIR resource type using its name.
@@ -1411,21 +2806,125 @@ def validate_fhir_resource_from_type(resource_type: str, resource_data: dict) ->
         raise ValueError(f"Invalid resource type: {resource_type}. Error: {str(e)}")
 
 
-def clean_resources(entities):
-    cleaned_resource = []
+def construct_fhir_resource_from_type(resource_type: str, resource_data: dict) -> FHIRAbstractModel:
+    """
+    Builds any FHIR resource type by its name with model_construct, without validation.
+    """
+    return get_fhir_model_class(resource_type).model_construct(**resource_data)
+
+
+class ResourceValidation:
+    """
+    Validation tier of the FHIR resources written by generate, with counts of checked resources per resource type.
+    - full: validates every resource with model_validate
+    - sample:<rate>: validates a deterministic sample of resources, selected by the hash of their id ex. sample:0.05
+    - none: builds every resource with model_construct, for trusted re-runs of an already validated mapping.
+      UTC datetimes are normalized to Z as validation dumps them, other values are written as given,
+      ex. fractional seconds aren't padded to microseconds
+
+    ex. validation = ResourceValidation("sample:0.1")
+    """
+
+    def __init__(self, mode="full"):
+        self.mode = mode
+        if mode == "full":
+            self.rate = 1.0
+        elif mode == "none":
+            self.rate = 0.0
+        elif mode.startswith("sample:"):
+            try:
+                self.rate = float(mode.split(":", 1)[1])
+            except ValueError:
+                raise ValueError(f"Invalid validation sample rate: {mode}. ex. sample:0.1")
+            if not 0.0 <= self.rate <= 1.0:
+                raise ValueError(f"Validation sample rate {self.rate} is not between 0 and 1.")
+        else:
+            raise ValueError(f"Invalid validation: {mode}. Valid options are full, sample:<rate>, or none.")
+        self.checked = {}
+        self.total = {}
+
+    def should_validate(self, resource) -> bool:
+        if self.rate >= 1.0:
+            return True
+        if self.rate <= 0.0:
+            return False
+        key = resource.get("id") or orjson.dumps(resource, option=orjson.OPT_SORT_KEYS).decode()
+        digest = hashlib.sha256(key.encode()).digest()
+        return int.from_bytes(digest[:8], "big") < self.rate * 2 ** 64
+
+    def count(self, resource_type, validated):
+        self.total[resource_type] = self.total.get(resource_type, 0) + 1
+        self.checked[resource_type] = self.checked.get(resource_type, 0) + int(validated)
+
+    def add(self, checked, total):
+        """Adds the checked and total counts per resource type of another run, ex. a worker process."""
+        for resource_type, count in total.items():
+            self.total[resource_type] = self.total.get(resource_type, 0) + count
+            self.checked[resource_type] = self.checked.get(resource_type, 0) + checked.get(resource_type, 0)
+
+    def report(self) -> str:
+        lines = [f"Validation ({self.mode}) - checked resources per type:"]
+        for resource_type, total in self.total.items():
+            lines.append(f"  {resource_type}: {self.checked[resource_type]}/{total}")
+        return "\n".join(lines)
+
+
+def finalize_resource(resource, resource_type=None, validate=True) -> dict:
+    """
+    Prunes empty values, validates, and normalizes the Decimal and numeric string values of a FHIR resource dict.
+    Runs remove_empty_dicts, model_validate, model_dump_json, orjson.loads and convert_value_to_float, dropping the
+    former convert_decimal_to_float pass and trailing orjson dumps/loads copy, which did not change the parsed dump.
+    The writer still serializes the returned dict once more.
+
+    :param resource: FHIR resource dict
+    :param resource_type: FHIR resource type, defaults to the resource's resourceType
+    :param validate: validate with model_validate, or build with model_construct for trusted resources, with the
+        UTC datetimes normalized as validation would
+    :return: FHIR resource dict ready to write, raises ValueError if the resource is not valid
+    """
+    resource_type = resource_type or resource["resourceType"]
+    if validate:
+        fhir_resource = validate_fhir_resource_from_type(resource_type, remove_empty_dicts(resource))
+    else:
+        fhir_resource = construct_fhir_resource_from_type(resource_type, remove_empty_dicts(resource))
+    # pydantic Decimals are dumped as json numbers and parsed by orjson as float or int
+    # constructed resources keep nested elements as dicts, which pydantic warns about when dumped
+    finalized = convert_value_to_float(orjson.loads(fhir_resource.model_dump_json(warnings=validate)))
+    # constructed resources keep datetime strings as given, validated ones are dumped with Z for UTC
+    return finalized if validate else normalize_utc_datetimes(finalized)
+
+
+def finalize_resources(entities, resource_type=None, validation=None):
+    """
+    Finalizes FHIR resource dicts for writing.
+
+    :param entities: iterable of FHIR resource dicts
+    :param resource_type: FHIR resource type, defaults to each resource's resourceType
+    :param validation: ResourceValidation tier counting checked resources, defaults to full validation
+    :return: generator of (resource, finalized resource) tuples, the finalized resource is None if validation failed
+    """
     for resource in entities:
-        resource_type = resource["resourceType"]
-        cleaned_resource_dict = remove_empty_dicts(resource)
+        _resource_type = resource_type or resource["resourceType"]
+        validate = validation.should_validate(resource) if validation else True
         try:
-            validated_resource = validate_fhir_resource_from_type(resource_type, cleaned_resource_dict).model_dump_json()
+            cleaned = finalize_resource(resource, resource_type=_resource_type, validate=validate)
         except ValueError as e:
-            print(f"Validation failed for {resource_type}: {e}")
-            continue
-        # handle pydantic Decimal cases
-        validated_resource = convert_decimal_to_float(orjson.loads(validated_resource))
-        validated_resource = convert_value_to_float(validated_resource)
-        validated_resource = orjson.loads(orjson.dumps(validated_resource).decode("utf-8"))
-        cleaned_resource.append(validated_resource)
+            print(f"Validation failed for {_resource_type}: {e}")
+            cleaned = None
+        if validation:
+            validation.count(_resource_type, validate)
+        yield resource, cleaned
 
-    return cleaned_resource
+
+def clean_resources(entities, resource_type=None, validation=None):
+    """
+    Finalizes FHIR resource dicts for writing, dropping resources that fail validation.
+
+    :param entities: list of FHIR resource dicts
+    :param resource_type: FHIR resource type, defaults to each resource's resourceType
+    :param validation: ResourceValidation tier counting checked resources, defaults to full validation
+    :return: list of finalized FHIR resource dicts
+    """
+    return [cleaned for _, cleaned in finalize_resources(entities, resource_type=resource_type, validation=validation)
+            if cleaned is not None]
 
@@ -0,0 +1,31 @@
+import os
+import tracemalloc
+from pathlib import Path
+import pytest
+
+# benchmarks time and profile runs up to GDC scale, they're opted into ex. FHIRIZER_BENCHMARKS=1 pytest tests/benchmarks
+BENCHMARKS_ENV = "FHIRIZER_BENCHMARKS"
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skips the benchmarks unless FHIRIZER_BENCHMARKS=1, so the default test run has no wall-clock assertions."""
+    if os.environ.get(BENCHMARKS_ENV) == "1":
+        return
+    benchmarks_dir = Path(__file__).parent
+    skip = pytest.mark.skip(reason=f"benchmark, set {BENCHMARKS_ENV}=1 to run")
+    for item in items:
+        if benchmarks_dir in Path(item.fspath).parents:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def traced_peak():
+    """Runs a generate function and returns its peak traced memory in bytes."""
+    def peak(generate, **kwargs):
+        tracemalloc.start()
+        try:
+            generate(**kwargs)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return peak
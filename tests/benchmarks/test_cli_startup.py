@@ -0,0 +1,26 @@
+import subprocess
+import sys
+import time
+
+# former import time cost of the cli: every transformer module and every reference resource loaded up front
+EAGER_IMPORT = ("from fhirizer import entity2fhir, icgc2fhir, htan2fhir, mapping; import icd10; "
+                "import gen3_tracker.common; entity2fhir.resources.load_all(); mapping.resources.load_all(); "
+                "from fhirizer import cli; cli.cli(['--help'], standalone_mode=False)")
+
+
+def timed_run(args, runs=3):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def test_cli_startup(capsys):
+    lazy_time = timed_run(["-m", "fhirizer.cli", "--help"])
+    eager_time = timed_run(["-c", EAGER_IMPORT])
+
+    with capsys.disabled():
+        print(f"\nfhirizer --help cold start - eager: {eager_time:.3f}s, lazy: {lazy_time:.3f}s")
+    assert lazy_time < eager_time
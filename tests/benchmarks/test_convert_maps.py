@@ -0,0 +1,61 @@
+import os
+import time
+import json
+import pytest
+from fhirizer import utils, mapping
+
+# number of cases the fixture is scaled up to ex. FHIRIZER_BENCH_CASES=100000
+N_CASES = int(os.environ.get("FHIRIZER_BENCH_CASES", 200))
+
+
+@pytest.fixture
+def cases_path(tmp_path):
+    lines = [json.dumps(c) for c in utils.load_ndjson("./tests/fixtures/case/cases.ndjson")] * N_CASES
+    path = tmp_path / "cases.ndjson"
+    path.write_text("\n".join(lines))
+    return str(path)
+
+
+def key_union_convert_maps(in_path, name):
+    """Former convert_maps - extracts the union of all GDC keys before mapping."""
+    plan = mapping.get_mapping_plan(name)
+    entities = list(utils.iter_ndjson(path=in_path))
+
+    all_keys = [list(utils.extract_keys(e)) for e in entities]
+    keys = list(set().union(*all_keys))
+
+    mappings = plan["mappings"]
+    available_maps = [(k, mappings[k]) for k in keys if k in mappings]
+    available_maps.append(tuple(plan["obj_mapping"]))
+    map_index = utils.build_map_index(available_maps)
+    return [utils.map_data(e, map_index, verbose=False)['mapped_data'] for e in entities]
+
+
+def test_convert_maps_single_pass(cases_path, tmp_path):
+    mapping.get_mapping_plan("case")
+
+    start = time.perf_counter()
+    key_union_convert_maps(cases_path, "case")
+    key_union_time = time.perf_counter() - start
+
+    out_path = str(tmp_path / "case_keys.ndjson")
+    start = time.perf_counter()
+    mapping.convert_maps(in_path=cases_path, out_path=out_path, name="case", convert=True, verbose=False)
+    single_pass_time = time.perf_counter() - start
+
+    print(f"\nconvert_maps over {N_CASES} cases - key union pre-pass: {key_union_time:.2f}s, "
+          f"single pass: {single_pass_time:.2f}s")
+
+
+def test_convert_maps_workers(cases_path, tmp_path):
+    workers = min(os.cpu_count() or 1, 4)
+    timings = {}
+    for n in sorted({1, workers}):
+        out_path = tmp_path / f"case_keys_{n}.ndjson"
+        start = time.perf_counter()
+        mapping.convert_maps(in_path=cases_path, out_path=str(out_path), name="case", convert=True, verbose=False,
+                             workers=n)
+        timings[n] = time.perf_counter() - start
+
+    print(f"\nconvert_maps over {N_CASES} cases - " +
+          ", ".join(f"{n} worker(s): {t:.2f}s ({timings[1] / t:.1f}x)" for n, t in timings.items()))
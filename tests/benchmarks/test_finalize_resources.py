@@ -0,0 +1,24 @@
+import glob
+import json
+import time
+import pytest
+from pathlib import Path
+from fhirizer import utils
+
+
+def timed_ndjson(clean, entities):
+    start = time.perf_counter()
+    '\n'.join(json.dumps(e, ensure_ascii=False) for e in clean(entities))
+    return time.perf_counter() - start
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob("./tests/fixtures/case/META/*.ndjson")), ids=lambda p: Path(p).stem)
+def test_finalize_resources(path, capsys, round_trip_clean_resources):
+    entities = utils.load_ndjson(path) * 20
+
+    round_trip_time = timed_ndjson(round_trip_clean_resources, entities)
+    finalize_time = timed_ndjson(utils.clean_resources, entities)
+
+    with capsys.disabled():
+        print(f"\n{len(entities)} {Path(path).stem} - round trips: {round_trip_time:.3f}s, "
+              f"finalize_resource: {finalize_time:.3f}s")
@@ -0,0 +1,40 @@
+import os
+import time
+import json
+import pytest
+import importlib.resources
+from pathlib import Path
+from fhirizer import utils
+
+# number of cases the fixture is scaled up to ex. FHIRIZER_BENCH_CASES=100000
+N_CASES = int(os.environ.get("FHIRIZER_BENCH_CASES", 200))
+
+
+@pytest.fixture
+def cases():
+    return utils.load_ndjson("./tests/fixtures/case/cases.ndjson") * N_CASES
+
+
+@pytest.fixture
+def available_maps(cases):
+    schema = utils.load_schema_from_json(
+        path=str(Path(importlib.resources.files('fhirizer').parent / 'mapping' / 'case.json')))
+    keys = list(set().union(*[list(utils.extract_keys(c)) for c in cases[:1]]))
+    _available_maps = [schema.find_map_by_source(k) for k in keys]
+    _available_maps.append(schema.obj_mapping)
+    return _available_maps
+
+
+def timed_map_data(cases, maps):
+    start = time.perf_counter()
+    mapped = [json.dumps(utils.map_data(c, maps, verbose=False)['mapped_data']) for c in cases]
+    return mapped, time.perf_counter() - start
+
+
+def test_map_index_speedup(cases, available_maps, linear_maps):
+    _, linear_time = timed_map_data(cases, linear_maps(available_maps))
+    _, indexed_time = timed_map_data(cases, utils.build_map_index(available_maps))
+
+    print(f"\nmap_data over {N_CASES} cases - linear scan: {linear_time:.2f}s, indexed: {indexed_time:.2f}s, "
+          f"speedup: {linear_time / indexed_time:.1f}x")
+    assert indexed_time < linear_time
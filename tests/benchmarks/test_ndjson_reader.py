@@ -0,0 +1,27 @@
+import random
+import time
+import pytest
+from fhirizer import utils
+
+
+@pytest.mark.parametrize("n_resources", [20000, 80000])
+def test_reader_random_access(n_resources, tmp_path, capsys):
+    path = tmp_path / "Observation.ndjson"
+    observations = [{"resourceType": "Observation", "id": f"observation-{i}", "status": "final",
+                     "valueString": "x" * 200} for i in range(n_resources)]
+    utils.fhir_ndjson(observations, str(path), index=True)
+    wanted = random.Random(0).sample([o["id"] for o in observations], 100)
+
+    start = time.perf_counter()
+    by_id = {o["id"]: o for o in utils.load_ndjson(str(path))}
+    [by_id[i] for i in wanted]
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with utils.NDJSONReader(path) as reader:
+        list(reader.iter_ids(wanted))
+    reader_time = time.perf_counter() - start
+
+    with capsys.disabled():
+        print(f"\n100 of {n_resources} Observations - load_ndjson: {load_time:.3f}s, NDJSONReader: {reader_time:.4f}s")
+    assert reader_time < load_time
@@ -0,0 +1,53 @@
+import time
+import pytest
+from fhirizer import utils, mapping, entity2fhir
+
+
+def timed_assign_fhir_for_case(case):
+    start = time.perf_counter()
+    entity2fhir.assign_fhir_for_case(case)
+    return time.perf_counter() - start
+
+
+@pytest.mark.parametrize("n_aliquots", [100, 1000])
+def test_specimen_dedup_scaling(n_aliquots, monkeypatch, capsys, aliquoted_case, scanned_resource_list):
+    map_index = mapping.plan_map_index(mapping.get_mapping_plan("case"))
+    case = utils.map_data(aliquoted_case(n_aliquots), map_index, verbose=False)["mapped_data"]
+
+    indexed_time = timed_assign_fhir_for_case(case)
+    with monkeypatch.context() as m:
+        m.setattr(utils, "ResourceList", scanned_resource_list)
+        list_time = timed_assign_fhir_for_case(case)
+
+    with capsys.disabled():
+        print(f"\nassign_fhir_for_case with {n_aliquots} aliquots - list scans: {list_time:.3f}s "
+              f"({1e3 * list_time / n_aliquots:.3f}ms/aliquot), ResourceList: {indexed_time:.3f}s "
+              f"({1e3 * indexed_time / n_aliquots:.3f}ms/aliquot)")
+
+
+def timed_guarded_appends(resources, resource_list):
+    start = time.perf_counter()
+    kept = resource_list()
+    for resource in resources:
+        if resource not in kept:
+            kept.append(resource)
+    return time.perf_counter() - start
+
+
+@pytest.mark.parametrize("n_aliquots", [1000, 2000, 4000])
+def test_observation_dedup_scaling(n_aliquots, capsys):
+    observations = []
+    for a in range(n_aliquots):
+        observation = entity2fhir.biospecimen_observation_template.build()
+        observation["id"] = f"aliquot-observation-{a}"
+        observation["specimen"] = {"reference": f"Specimen/aliquot-{a}"}
+        observations.append(observation)
+    # every aliquot observation is revisited once, ex. the same aliquot listed under two analytes
+    observations = observations + observations[::2]
+
+    indexed_time = timed_guarded_appends(observations, utils.ResourceList)
+    scan_time = timed_guarded_appends(observations, list)
+
+    with capsys.disabled():
+        print(f"\n{len(observations)} guarded aliquot Observation appends - list scans: {scan_time:.3f}s, "
+              f"ResourceList: {indexed_time:.3f}s")
@@ -0,0 +1,25 @@
+import time
+import json
+import pytest
+from fhirizer import utils, mapping
+
+
+def timed_map_data(case, map_index):
+    start = time.perf_counter()
+    json.dumps(utils.map_data(case, map_index, verbose=False)['mapped_data'])
+    return time.perf_counter() - start
+
+
+@pytest.mark.parametrize("n_aliquots", [10, 100, 1000])
+def test_specimen_merge_scaling(n_aliquots, monkeypatch, capsys, synthetic_case, appended_process_nested_list):
+    case = synthetic_case(n_aliquots)
+    map_index = mapping.plan_map_index(mapping.get_mapping_plan("case"))
+
+    merge_time = timed_map_data(case, map_index)
+    with monkeypatch.context() as m:
+        m.setattr(utils, "process_nested_list", appended_process_nested_list)
+        append_time = timed_map_data(case, map_index)
+
+    with capsys.disabled():
+        print(f"\nmap_data of a case with {n_aliquots} aliquots - append_data_to_key: {append_time:.3f}s, "
+              f"NestedListMerge: {merge_time:.3f}s")
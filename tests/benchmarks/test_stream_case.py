@@ -0,0 +1,21 @@
+import json
+import pytest
+from fhirizer import entity2fhir
+
+
+@pytest.mark.parametrize("n_cases", [2, 8])
+def test_stream_case_memory(n_cases, tmp_path, capsys, traced_peak, distinct_cases):
+    cases_path = tmp_path / "cases.ndjson"
+    cases_path.write_text('\n'.join(json.dumps(c) for c in distinct_cases(n_cases)))
+    listed_dir, streamed_dir = tmp_path / "listed", tmp_path / "streamed"
+    listed_dir.mkdir()
+    streamed_dir.mkdir()
+
+    listed_peak = traced_peak(entity2fhir.case_gdc_to_fhir_ndjson, out_dir=str(listed_dir), name='case',
+                              cases_path=str(cases_path), convert=False, verbose=False)
+    streamed_peak = traced_peak(entity2fhir.stream_case_gdc_to_fhir_ndjson, out_dir=str(streamed_dir), name='case',
+                                cases_path=str(cases_path), convert=False, verbose=False)
+
+    with capsys.disabled():
+        print(f"\npeak traced memory of {n_cases} cases - lists: {listed_peak / 2 ** 20:.1f}MiB, "
+              f"streaming: {streamed_peak / 2 ** 20:.1f}MiB")
@@ -0,0 +1,22 @@
+import pytest
+from fhirizer import entity2fhir
+
+
+@pytest.mark.parametrize("n_copies", [10, 40])
+def test_stream_file_memory(n_copies, tmp_path, capsys, traced_peak):
+    with open("./tests/fixtures/file/files.ndjson") as f:
+        files = f.read().splitlines()
+    files_path = tmp_path / "files.ndjson"
+    files_path.write_text('\n'.join(files * n_copies))
+    listed_dir, streamed_dir = tmp_path / "listed", tmp_path / "streamed"
+    listed_dir.mkdir()
+    streamed_dir.mkdir()
+
+    listed_peak = traced_peak(entity2fhir.file_gdc_to_fhir_ndjson, out_dir=str(listed_dir), name='file',
+                              files_path=str(files_path), convert=False, verbose=False)
+    streamed_peak = traced_peak(entity2fhir.stream_file_gdc_to_fhir_ndjson, out_dir=str(streamed_dir), name='file',
+                                files_path=str(files_path), convert=False, verbose=False, shard_size=50)
+
+    with capsys.disabled():
+        print(f"\npeak traced memory of {len(files) * n_copies} files - lists: {listed_peak / 2 ** 20:.1f}MiB, "
+              f"streaming: {streamed_peak / 2 ** 20:.1f}MiB")
@@ -0,0 +1,40 @@
+import time
+import pytest
+from fhirizer import utils
+
+
+def gdc_meta(write_meta, meta_path, n_studies, n_subjects):
+    """Interleaves subjects across studies with a few orphan subjects, like a GDC case export."""
+    studies = [(f"study-{i}", f"PROJECT-{i}") for i in range(n_studies)]
+    subjects = [(f"subject-{i}", f"study-{(i * 7) % n_studies}", f"patient-{i}") for i in range(n_subjects)]
+    patients = [f"patient-{i}" for i in range(n_subjects) if i % 97]
+    write_meta(meta_path, studies, subjects, patients)
+
+
+def test_study_groups_join_speedup(tmp_path, capsys, write_meta, nested_loop_study_groups):
+    gdc_meta(write_meta, tmp_path, n_studies=5, n_subjects=600)
+
+    start = time.perf_counter()
+    nested_loop_study_groups(tmp_path)
+    nested_time = time.perf_counter() - start
+    start = time.perf_counter()
+    utils.study_groups(meta_path=str(tmp_path), out_path=str(tmp_path))
+    join_time = time.perf_counter() - start
+
+    with capsys.disabled():
+        print(f"\nstudy_groups 5 studies, 600 subjects - nested loop: {nested_time:.3f}s, hash join: {join_time:.3f}s")
+    assert join_time < nested_time
+
+
+@pytest.mark.parametrize("n_studies,n_subjects", [(90, 85000)])
+def test_study_groups_gdc_scale(n_studies, n_subjects, tmp_path, capsys, write_meta):
+    gdc_meta(write_meta, tmp_path, n_studies=n_studies, n_subjects=n_subjects)
+
+    start = time.perf_counter()
+    groups = utils.study_groups(meta_path=str(tmp_path), out_path=str(tmp_path))
+    join_time = time.perf_counter() - start
+
+    with capsys.disabled():
+        print(f"\nstudy_groups {n_studies} studies, {n_subjects} subjects and patients - hash join: {join_time:.3f}s")
+    assert len(groups) == n_studies
+    assert sum(len(g.member) for g in groups) == len([i for i in range(n_subjects) if i % 97])
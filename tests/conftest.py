@@ -0,0 +1,190 @@
+import copy
+import json
+import orjson
+import pytest
+from fhirizer import utils
+
+
+def _write_meta(meta_path, studies, subjects, patients):
+    utils.fhir_ndjson([{"resourceType": "ResearchStudy", "id": study_id, "status": "active",
+                        "identifier": [{"use": "official", "value": submitter_id}]}
+                       for study_id, submitter_id in studies], str(meta_path / "ResearchStudy.ndjson"))
+    utils.fhir_ndjson([{"resourceType": "ResearchSubject", "id": subject_id, "status": "active",
+                        "study": {"reference": f"ResearchStudy/{study_id}"},
+                        "subject": {"reference": f"Patient/{patient_id}"}}
+                       for subject_id, study_id, patient_id in subjects], str(meta_path / "ResearchSubject.ndjson"))
+    utils.fhir_ndjson([{"resourceType": "Patient", "id": patient_id} for patient_id in patients],
+                      str(meta_path / "Patient.ndjson"))
+
+
+@pytest.fixture
+def write_meta():
+    """Writes ResearchStudy, ResearchSubject and Patient ndjson files to a META path from (id, submitter_id),
+    (id, study, patient) and id tuples."""
+    return _write_meta
+
+
+def _nested_loop_study_groups(meta_path):
+    researchstudy = utils.load_ndjson(f"{meta_path}/ResearchStudy.ndjson")
+    researchsubjects = utils.load_ndjson(f"{meta_path}/ResearchSubject.ndjson")
+    patients = utils.load_ndjson(f"{meta_path}/Patient.ndjson")
+    groups = []
+    for study in researchstudy:
+        submitter_id = [r['value'] for r in study['identifier'] if r['use'] == 'official'][0]
+        references = []
+        for researchsubject in researchsubjects:
+            if researchsubject['study']['reference'].replace("ResearchStudy/", "") == study['id']:
+                for patient in patients:
+                    if researchsubject["subject"]['reference'].replace("Patient/", "") == patient['id']:
+                        references.append(utils.Reference(reference=f"Patient/{patient['id']}"))
+        if references:
+            groups.append(utils.create_researchstudy_group(references, study_name=submitter_id, project_id="GDC",
+                                                           namespace=utils.uuid3(utils.NAMESPACE_DNS, 'gdc.cancer.gov')))
+    return groups
+
+
+@pytest.fixture
+def nested_loop_study_groups():
+    """Former study_groups join: every ResearchSubject of every ResearchStudy compared against every Patient."""
+    return _nested_loop_study_groups
+
+
+class LinearMaps(utils.MapIndex):
+    """Former linear scan over available Map(s) for every visited key."""
+
+    def find(self, source_name):
+        return next((destination for name, destination in self.maps if name == source_name), None)
+
+    def find_nested(self, prefix, key):
+        return self.find('.'.join([prefix, key]))
+
+
+@pytest.fixture
+def linear_maps():
+    return LinearMaps
+
+
+class ScannedResourceList(list):
+    """Former plain list guards, `in` and specimen_exists scanning every resource."""
+
+    def has_id(self, resource_id):
+        return any(resource.id == resource_id for resource in self)
+
+
+@pytest.fixture
+def scanned_resource_list():
+    return ScannedResourceList
+
+
+def _appended_process_nested_list(traverse_key, nested_value, current_keys, available_maps, verbose):
+    tks = traverse_key.split(".")[-1]
+    this_nest = {tks: []}
+    prefix = '.'.join(current_keys + [traverse_key])
+
+    for elm in nested_value:
+        if isinstance(elm, dict):
+            elm = utils.sort_parent_keys_with_head(elm, head_key="sample_id")
+            for key, value in elm.items():
+                if isinstance(value, list):
+                    result = _appended_process_nested_list('.'.join([prefix, key]), value, current_keys,
+                                                           available_maps, verbose)
+                    utils.append_data_to_key(this_nest, tks, result, verbose)
+                    continue
+
+                destination_key = available_maps.find_nested(prefix, key)
+                if destination_key is not None and not isinstance(value, list):
+                    utils.append_data_to_key(this_nest, tks, {destination_key: value}, verbose)
+    return this_nest
+
+
+@pytest.fixture
+def appended_process_nested_list():
+    """Former process_nested_list merging each fragment with append_data_to_key."""
+    return _appended_process_nested_list
+
+
+def _aliquoted_case(n_aliquots):
+    with open("./tests/fixtures/case/cases.ndjson") as f:
+        case = json.loads(f.readline())
+    analyte = case["samples"][0]["portions"][0]["analytes"][0]
+    template = analyte["aliquots"][0]
+    aliquots = []
+    for a in range(n_aliquots):
+        aliquot = copy.deepcopy(template)
+        aliquot["aliquot_id"] = f"{template['aliquot_id'][:-8]}{a:08d}"
+        aliquot["submitter_id"] = f"{template['submitter_id']}-{a}"
+        aliquots.append(aliquot)
+    analyte["aliquots"] = aliquots
+    return case
+
+
+@pytest.fixture
+def aliquoted_case():
+    """First fixture case with its first analyte's aliquots repeated up to n_aliquots with new ids."""
+    return _aliquoted_case
+
+
+def _synthetic_case(n_aliquots, n_samples=2):
+    aliquots_per_analyte = max(1, n_aliquots // n_samples)
+    samples = []
+    for s in range(n_samples):
+        aliquots = [{"aliquot_id": f"aliquot-{s}-{a}", "submitter_id": f"TCGA-{s}-{a}", "concentration": 0.1 * a,
+                     "analyte_type": "DNA", "source_center": str(a % 3)} for a in range(aliquots_per_analyte)]
+        analytes = [{"analyte_id": f"analyte-{s}", "submitter_id": f"TCGA-{s}-D", "analyte_type": "DNA",
+                     "aliquots": aliquots}]
+        portions = [{"portion_id": f"portion-{s}", "submitter_id": f"TCGA-{s}-11", "is_ffpe": False,
+                     "analytes": analytes}]
+        samples.append({"sample_id": f"sample-{s}", "submitter_id": f"TCGA-{s}", "sample_type": "Primary Tumor",
+                        "tissue_type": "Tumor", "portions": portions})
+    return {"case_id": "case-0", "submitter_id": "TCGA-0", "samples": samples}
+
+
+@pytest.fixture
+def synthetic_case():
+    """Heavily aliquoted case with n_aliquots split across n_samples samples of one portion and analyte each."""
+    return _synthetic_case
+
+
+def _distinct_cases(n_cases):
+    with open("./tests/fixtures/case/cases.ndjson") as f:
+        case = f.readline()
+
+    def rename(node, suffix):
+        if isinstance(node, dict):
+            return {k: v if k == "project" else f"{v}-{suffix}" if isinstance(v, str) and k.endswith("_id")
+                    else rename(v, suffix) for k, v in node.items()}
+        if isinstance(node, list):
+            return [rename(v, suffix) for v in node]
+        return node
+
+    return [rename(json.loads(case), i) for i in range(n_cases)]
+
+
+@pytest.fixture
+def distinct_cases():
+    """Fixture case repeated n_cases times, with every GDC id and submitter id but the project's made unique per copy."""
+    return _distinct_cases
+
+
+def _round_trip_clean_resources(entities):
+    cleaned_resource = []
+    for resource in entities:
+        resource_type = resource["resourceType"]
+        cleaned_resource_dict = utils.remove_empty_dicts(resource)
+        try:
+            validated_resource = utils.validate_fhir_resource_from_type(resource_type,
+                                                                        cleaned_resource_dict).model_dump_json()
+        except ValueError as e:
+            print(f"Validation failed for {resource_type}: {e}")
+            continue
+        validated_resource = utils.convert_decimal_to_float(orjson.loads(validated_resource))
+        validated_resource = utils.convert_value_to_float(validated_resource)
+        validated_resource = orjson.loads(orjson.dumps(validated_resource).decode("utf-8"))
+        cleaned_resource.append(validated_resource)
+    return cleaned_resource
+
+
+@pytest.fixture
+def round_trip_clean_resources():
+    """Former clean_resources serializing and parsing every resource between each pass."""
+    return _round_trip_clean_resources
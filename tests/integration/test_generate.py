@@ -1,5 +1,7 @@
+import json
 import pytest
-from fhirizer import entity2fhir, utils
+from pathlib import Path
+from fhirizer import entity2fhir, mapping, utils
 
 
 @pytest.fixture
@@ -43,15 +45,157 @@ def medication_administration():
 
 
 def test_case_gdc_to_fhir(patient, condition, research_study, research_subject, observation, specimen,
-                          medication_administration, body_structure, name='case', out_dir='./tests/fixtures/case/META',
+                          medication_administration, body_structure, tmp_path, name='case',
                           cases_path="./tests/fixtures/case/cases.ndjson", spinner=None):
+    # generated into tmp_path and compared with the fixture META, which is never rewritten
+    out_dir = str(tmp_path)
     entity2fhir.case_gdc_to_fhir_ndjson(out_dir=out_dir, name=name, cases_path=cases_path, convert=False, verbose=False, spinner=spinner)
-    assert patient == utils.load_ndjson("./tests/fixtures/case/META/Patient.ndjson")
-    assert condition == utils.load_ndjson("./tests/fixtures/case/META/Condition.ndjson")
-    assert research_study == utils.load_ndjson("./tests/fixtures/case/META/ResearchStudy.ndjson")
-    assert research_subject == utils.load_ndjson("./tests/fixtures/case/META/ResearchSubject.ndjson")
-    assert observation == utils.load_ndjson("./tests/fixtures/case/META/Observation.ndjson")
-    assert specimen == utils.load_ndjson("./tests/fixtures/case/META/Specimen.ndjson")
-    assert body_structure == utils.load_ndjson("./tests/fixtures/case/META/BodyStructure.ndjson")
-    assert medication_administration == utils.load_ndjson("./tests/fixtures/case/META/MedicationAdministration.ndjson")
-
+    assert patient == utils.load_ndjson(f"{out_dir}/Patient.ndjson")
+    assert condition == utils.load_ndjson(f"{out_dir}/Condition.ndjson")
+    assert research_study == utils.load_ndjson(f"{out_dir}/ResearchStudy.ndjson")
+    assert research_subject == utils.load_ndjson(f"{out_dir}/ResearchSubject.ndjson")
+    assert observation == utils.load_ndjson(f"{out_dir}/Observation.ndjson")
+    assert specimen == utils.load_ndjson(f"{out_dir}/Specimen.ndjson")
+    assert body_structure == utils.load_ndjson(f"{out_dir}/BodyStructure.ndjson")
+    assert medication_administration == utils.load_ndjson(f"{out_dir}/MedicationAdministration.ndjson")
+    # same bytes as the fixture META, ex. json.dumps separators
+    for path in tmp_path.glob("*.ndjson"):
+        assert path.read_bytes() == (Path("./tests/fixtures/case/META") / path.name).read_bytes()
+
+
+def test_research_study_cache():
+    cases = mapping.convert_maps(in_path="./tests/fixtures/case/cases.ndjson", out_path=None, name='case',
+                                 convert=False, verbose=False)
+    research_study_cache = {}
+    fhir_cases = [entity2fhir.assign_fhir_for_case(c, research_study_cache=research_study_cache) for c in cases]
+    assert len(research_study_cache) == len({c['ResearchStudy']['ResearchStudy.id'] for c in cases})
+    for case, fhir_case in zip(cases, fhir_cases):
+        rs, rs_parent = entity2fhir.create_researchstudy(project_data=case['ResearchStudy'])
+        assert fhir_case['research_studies'] == [rs, rs_parent]
+        assert fhir_case['research_subject'].study.reference == f"ResearchStudy/{rs.id}"
+    assert fhir_cases[0]['research_studies'][0] is fhir_cases[-1]['research_studies'][0]
+
+
+def test_case_gdc_to_fhir_workers(tmp_path, monkeypatch):
+    with open("./tests/fixtures/case/cases.ndjson") as f:
+        cases = f.read().splitlines()
+    cases_path = tmp_path / "cases.ndjson"
+    cases_path.write_text('\n'.join(cases * 3) + '\n')
+
+    serial_dir, sharded_dir = tmp_path / "serial" / "META", tmp_path / "sharded" / "META"
+    serial_dir.mkdir(parents=True)
+    sharded_dir.mkdir(parents=True)
+    entity2fhir.case_gdc_to_fhir_ndjson(out_dir=str(serial_dir), name='case', cases_path=str(cases_path),
+                                        convert=True, verbose=False)
+    with monkeypatch.context() as m:
+        # cases are read in chunks by the shards, never loaded all at once
+        m.setattr(mapping, "convert_maps", None)
+        entity2fhir.case_gdc_to_fhir_ndjson(out_dir=str(sharded_dir), name='case', cases_path=str(cases_path),
+                                            convert=True, verbose=False, workers=2, shard_size=1)
+
+    assert sorted(p.name for p in sharded_dir.iterdir()) == sorted(p.name for p in serial_dir.iterdir())
+    for path in serial_dir.iterdir():
+        assert (sharded_dir / path.name).read_bytes() == path.read_bytes()
+    assert (sharded_dir.parent / "case_keys.ndjson").read_bytes() == \
+           (serial_dir.parent / "case_keys.ndjson").read_bytes()
+    # shards are written next to META and removed
+    assert not [p for p in sharded_dir.iterdir() if p.is_dir()]
+    assert not [p for p in sharded_dir.parent.iterdir() if p.name.startswith(".")]
+
+
+def test_case_gdc_to_fhir_workers_failure_removes_shards(tmp_path, monkeypatch):
+    with open("./tests/fixtures/case/cases.ndjson") as f:
+        cases = f.read().splitlines()
+    cases_path = tmp_path / "cases.ndjson"
+    cases_path.write_text('\n'.join(cases * 2) + '\n')
+    out_dir = tmp_path / "META"
+    out_dir.mkdir()
+
+    def merge_failure(*args, **kwargs):
+        assert [p for p in tmp_path.iterdir() if p.name.startswith(".META-shards-")]
+        raise RuntimeError("merge failed")
+
+    monkeypatch.setattr(utils, "merge_ndjson_shards", merge_failure)
+    with pytest.raises(RuntimeError):
+        entity2fhir.case_gdc_to_fhir_ndjson(out_dir=str(out_dir), name='case',
+                                            cases_path=str(cases_path), convert=False,
+                                            verbose=False, workers=2, shard_size=1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["META", "cases.ndjson"]
+    assert not list(out_dir.iterdir())
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_stream_file_gdc_to_fhir(workers, tmp_path):
+    with open("./tests/fixtures/file/files.ndjson") as f:
+        files = [json.loads(line) for line in f]
+    # read group Observations, and an Observation already in META to be extended
+    files[0]["analysis"] = {"metadata": {"read_groups": [{"read_group_id": "rg-1", "read_group_name": "RG1"}]}}
+    files[1]["analysis"] = {"metadata": {"read_groups": [{"read_group_id": "rg-2", "experiment_name": "exp"}]}}
+    files_path = tmp_path / "files.ndjson"
+    files_path.write_text('\n'.join(json.dumps(f) for f in files * 3))
+
+    listed_dir, streamed_dir = tmp_path / "listed" / "META", tmp_path / "streamed" / "META"
+    for out_dir in [listed_dir, streamed_dir]:
+        out_dir.mkdir(parents=True)
+        (out_dir / "Observation.ndjson").write_text('{"resourceType":"Observation","id":"existing"}\n')
+    entity2fhir.file_gdc_to_fhir_ndjson(out_dir=str(listed_dir), name='file', files_path=str(files_path),
+                                        convert=True, verbose=False)
+    assert entity2fhir.stream_file_gdc_to_fhir_ndjson(out_dir=str(streamed_dir), name='file',
+                                                      files_path=str(files_path), convert=True, verbose=False,
+                                                      workers=workers, shard_size=4) == {
+        "Observation": 2, "DocumentReference": len(files), "Group": 4}
+
+    assert sorted(p.name for p in streamed_dir.iterdir()) == sorted(p.name for p in listed_dir.iterdir())
+    # the .idx used to append Observations is only kept with --index
+    assert not list(listed_dir.glob("*.idx"))
+    for path in listed_dir.glob("*.ndjson"):
+        assert (streamed_dir / path.name).read_bytes() == path.read_bytes()
+        ids = [r["id"] for r in utils.load_ndjson(str(path))]
+        assert len(ids) == len(set(ids))
+    assert (streamed_dir.parent / "file_keys.ndjson").read_bytes() == (listed_dir.parent / "file_keys.ndjson").read_bytes()
+    # shards are written next to META and removed
+    assert not [p for p in streamed_dir.iterdir() if p.is_dir()]
+    assert not [p for p in streamed_dir.parent.iterdir() if p.name.startswith(".")]
+
+
+def test_stream_case_gdc_to_fhir(tmp_path, distinct_cases):
+    cases_path = tmp_path / "cases.ndjson"
+    cases_path.write_text('\n'.join(json.dumps(c) for c in distinct_cases(2)))
+    listed_dir, streamed_dir = tmp_path / "listed", tmp_path / "streamed"
+    listed_dir.mkdir()
+    streamed_dir.mkdir()
+
+    entity2fhir.case_gdc_to_fhir_ndjson(out_dir=str(listed_dir), name='case', cases_path=str(cases_path),
+                                        convert=False, verbose=False)
+    entity2fhir.stream_case_gdc_to_fhir_ndjson(out_dir=str(streamed_dir), name='case', cases_path=str(cases_path),
+                                               convert=False, verbose=False)
+
+    assert sorted(p.name for p in streamed_dir.iterdir()) == sorted(p.name for p in listed_dir.iterdir())
+    for path in listed_dir.glob("*.ndjson"):
+        assert (streamed_dir / path.name).read_bytes() == path.read_bytes()
+
+
+def test_stream_case_gdc_to_fhir_keeps_last_resource(tmp_path, distinct_cases):
+    with open("./tests/fixtures/case/cases.ndjson") as f:
+        case = json.loads(f.readline())
+    # the same case exported again with updated values, after another case
+    updated = json.loads(json.dumps(case))
+    updated["diagnoses"][0]["age_at_diagnosis"] = 19029
+    cases_path = tmp_path / "cases.ndjson"
+    cases_path.write_text('\n'.join(json.dumps(c) for c in [case, distinct_cases(1)[0], updated]))
+    listed_dir, streamed_dir = tmp_path / "listed", tmp_path / "streamed"
+    listed_dir.mkdir()
+    streamed_dir.mkdir()
+
+    entity2fhir.case_gdc_to_fhir_ndjson(out_dir=str(listed_dir), name='case', cases_path=str(cases_path),
+                                        convert=False, verbose=False)
+    counts = entity2fhir.stream_case_gdc_to_fhir_ndjson(out_dir=str(streamed_dir), name='case',
+                                                        cases_path=str(cases_path), convert=False, verbose=False)
+
+    assert sorted(p.name for p in streamed_dir.iterdir()) == sorted(p.name for p in listed_dir.iterdir())
+    for path in listed_dir.glob("*.ndjson"):
+        assert (streamed_dir / path.name).read_bytes() == path.read_bytes()
+        assert counts[path.stem] == len(utils.load_ndjson(str(path)))
+    conditions = utils.load_ndjson(str(streamed_dir / "Condition.ndjson"))
+    assert len(conditions) == 2
+    assert conditions[0]["onsetAge"]["value"] == 19029
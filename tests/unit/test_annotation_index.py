@@ -0,0 +1,24 @@
+import pytest
+from fhirizer import utils
+
+
+@pytest.fixture(params=['case/disease_types', 'case/primary_sites', 'demographic/race', 'demographic/ethnicity',
+                        'demographic/gender', 'diagnosis/cancer_pathological_staging'])
+def index(request):
+    return utils.load_content_annotation_index(request.param)
+
+
+def test_lookups_match_scans(index):
+    annotations = index.annotations
+    queries = [a['value'] for a in annotations] + [a['value'][:4] for a in annotations] + ["Not a value", ""]
+    for q in queries:
+        assert index.find(q) == [a for a in annotations if q == a['value']]
+        assert index.find_containing(q) == [a for a in annotations if q in a['value']]
+        assert index.find_within(q) == [a for a in annotations if a['value'] in q]
+
+
+def test_index_shared(index):
+    assert utils.annotation_index(index.annotations) is index
+    assert utils.annotation_index(list(index.annotations)) is not index
+    assert utils.load_content_annotation_index('demographic/race') is \
+           utils.load_content_annotation_index('demographic/race')
@@ -0,0 +1,48 @@
+import gzip
+import shutil
+import pytest
+from fhirizer import mapping, utils
+
+
+@pytest.fixture(params=['case', 'file', 'project'])
+def name(request):
+    return request.param
+
+
+def convert(name, tmp_path):
+    out_path = tmp_path / f"{name}_keys.ndjson"
+    mapping.convert_maps(in_path=f"./tests/fixtures/{name}/{name}s.ndjson", out_path=str(out_path), name=name,
+                         convert=True, verbose=False)
+    return out_path.read_bytes()
+
+
+def test_stream_convert_maps(name, tmp_path):
+    out_path = tmp_path / f"{name}_keys_stream.ndjson"
+    mapping.stream_convert_maps(in_path=f"./tests/fixtures/{name}/{name}s.ndjson", out_path=str(out_path), name=name,
+                                verbose=False)
+    assert out_path.read_bytes() == convert(name, tmp_path)
+
+
+def test_stream_convert_maps_gz(name, tmp_path):
+    gz_path = tmp_path / f"{name}s.ndjson.gz"
+    with open(f"./tests/fixtures/{name}/{name}s.ndjson", 'rb') as f_in, gzip.open(gz_path, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+
+    out_path = tmp_path / f"{name}_keys_stream.ndjson"
+    mapping.stream_convert_maps(in_path=str(gz_path), out_path=str(out_path), name=name, verbose=False)
+    assert out_path.read_bytes() == convert(name, tmp_path)
+
+
+def test_convert_maps_workers(name, tmp_path):
+    out_path = tmp_path / f"{name}_keys_workers.ndjson"
+    mapping.convert_maps(in_path=f"./tests/fixtures/{name}/{name}s.ndjson", out_path=str(out_path), name=name,
+                         convert=True, verbose=False, workers=2)
+    assert out_path.read_bytes() == convert(name, tmp_path)
+
+
+def test_map_entities_keeps_order(name):
+    entities = list(utils.iter_ndjson(f"./tests/fixtures/{name}/{name}s.ndjson")) * 5
+    map_index = mapping.plan_map_index(mapping.get_mapping_plan(name))
+
+    serial = list(mapping.map_entities(entities, map_index))
+    assert list(mapping.map_entities(iter(entities), map_index, workers=2, chunk_size=1)) == serial
@@ -0,0 +1,111 @@
+import pytest
+import orjson
+from fhirizer import utils
+
+
+def observation(resource_id, status="final"):
+    return {"resourceType": "Observation", "id": resource_id, "status": status}
+
+
+def read_ids(path):
+    return [orjson.loads(line)["id"] for line in path.read_bytes().splitlines()]
+
+
+def test_append_matches_rewrite(tmp_path):
+    rewritten, appended = tmp_path / "rewritten", tmp_path / "appended"
+    for out_dir, append in [(rewritten, False), (appended, True)]:
+        out_dir.mkdir()
+        (out_dir / "Observation.ndjson").write_text('{"resourceType":"Observation","id":"a","status":"final"}')
+        utils.create_or_extend([observation("a", "amended"), observation("b")], folder_path=str(out_dir),
+                               append=append)
+        utils.create_or_extend([observation("b", "amended"), observation("c")], folder_path=str(out_dir),
+                               append=append)
+
+    assert (appended / "Observation.ndjson").read_bytes() == (rewritten / "Observation.ndjson").read_bytes()
+    assert (appended / "Observation.ndjson.idx").exists()
+    assert not (rewritten / "Observation.ndjson.tmp").exists()
+
+
+def test_append_only_writes_new_ids(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    assert utils.create_or_extend([observation("a"), observation("b")], folder_path=str(tmp_path), append=True) == 2
+    size = path.stat().st_size
+    assert utils.create_or_extend([observation("a"), observation("b")], folder_path=str(tmp_path), append=True) == 0
+    assert path.stat().st_size == size
+
+    with utils.NDJSONIdIndex(path) as index:
+        offset, length = index.get("b")
+        assert orjson.loads(path.read_bytes()[offset:offset + length]) == observation("b")
+        assert "c" not in index and len(index) == 2
+
+
+def test_index_recovers_interrupted_append_and_rewrites(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    utils.create_or_extend([observation("a")], folder_path=str(tmp_path), append=True)
+
+    # lines appended after the index was committed, the last one partially written
+    with open(path, 'ab') as file:
+        file.write(orjson.dumps(observation("b")) + b'\n' + b'{"resourceType": "Obs')
+    with utils.NDJSONIdIndex(path) as index:
+        assert "b" in index and len(index) == 2
+    assert read_ids(path) == ["a", "b"]
+
+    # file rewritten by another writer
+    path.write_bytes(orjson.dumps(observation("c")))
+    with utils.NDJSONIdIndex(path) as index:
+        assert "c" in index and "a" not in index
+
+
+def test_compact_removes_superseded(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    utils.create_or_extend([observation("a"), observation("b")], folder_path=str(tmp_path), append=True)
+    utils.create_or_extend([observation("a", "amended"), observation("c")], folder_path=str(tmp_path),
+                           update_existing=True, append=True)
+    assert read_ids(path) == ["a", "b", "a", "c"]
+
+    assert utils.compact_ndjson(path) == 1
+    assert [orjson.loads(line) for line in path.read_bytes().splitlines()] == [
+        observation("a", "amended"), observation("b"), observation("c")]
+    assert utils.create_or_extend([observation("d")], folder_path=str(tmp_path), append=True) == 1
+    assert read_ids(path) == ["a", "b", "c", "d"]
+
+
+@pytest.mark.parametrize("compression", ["gzip", None])
+def test_extend_rolled_and_compressed(tmp_path, compression):
+    # a case run with compressed, rolled over output, followed by a file run
+    utils.fhir_ndjson([observation(str(i)) for i in range(10)], str(tmp_path / "Observation.ndjson"),
+                      compression="gzip", max_bytes=200)
+    utils.configure_ndjson_output(compression=compression)
+    try:
+        assert utils.create_or_extend([observation("0", "amended"), observation("10")], folder_path=str(tmp_path),
+                                      append=True) == 1
+    finally:
+        utils.configure_ndjson_output()
+
+    suffix = ".gz" if compression else ""
+    assert utils.ndjson_paths(tmp_path / "Observation.ndjson") == [str(tmp_path / f"Observation.ndjson{suffix}")]
+    assert list(utils.iter_ndjson_parts(tmp_path / "Observation.ndjson")) == [observation(str(i)) for i in range(11)]
+
+
+def test_compact_rolled_and_compressed(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    utils.fhir_ndjson([observation(str(i)) for i in range(10)] + [observation("0", "amended")], str(path),
+                      compression="gzip", max_bytes=200)
+
+    assert utils.compact_ndjson(path) == 1
+    assert utils.ndjson_paths(path) == [str(tmp_path / "Observation.ndjson.gz")]
+    assert list(utils.iter_ndjson_parts(path)) == [observation("0", "amended")] + [observation(str(i))
+                                                                                  for i in range(1, 10)]
+
+
+def test_append_keep_index(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    utils.create_or_extend([observation("a")], folder_path=str(tmp_path), append=True, keep_index=False)
+    assert read_ids(path) == ["a"]
+    assert not (tmp_path / "Observation.ndjson.idx").exists()
+
+    with utils.NDJSONIdIndex(path):
+        pass
+    utils.create_or_extend([observation("b")], folder_path=str(tmp_path), append=True, keep_index=False)
+    assert read_ids(path) == ["a", "b"]
+    assert (tmp_path / "Observation.ndjson.idx").exists()
@@ -0,0 +1,45 @@
+import gzip
+import json
+from fhirizer import crosswalk, utils
+
+
+def test_ncit2mondo_matches_records():
+    records = utils.ncit2mondo(str(crosswalk.NCIT2MONDO_PATH))
+    ncit2mondo = crosswalk.load_ncit2mondo()
+
+    for ncit_id in {r["ncit_id"] for r in records}:
+        assert ncit2mondo.get(ncit_id) == [r["mondo_id"] for r in records if r["ncit_id"] == ncit_id]
+    assert ncit2mondo.get("not an NCIt id") == []
+
+    batch = ncit2mondo.batch(["C26691", "not an NCIt id"])
+    assert batch == {"C26691": ncit2mondo.get("C26691"), "not an NCIt id": []}
+
+
+def test_crosswalk_cache_rebuilds_on_change(tmp_path, monkeypatch):
+    monkeypatch.setenv(utils.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    path = tmp_path / "ncit2mondo.json.gz"
+    records = [{"ncit_id": "C1", "mondo_id": "MONDO_1"}, {"ncit_id": "C1", "mondo_id": "MONDO_2"}]
+    path.write_bytes(gzip.compress(json.dumps(records).encode()))
+
+    assert crosswalk.load_ncit2mondo(path).get("C1") == ["MONDO_1", "MONDO_2"]
+    cache_path = utils.cache_path(path, ".crosswalk.pickle")
+    assert cache_path.parent == tmp_path / "cache" and cache_path.exists()
+
+    # the in-process Crosswalk is returned without reading the source file
+    monkeypatch.setattr(crosswalk.gzip, "decompress", None)
+    assert crosswalk.load_ncit2mondo(path).get("C1") == ["MONDO_1", "MONDO_2"]
+    # so is the cached one of a new process
+    crosswalk._crosswalks.clear()
+    assert crosswalk.load_ncit2mondo(path).get("C1") == ["MONDO_1", "MONDO_2"]
+    monkeypatch.undo()
+    monkeypatch.setenv(utils.CACHE_DIR_ENV, str(tmp_path / "cache"))
+
+    records.append({"ncit_id": "C2", "mondo_id": "MONDO_3"})
+    path.write_bytes(gzip.compress(json.dumps(records).encode()))
+    crosswalk._crosswalks.clear()
+    assert crosswalk.load_ncit2mondo(path).batch(["C1", "C2"]) == {"C1": ["MONDO_1", "MONDO_2"], "C2": ["MONDO_3"]}
+
+    # a cache that can't be unpickled is rebuilt
+    cache_path.write_bytes(b"cmissingmodule\nCrosswalk\n.")
+    crosswalk._crosswalks.clear()
+    assert crosswalk.load_ncit2mondo(path).get("C2") == ["MONDO_3"]
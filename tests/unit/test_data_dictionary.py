@@ -0,0 +1,49 @@
+import json
+from fhirizer import utils, mapping, entity2fhir
+
+
+def test_data_dictionary_shared():
+    data_dict = utils.get_data_dictionary()
+    assert data_dict == utils.load_data_dictionary(path=utils.DATA_DICT_PATH)
+    assert mapping.data_dict is data_dict
+    assert entity2fhir.data_dict is data_dict
+
+
+def test_data_dictionary_snapshot_rebuilds_on_change(tmp_path, monkeypatch):
+    monkeypatch.setenv(utils.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    path = "".join([str(tmp_path / "data_dictionary"), "/"])
+    (tmp_path / "data_dictionary" / "case").mkdir(parents=True)
+    (tmp_path / "data_dictionary" / "case" / "case.json").write_text(json.dumps({"id": "case"}))
+
+    assert utils.get_data_dictionary(path) == {"case": {"case": {"id": "case"}}}
+    snapshot_path = utils.cache_path(path, ".pickle")
+    assert snapshot_path.parent == tmp_path / "cache" and snapshot_path.exists()
+    assert not list(tmp_path.glob("*.pickle"))
+
+    # a new process reads the snapshot instead of the json files
+    utils._data_dictionaries.clear()
+    snapshot_path.write_bytes(snapshot_path.read_bytes().replace(b"case", b"snap"))
+    assert utils.get_data_dictionary(path) != {"case": {"case": {"id": "case"}}}
+
+    # changed json files are picked up by the next process
+    (tmp_path / "data_dictionary" / "case" / "demographic.json").write_text(json.dumps({"id": "demographic"}))
+    assert utils.get_data_dictionary(path) != {"case": {"case": {"id": "case"}, "demographic": {"id": "demographic"}}}
+    utils._data_dictionaries.clear()
+    assert utils.get_data_dictionary(path) == {"case": {"case": {"id": "case"}, "demographic": {"id": "demographic"}}}
+
+    # a snapshot that can't be unpickled ex. of a removed class is rebuilt
+    snapshot_path.write_bytes(b"cmissingmodule\nSnapshot\n.")
+    utils._data_dictionaries.clear()
+    assert utils.get_data_dictionary(path) == {"case": {"case": {"id": "case"}, "demographic": {"id": "demographic"}}}
+
+
+def test_unwritable_cache_reported_on_stderr(tmp_path, monkeypatch, capsys):
+    (tmp_path / "cache").write_text("not a directory")
+    monkeypatch.setenv(utils.CACHE_DIR_ENV, str(tmp_path / "cache"))
+    path = "".join([str(tmp_path / "data_dictionary"), "/"])
+    (tmp_path / "data_dictionary" / "case").mkdir(parents=True)
+    (tmp_path / "data_dictionary" / "case" / "case.json").write_text(json.dumps({"id": "case"}))
+
+    assert utils.get_data_dictionary(path) == {"case": {"case": {"id": "case"}}}
+    captured = capsys.readouterr()
+    assert captured.out == "" and "was not saved" in captured.err
@@ -0,0 +1,28 @@
+import glob
+import json
+import pytest
+from pathlib import Path
+from fhirizer import entity2fhir, mapping, utils
+
+
+def ndjson(entities):
+    return '\n'.join(json.dumps(e, ensure_ascii=False) for e in entities)
+
+
+@pytest.fixture(scope="module")
+def case_resources():
+    cases = mapping.convert_maps(in_path="./tests/fixtures/case/cases.ndjson", out_path=None, name='case',
+                                 convert=False, verbose=False)
+    return entity2fhir.case_resources([entity2fhir.assign_fhir_for_case(c, validate=False) for c in cases])
+
+
+def test_finalize_case_resources_matches_round_trips(case_resources, round_trip_clean_resources):
+    for entity_name, entities in case_resources.items():
+        assert ndjson(utils.clean_resources(entities, resource_type=entity_name)) == \
+               ndjson(round_trip_clean_resources(entities)), entity_name
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob("./tests/fixtures/case/META/*.ndjson")), ids=lambda p: Path(p).stem)
+def test_finalize_meta_matches_round_trips(path, round_trip_clean_resources):
+    entities = utils.load_ndjson(path)
+    assert ndjson(utils.clean_resources(entities)) == ndjson(round_trip_clean_resources(entities))
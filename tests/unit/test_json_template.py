@@ -0,0 +1,22 @@
+import copy
+import pytest
+from fhirizer import entity2fhir, utils
+
+
+@pytest.fixture(params=['biospecimen_observation', 'biospecimen_imaging_observation',
+                        'social_histody_smoking_observation', 'social_histody_alcohol_observation',
+                        'diagnosis_survey', 'file_observation'])
+def template(request):
+    return getattr(entity2fhir, request.param)
+
+
+def test_build_matches_deepcopy(template):
+    json_template = utils.JSONTemplate(template)
+    observation = json_template.build()
+    assert observation == copy.deepcopy(template)
+
+    observation['id'] = 'changed'
+    if 'focus' in observation:
+        observation['focus'].append({'reference': 'Specimen/changed'})
+    assert json_template.build() == template
+    assert observation != template
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+
+def test_nothing_loaded_at_import():
+    script = ("import sys; from fhirizer import cli, entity2fhir, mapping; "
+              "print([n for r in (entity2fhir.resources, mapping.resources) for n in r if r.is_loaded(n)], "
+              "[m for m in ('pandas', 'icd10', 'gen3_tracker.common', 'fhirizer.icgc2fhir') if m in sys.modules])")
+    result = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True)
+    assert result.stdout.strip() == "[] []"
+
+
+def test_resources_load_once():
+    from fhirizer import entity2fhir
+    assert entity2fhir.resources.gender_index is entity2fhir.gender_index
+    assert entity2fhir.resources.is_loaded("gender_index")
+    assert entity2fhir.gender is entity2fhir.gender_index.annotations
+
+
+def test_icd10_loaded_once():
+    import icd10
+    from fhirizer import entity2fhir
+    assert entity2fhir.resources.icd10 is icd10
+    assert entity2fhir.resources.icd10.find("C50.9").description
@@ -0,0 +1,18 @@
+import importlib.resources
+from pathlib import Path
+import pytest
+from fhirizer import utils
+
+
+@pytest.mark.parametrize("name", ["case", "file", "project"])
+def test_map_index_matches_linear_scan(name, linear_maps):
+    entities = utils.load_ndjson(f"./tests/fixtures/{name}/{name}s.ndjson")
+    schema = utils.load_schema_from_json(
+        path=str(Path(importlib.resources.files('fhirizer').parent / 'mapping' / f'{name}.json')))
+    keys = list(set().union(*[list(utils.extract_keys(e)) for e in entities]))
+    available_maps = [schema.find_map_by_source(k) for k in keys]
+    available_maps.append(schema.obj_mapping)
+
+    map_index, linear = utils.build_map_index(available_maps), linear_maps(available_maps)
+    assert [utils.map_data(e, map_index, verbose=False)['mapped_data'] for e in entities] == \
+           [utils.map_data(e, linear, verbose=False)['mapped_data'] for e in entities]
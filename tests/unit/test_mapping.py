@@ -1,5 +1,10 @@
+import gc
+import weakref
 import pytest
+import importlib.resources
+from pathlib import Path
 from pydantic import ValidationError
+from fhirizer import utils
 from fhirizer.schema import Schema, Source, Destination, Map, Metadata, Version
 
 
@@ -114,12 +119,28 @@ def test_find_and_update_values(example_schema):
     assert map_instance is not None
 
     # Update its values
-    # map_instance.update_values(source_name=source_name, source_values=source_values)
+    Map.update_values(source_name, source_values=source_values, schema=example_schema)
 
     # Check updates
-    # updated_source = map_instance.find_source(source_name=source_name)
-    # assert updated_source is not None
-    # assert updated_source.description == "Unique key of entity"
+    updated_source = Map.find_source(source_name, schema=example_schema)
+    assert updated_source is not None
+    assert updated_source.description == "Unique key of entity"
+
+    Map.update_values(source_name, source_values={"name": "id"}, schema=example_schema)
+    assert Map.find_source("id", schema=example_schema) is updated_source
+    assert Map.find_source(source_name, schema=example_schema) is None
+
+
+def test_find_and_update_values_without_schema():
+    map_instance = Map(source=Source(name="slide_id"), destination=Destination(name="Specimen.identifier"))
+    assert Map.find_source("slide_id") is map_instance.source
+
+    Map.update_values("slide_id", destination_values={"description": "Slide identifier"})
+    assert map_instance.destination.description == "Slide identifier"
+
+    Map.update_values("slide_id", source_values={"name": "slide_submitter_id"})
+    assert Map.find_source("slide_submitter_id") is map_instance.source
+    assert Map.find_source("slide_id") is None
 
 
 @pytest.mark.xfail
@@ -140,3 +161,62 @@ def test_invalid_schema():
                                      obj_mapping=Map(source=Source(name="case_id", description='UUID', type='object'))
                                      )
                               )
+
+
+def test_indexes_after_mutation(example_schema):
+    assert example_schema.find_map_by_source("case_id").destination.name == "Patient.identifier"
+
+    new_map = Map(source=Source(name="portion_id", type="object"),
+                  destination=Destination(name="Specimen.identifier", type="object"))
+    example_schema.mappings.append(new_map)
+    assert example_schema.find_map_by_source("portion_id") is new_map
+    assert example_schema.has_map_for_source("portion_id")
+    # last Map wins for duplicate names
+    assert example_schema.find_map_by_destination("Specimen.identifier") is new_map
+
+    example_schema.mappings.pop()
+    assert not example_schema.has_map_for_source("portion_id")
+    assert example_schema.find_map_by_destination("Specimen.identifier").source.name == "sample_id"
+
+    other_map = Map(source=Source(name="slide_id", type="object"),
+                    destination=Destination(name="Specimen.note", type="object"))
+    example_schema.mappings.append(new_map)
+    assert example_schema.has_map_for_source("portion_id")
+    example_schema.mappings.pop()
+    example_schema.mappings.append(other_map)
+    assert not example_schema.has_map_for_source("portion_id")
+    assert example_schema.find_map_by_source("slide_id") is other_map
+
+    example_schema.mappings.insert(0, new_map)
+    assert example_schema.find_map_by_source("portion_id") is new_map
+    example_schema.mappings[0] = other_map
+    assert not example_schema.has_map_for_source("portion_id")
+    del example_schema.mappings[0]
+    assert example_schema.find_map_by_source("slide_id") is other_map
+
+    example_schema.mappings = [new_map]
+    assert example_schema.has_map_for_destination("Specimen.identifier")
+    assert not example_schema.has_map_for_source("case_id")
+
+    new_map.source.name = "analyte_id"
+    example_schema.reindex()
+    assert example_schema.find_map_by_source("analyte_id") is new_map
+    assert not example_schema.has_map_for_source("portion_id")
+
+
+def test_maps_freed_with_schema():
+    path = str(Path(importlib.resources.files('fhirizer').parent / 'mapping' / 'project.json'))
+    refs = []
+
+    gc.disable()
+    try:
+        for _ in range(3):
+            schema = utils.load_schema_from_json(path=path)
+            assert Map.find_source(schema.mappings[-1].source.name, schema=schema)
+            assert Map.find_source(schema.mappings[-1].source.name) is schema.mappings[-1].source
+            refs.append(weakref.ref(schema.mappings[-1]))
+            del schema
+            # Maps aren't registered outside their Schema, reference counting alone frees them on reload
+            assert all(ref() is None for ref in refs)
+    finally:
+        gc.enable()
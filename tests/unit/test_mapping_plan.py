@@ -0,0 +1,94 @@
+import json
+import shutil
+import importlib.resources
+from pathlib import Path
+from fhirizer import mapping, utils
+
+
+def copy_schema(tmp_path, name='project'):
+    schema_path = tmp_path / f"{name}.json"
+    shutil.copy(Path(importlib.resources.files('fhirizer').parent / 'mapping' / f"{name}.json"), schema_path)
+    return schema_path
+
+
+def test_compile_schema_matches_schema_maps(tmp_path):
+    schema_path = copy_schema(tmp_path)
+    schema = utils.load_schema_from_json(str(schema_path))
+    plan = mapping.load_mapping_plan(schema_path)
+
+    assert (tmp_path / "project.plan.json").exists()
+    assert plan["obj_mapping"] == [schema.obj_mapping.source.name, schema.obj_mapping.destination.name]
+    for source_name, destination_name in plan["mappings"].items():
+        assert schema.find_map_by_source(source_name).destination.name == destination_name
+
+
+def test_plan_recompiles_on_schema_change(tmp_path):
+    schema_path = copy_schema(tmp_path)
+    plan = mapping.load_mapping_plan(schema_path)
+
+    with open(schema_path) as f:
+        schema = json.load(f)
+    schema["mappings"][-1]["destination"]["name"] = "ResearchStudy.changed"
+    with open(schema_path, "w") as f:
+        json.dump(schema, f, indent=4)
+
+    updated_plan = mapping.load_mapping_plan(schema_path)
+    assert updated_plan["schema_hash"] != plan["schema_hash"]
+    assert updated_plan["mappings"][schema["mappings"][-1]["source"]["name"]] == "ResearchStudy.changed"
+
+    with open(tmp_path / "project.plan.json") as f:
+        assert json.load(f)["schema_hash"] == updated_plan["schema_hash"]
+
+
+def record_keys_map_data(record, mappings, obj_mapping):
+    """Map selection by the record's own extracted keys."""
+    keys = set(utils.extract_keys(record))
+    available_maps = [(k, d) for k, d in mappings.items() if k in keys] + [obj_mapping]
+    return utils.map_data(record, available_maps, verbose=False)['mapped_data']
+
+
+def file_keys_map_data(records, mappings, obj_mapping):
+    """Baseline convert_maps Map selection by the key union of every record in the file."""
+    keys = set().union(*(utils.extract_keys(record) for record in records))
+    available_maps = [(k, d) for k, d in mappings.items() if k in keys] + [obj_mapping]
+    return [utils.map_data(record, available_maps, verbose=False)['mapped_data'] for record in records]
+
+
+SYNTHETIC_PLAN = {"schema_hash": "synthetic-paths", "obj_mapping": ["case", "Patient"],
+                  "mappings": {"a": "X", "a.c": "Synthetic.c", "a.b.c": "X.c", "s": "S", "s.s.t.u": "Synthetic.u",
+                               "s.t.u": "S.u"}}
+
+
+def test_plan_map_index_ignores_paths_absent_from_record():
+    # 'a.c' is looked up while traversing 'a.b' under the mapped parent 'a', but the record has no 'a.c' key
+    # 's.t.u' is looked up as a nested list prefix joined to the mapped parent's path
+    records = [{"a": {"b": {"c": 1}}, "s": {"t": [{"u": [{"v": 2}], "w": 3}]}},
+               {"a": {"b": {"c": 1}, "c": 2}}]
+
+    map_index = mapping.plan_map_index(SYNTHETIC_PLAN)
+    for record in records:
+        assert utils.map_data(record, map_index, verbose=False)['mapped_data'] == \
+               record_keys_map_data(record, SYNTHETIC_PLAN["mappings"], tuple(SYNTHETIC_PLAN["obj_mapping"]))
+
+
+def test_plan_map_index_is_independent_of_other_records():
+    # r2's 'a.c' key is in the file's key union, the baseline mapped r1 with its Map, a plan index doesn't
+    r1, r2 = {"a": {"b": {"c": 1}}}, {"a": {"b": {"c": 1}, "c": 2}}
+    mappings, obj_mapping = SYNTHETIC_PLAN["mappings"], tuple(SYNTHETIC_PLAN["obj_mapping"])
+    map_index = mapping.plan_map_index(SYNTHETIC_PLAN)
+
+    mapped = [utils.map_data(record, map_index, verbose=False)['mapped_data'] for record in [r1, r2]]
+    assert mapped == [utils.map_data(r1, map_index, verbose=False)['mapped_data'],
+                      record_keys_map_data(r2, mappings, obj_mapping)]
+    file_keys_mapped = file_keys_map_data([r1, r2], mappings, obj_mapping)
+    assert mapped[1] == file_keys_mapped[1]
+    assert mapped[0] != file_keys_mapped[0]
+
+
+def test_plan_map_index_matches_file_key_union_on_fixtures():
+    for name in ["case", "file", "project"]:
+        records = utils.load_ndjson(f"./tests/fixtures/{name}/{name}s.ndjson")
+        plan = mapping.get_mapping_plan(name)
+        map_index = mapping.plan_map_index(plan)
+        assert [utils.map_data(record, map_index, verbose=False)['mapped_data'] for record in records] == \
+               file_keys_map_data(records, plan["mappings"], tuple(plan["obj_mapping"]))
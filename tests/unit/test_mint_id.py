@@ -0,0 +1,59 @@
+import pandas as pd
+from uuid import uuid3, uuid5, NAMESPACE_DNS
+from fhir.resources.identifier import Identifier
+from fhirizer import utils
+
+NAMESPACE_GDC = uuid3(NAMESPACE_DNS, 'gdc.cancer.gov')
+SYSTEM = "https://gdc.cancer.gov/case_id"
+
+
+def test_mint_id_memoized():
+    identifier = Identifier(system=SYSTEM, value="mint-id-memoized", use="official")
+    expected = str(uuid5(NAMESPACE_GDC, f"GDC/Patient/{SYSTEM}|mint-id-memoized"))
+    misses = utils._mint_id_cached.cache_info().misses
+
+    for _ in range(3):
+        assert utils.mint_id(identifier=identifier, resource_type="Patient", project_id="GDC",
+                             namespace=NAMESPACE_GDC) == expected
+    assert utils._mint_id_cached.cache_info().misses == misses + 1
+    assert "cache hit rate" in utils.mint_id_cache_report()
+
+
+def test_mint_ids_batch():
+    values = ["a", "b", "a", "c", "b"]
+    expected = [utils.mint_id(identifier=Identifier(system=SYSTEM, value=v), resource_type="Specimen",
+                              project_id="GDC", namespace=NAMESPACE_GDC) for v in values]
+
+    assert utils.mint_ids(values, resource_type="Specimen", system=SYSTEM, project_id="GDC",
+                          namespace=NAMESPACE_GDC) == expected
+
+    column = pd.Series(values, index=[10, 11, 12, 13, 14])
+    minted = utils.mint_ids(column, resource_type="Specimen", system=SYSTEM, project_id="GDC", namespace=NAMESPACE_GDC)
+    assert list(minted) == expected
+    assert list(minted.index) == [10, 11, 12, 13, 14]
+
+
+def test_mint_ids_column_without_missing_ids():
+    column = pd.Series(["a", None, 7, float("nan")], index=[10, 11, 12, 13])
+    df = pd.DataFrame({"icgc_donor_id": column})
+    df["patient_mintid"] = utils.mint_ids(df["icgc_donor_id"].dropna().astype(str), resource_type="Patient",
+                                          system=SYSTEM, project_id="GDC", namespace=NAMESPACE_GDC)
+
+    assert list(df["patient_mintid"].isna()) == [False, True, False, True]
+    assert df["patient_mintid"][12] == utils.mint_id(identifier=Identifier(system=SYSTEM, value="7"),
+                                                     resource_type="Patient", project_id="GDC",
+                                                     namespace=NAMESPACE_GDC)
+
+
+def test_htan_patient_id():
+    from types import SimpleNamespace
+    from fhirizer import htan2fhir
+
+    transformer = SimpleNamespace(SYSTEM_HTAN='https://data.humantumoratlas.org', project_id="HTAN-OHSU",
+                                  NAMESPACE_HTAN=uuid3(NAMESPACE_DNS, 'https://data.humantumoratlas.org'))
+    misses = utils._mint_id_cached.cache_info().misses
+    for participant_id in ["HTA9_1", "HTA9_1"]:
+        assert htan2fhir.HTANTransformer.get_patient_id(transformer, participant_id) == utils.mint_id(
+            identifier=Identifier(system=transformer.SYSTEM_HTAN, value=participant_id), resource_type="Patient",
+            project_id=transformer.project_id, namespace=transformer.NAMESPACE_HTAN)
+    assert utils._mint_id_cached.cache_info().misses == misses + 1
@@ -0,0 +1,88 @@
+import pytest
+import orjson
+from fhirizer import utils
+
+
+def observations(n, status="final"):
+    return [{"resourceType": "Observation", "id": str(i), "status": status} for i in range(n)]
+
+
+def test_writer_index_and_reader(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    with utils.NDJSONWriter(path, index=True, max_bytes=200, buffer_size=64) as writer:
+        for observation in observations(10) + [{"resourceType": "Observation", "id": "3", "status": "amended"}]:
+            writer.write(observation)
+
+    assert len(writer.paths) > 1
+    # a rolled over part alone
+    for part_path in writer.paths[1:]:
+        with utils.NDJSONReader(part_path) as reader:
+            assert len(reader) == len({r["id"] for r in utils.load_ndjson(part_path)})
+    # the file and its parts, the amended resource from the latest part
+    with utils.NDJSONReader(path) as reader:
+        resources = {resource_id: reader[resource_id] for resource_id in reader.ids()}
+    assert resources == {o["id"]: o for o in observations(10) + [{"resourceType": "Observation", "id": "3",
+                                                                  "status": "amended"}]}
+
+
+def test_reader_subset_and_stale_index(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    utils.fhir_ndjson(observations(5), str(path), index=True)
+    assert (tmp_path / "Observation.ndjson.idx").exists()
+
+    with utils.NDJSONReader(path) as reader:
+        assert list(reader.iter_ids(["4", "missing", "1"])) == [observations(5)[4], observations(5)[1]]
+        assert reader.get("missing") is None and "missing" not in reader
+
+    # lines appended by another writer are indexed on open
+    with open(path, 'ab') as file:
+        file.write(b'\n' + orjson.dumps({"resourceType": "Observation", "id": "5"}))
+    with utils.NDJSONReader(path) as reader:
+        assert reader["5"] == {"resourceType": "Observation", "id": "5"}
+
+    # a file without its .idx is indexed on open, in memory
+    unindexed = tmp_path / "Patient.ndjson"
+    utils.fhir_ndjson([{"resourceType": "Patient", "id": "a"}], str(unindexed))
+    with utils.NDJSONReader(unindexed) as reader:
+        assert reader["a"] == {"resourceType": "Patient", "id": "a"}
+    assert not (tmp_path / "Patient.ndjson.idx").exists()
+
+
+def test_reader_never_writes(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    utils.fhir_ndjson(observations(3), str(path), index=True)
+    # a line appended after the .idx was committed, and a writer mid-flush
+    with open(path, 'ab') as file:
+        file.write(b'\n' + orjson.dumps(observations(4)[3]) + b'\n{"resourceType": "Obs')
+    files = {p.name: p.read_bytes() for p in tmp_path.iterdir()}
+
+    with utils.NDJSONReader(path) as reader:
+        assert len(reader) == 4 and reader["3"] == observations(4)[3]
+    assert {p.name: p.read_bytes() for p in tmp_path.iterdir()} == files
+
+    # a read-only META
+    (tmp_path / "Observation.ndjson.idx").unlink()
+    tmp_path.chmod(0o555)
+    try:
+        with utils.NDJSONReader(path) as reader:
+            assert list(reader.ids()) == ["0", "1", "2", "3"]
+    finally:
+        tmp_path.chmod(0o755)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["Observation.ndjson"]
+
+
+def test_reader_spans_parts(tmp_path):
+    path = tmp_path / "Observation.ndjson"
+    utils.fhir_ndjson(observations(10), str(path), max_bytes=200)
+    assert len(utils.ndjson_paths(path)) > 1
+
+    with utils.NDJSONReader(path) as reader:
+        assert len(reader) == 10
+        assert sorted(reader.ids()) == sorted(o["id"] for o in observations(10))
+        assert list(reader.iter_ids(["9", "0"])) == [observations(10)[9], observations(10)[0]]
+
+    utils.fhir_ndjson(observations(10), str(path), compression="gzip")
+    with pytest.raises(ValueError):
+        utils.NDJSONReader(path)
+    with pytest.raises(FileNotFoundError):
+        utils.NDJSONReader(tmp_path / "Patient.ndjson")
@@ -0,0 +1,40 @@
+import json
+from fhirizer import utils
+
+
+def write_shard(shard_dir, resource_type, shard, resources):
+    shard_dir.mkdir(exist_ok=True)
+    with open(utils.shard_path(shard_dir, resource_type, shard), 'w', encoding='utf8') as file:
+        file.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in resources)
+
+
+def test_merge_keeps_first_position_last_resource(tmp_path):
+    shard_dir = tmp_path / "shards"
+    write_shard(shard_dir, "Observation", 0, [{"resourceType": "Observation", "id": "a", "status": "preliminary"},
+                                              {"resourceType": "Observation", "id": "b"},
+                                              {"resourceType": "Observation", "id": "c"}])
+    # shard 1 is missing, ex. a chunk of cases without Observations
+    write_shard(shard_dir, "Observation", 2, [{"resourceType": "Observation", "id": "d"},
+                                              {"resourceType": "Observation", "id": "a", "status": "final"},
+                                              {"id": "c"}])
+    shard_paths = [utils.shard_path(shard_dir, "Observation", shard) for shard in range(3)]
+    out_path = tmp_path / "Observation.ndjson"
+
+    assert utils.merge_ndjson_shards(shard_paths, out_path) == 3
+    assert [json.loads(line) for line in out_path.read_text().split('\n')] == [
+        {"resourceType": "Observation", "id": "a", "status": "final"},
+        {"resourceType": "Observation", "id": "b"},
+        {"resourceType": "Observation", "id": "d"}]
+
+
+def test_merge_without_dedup(tmp_path):
+    shard_dir = tmp_path / "shards"
+    write_shard(shard_dir, "Patient", 0, [{"resourceType": "Patient", "id": "a"}])
+    write_shard(shard_dir, "Patient", 1, [{"resourceType": "Patient", "id": "a"}])
+    out_path = tmp_path / "Patient.ndjson"
+    shard_paths = [utils.shard_path(shard_dir, "Patient", shard) for shard in range(2)]
+
+    assert utils.merge_ndjson_shards(shard_paths, out_path, dedup=False) == 2
+    assert utils.merge_ndjson_shards(shard_paths[:0], tmp_path / "Empty.ndjson") == 0
+    assert not (tmp_path / "Empty.ndjson").exists()
+
@@ -0,0 +1,76 @@
+import pytest
+from fhirizer import utils
+
+
+def test_writer_matches_fhir_ndjson(tmp_path):
+    resources = [{"resourceType": "Observation", "id": "a", "valueString": "ü"}, {"resourceType": "Observation", "id": "b"}]
+    utils.fhir_ndjson(resources, tmp_path / "expected.ndjson")
+    with utils.NDJSONWriter(tmp_path / "Observation.ndjson") as writer:
+        for resource in resources:
+            writer.write(resource)
+    assert writer.count == 2
+    assert (tmp_path / "Observation.ndjson").read_bytes() == (tmp_path / "expected.ndjson").read_bytes()
+
+    with utils.NDJSONWriter(tmp_path / "Empty.ndjson"):
+        pass
+    assert not (tmp_path / "Empty.ndjson").exists()
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_writer_compression_and_rolling(tmp_path, compression):
+    if compression == "zstd":
+        try:
+            utils._zstd()
+        except ImportError:
+            pytest.skip("zstd requires python >= 3.14 or zstandard")
+    resources = [{"resourceType": "Observation", "id": str(i), "valueString": "ü" * 50} for i in range(20)]
+    with utils.NDJSONWriter(tmp_path / "Observation.ndjson", compression=compression, compression_level=1,
+                            max_bytes=1000, buffer_size=64) as writer:
+        for resource in resources:
+            writer.write(resource)
+
+    suffix = utils.NDJSON_COMPRESSION_SUFFIXES[compression]
+    assert writer.path == str(tmp_path / f"Observation.ndjson{suffix}")
+    assert writer.paths[1] == str(tmp_path / f"Observation.part-0001.ndjson{suffix}")
+    assert len(writer.paths) > 2
+    assert [r for path in writer.paths for r in utils.iter_ndjson(path)] == resources
+
+
+def test_configured_ndjson_output(tmp_path):
+    with pytest.raises(ValueError):
+        utils.configure_ndjson_output(compression="bz2")
+    utils.configure_ndjson_output(compression="gzip")
+    try:
+        utils.fhir_ndjson([{"resourceType": "Patient", "id": "a"}], str(tmp_path / "Patient.ndjson"))
+        utils.fhir_ndjson([{"resourceType": "Patient", "id": "b"}], str(tmp_path / "Plain.ndjson"), compression=None)
+    finally:
+        utils.configure_ndjson_output()
+    assert list(utils.iter_ndjson(tmp_path / "Patient.ndjson.gz")) == [{"resourceType": "Patient", "id": "a"}]
+    assert (tmp_path / "Plain.ndjson").read_bytes() == b'{"resourceType": "Patient", "id": "b"}'
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_id_set(tmp_path, on_disk):
+    ids = utils.IdSet(path=str(tmp_path / "ids.sqlite") if on_disk else None)
+    assert ids.add("Observation/a")
+    assert not ids.add("Observation/a")
+    assert ids.add("Specimen/a")
+    assert "Observation/a" in ids
+    assert "Observation/b" not in ids
+    assert len(ids) == 2
+    ids.close()
+
+
+def test_writer_removes_stale_parts(tmp_path):
+    resources = [{"resourceType": "Observation", "id": str(i)} for i in range(20)]
+    utils.fhir_ndjson(resources, str(tmp_path / "Observation.ndjson"), max_bytes=200)
+    utils.fhir_ndjson(resources[:2], str(tmp_path / "Observation.ndjson"), compression="gzip")
+    assert utils.ndjson_paths(tmp_path / "Observation.ndjson") == [str(tmp_path / "Observation.ndjson.gz")]
+    assert list(utils.iter_ndjson_parts(tmp_path / "Observation.ndjson")) == resources[:2]
+
+    utils.fhir_ndjson([], str(tmp_path / "Observation.ndjson"))
+    assert utils.ndjson_paths(tmp_path / "Observation.ndjson") == [str(tmp_path / "Observation.ndjson")]
+    # other resource types sharing a prefix are kept
+    utils.fhir_ndjson(resources, str(tmp_path / "ObservationDefinition.ndjson"))
+    utils.fhir_ndjson(resources, str(tmp_path / "Observation.ndjson"))
+    assert list(utils.iter_ndjson_parts(tmp_path / "ObservationDefinition.ndjson")) == resources
@@ -0,0 +1,57 @@
+from fhir.resources.specimen import Specimen
+from fhirizer import entity2fhir, mapping, utils
+
+
+def test_contains_matches_list():
+    observations = [{"id": "a", "valueString": "1"}, {"id": "a", "valueString": "2"}, {"id": "b"},
+                    {"id": "a", "valueString": "1"}, {"valueString": "no id"}, {"valueString": "no id"}]
+    indexed, scanned = utils.ResourceList(), []
+    for observation in observations:
+        assert (observation in indexed) == (observation in scanned)
+        if observation not in indexed:
+            indexed.append(observation)
+        if observation not in scanned:
+            scanned.append(observation)
+    assert indexed == scanned
+    assert indexed + [{"id": "c"}] == scanned + [{"id": "c"}]
+
+
+def test_specimen_exists():
+    specimens = utils.ResourceList([Specimen(id="sample-1"), Specimen(id="sample-2")])
+    assert Specimen(id="sample-1") in specimens
+    assert Specimen(id="sample-3") not in specimens
+    assert entity2fhir.specimen_exists("sample-2", specimens)
+    assert not entity2fhir.specimen_exists("sample-3", specimens)
+    assert entity2fhir.specimen_exists("sample-2", list(specimens))
+
+
+def test_assign_fhir_for_case_matches_list_scans(monkeypatch, aliquoted_case, scanned_resource_list):
+    map_index = mapping.plan_map_index(mapping.get_mapping_plan("case"))
+    case = utils.map_data(aliquoted_case(20), map_index, verbose=False)["mapped_data"]
+
+    fhir_case = entity2fhir.assign_fhir_for_case(case)
+    with monkeypatch.context() as m:
+        m.setattr(utils, "ResourceList", scanned_resource_list)
+        scanned_case = entity2fhir.assign_fhir_for_case(case)
+    assert len(fhir_case["specimens"]) >= 20
+    for key in ["specimens", "observations"]:
+        assert [r.id for r in fhir_case[key]] == [r.id for r in scanned_case[key]]
+
+
+def test_guarded_observation_appends_match_list():
+    observations = []
+    for a in range(50):
+        observation = entity2fhir.biospecimen_observation_template.build()
+        observation["id"] = f"aliquot-observation-{a}"
+        observation["specimen"] = {"reference": f"Specimen/aliquot-{a}"}
+        observations.append(observation)
+    observations = observations + observations[::2]
+
+    indexed, scanned = utils.ResourceList(), []
+    for observation in observations:
+        if observation not in indexed:
+            indexed.append(observation)
+        if observation not in scanned:
+            scanned.append(observation)
+    assert list(indexed) == scanned
+    assert len(scanned) == 50
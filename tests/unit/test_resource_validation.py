@@ -0,0 +1,108 @@
+import os
+import json
+import glob
+import uuid
+import pytest
+from fhirizer import utils
+
+
+@pytest.fixture
+def resources():
+    return [r for path in sorted(glob.glob("./tests/fixtures/case/META/*.ndjson")) for r in utils.load_ndjson(path)]
+
+
+def test_validation_modes():
+    assert utils.ResourceValidation("full").rate == 1.0
+    assert utils.ResourceValidation("none").rate == 0.0
+    assert utils.ResourceValidation("sample:0.25").rate == 0.25
+    for mode in ["sample", "sample:x", "sample:1.5", "partial"]:
+        with pytest.raises(ValueError):
+            utils.ResourceValidation(mode)
+
+
+def test_sample_is_deterministic(resources):
+    sampled = [utils.ResourceValidation("sample:0.3").should_validate(r) for r in resources]
+    assert sampled == [utils.ResourceValidation("sample:0.3").should_validate(r) for r in resources]
+    assert 0 < sum(sampled) < len(resources)
+
+
+@pytest.mark.parametrize("mode", ["full", "sample:0.3", "none"])
+def test_clean_resources_report(resources, mode):
+    validation = utils.ResourceValidation(mode)
+    cleaned = utils.clean_resources(resources, validation=validation)
+    assert cleaned == utils.clean_resources(resources)
+    assert sum(validation.total.values()) == len(resources)
+    assert sum(validation.checked.values()) == sum(validation.should_validate(r) for r in resources)
+    assert "Observation: " in validation.report()
+
+
+def test_invalid_resource_dropped():
+    invalid = {"resourceType": "Observation", "id": "invalid", "status": "not-a-status"}
+    assert utils.clean_resources([invalid], validation=utils.ResourceValidation("full")) == []
+
+
+# content annotation table keys that are not codes
+TEXT_KEYS = {"value", "description", "description_url", "annotation_url", "annotation_type"}
+CONTENT_ANNOTATIONS = sorted(glob.glob("./resources/gdc_resources/content_annotations/**/*.json", recursive=True))
+
+
+def annotation_resources(path):
+    """
+    FHIR resources built from a content annotation file, the resource templates as they are and each annotation table
+    entry's values as the codings and strings they become ex. {'system': ..., 'code': sctid, 'display': value}
+    """
+    with open(path) as f:
+        annotation = json.load(f)
+    if isinstance(annotation, dict):
+        # templates are written with a minted id
+        return [dict(annotation, id=str(uuid.uuid5(uuid.NAMESPACE_DNS, annotation["id"])))]
+
+    name = os.path.basename(path).replace(".json", "")
+    resources = []
+    for i, entry in enumerate(annotation):
+        values = {k: str(v) for k, v in entry.items() if v not in (None, "") and not isinstance(v, (dict, list))}
+        resources.append({
+            "resourceType": "Observation", "id": f"{name.replace('_', '-')}-{i}", "status": "final",
+            "code": {"coding": [{"system": f"https://gdc.cancer.gov/{name}/{k}", "code": v,
+                                 "display": values.get("value", v)} for k, v in values.items() if k not in TEXT_KEYS],
+                     "text": values.get("value")},
+            "component": [{"code": {"text": k}, "valueString": v} for k, v in values.items()]})
+    return resources
+
+
+@pytest.mark.parametrize("path", CONTENT_ANNOTATIONS, ids=os.path.basename)
+def test_content_annotations_same_without_validation(path):
+    resources = annotation_resources(path)
+    validated = [utils.finalize_resource(r, validate=True) for r in resources]
+    assert [utils.finalize_resource(r, validate=False) for r in resources] == validated
+
+
+def test_htan_write_ndjson_validation(tmp_path):
+    from types import SimpleNamespace
+    from fhir.resources.patient import Patient
+    from fhirizer import htan2fhir
+
+    validation = utils.ResourceValidation("none")
+    transformer = SimpleNamespace(out_dir=str(tmp_path), validation=validation)
+    htan2fhir.HTANTransformer.write_ndjson(transformer, [Patient(id="htan-1"), Patient(id="htan-2")])
+
+    assert validation.total == {"Patient": 2} and validation.checked == {"Patient": 0}
+    assert utils.load_ndjson(str(tmp_path / "Patient.ndjson")) == [{"resourceType": "Patient", "id": "htan-1"},
+                                                                  {"resourceType": "Patient", "id": "htan-2"}]
+
+
+def test_icgc_validation_rejected():
+    from click.testing import CliRunner
+    from fhirizer import cli
+
+    result = CliRunner().invoke(cli.cli, ["generate", "--name", "icgc", "--icgc", "LICA-FR", "--validation", "none"])
+    assert result.exit_code == 2
+    assert "--validation is not supported for --name icgc" in result.output
+
+
+def test_normalize_utc_datetimes():
+    for effective, issued in [("2024-06-03T08:00:00+00:00", "2024-06-03T08:00:00+00:00"),
+                              ("2024-06-03T08:00:00-05:00", "2024-06-03T08:00:00Z"), ("2024-06-03", None)]:
+        resource = {"resourceType": "Observation", "status": "final", "code": {"text": "x"},
+                    "effectiveDateTime": effective, "issued": issued}
+        assert utils.finalize_resource(resource, validate=False) == utils.finalize_resource(resource, validate=True)
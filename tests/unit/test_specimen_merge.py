@@ -0,0 +1,26 @@
+import pytest
+from fhirizer import utils, mapping
+
+
+@pytest.mark.parametrize("n_aliquots", [1, 10, 50])
+def test_specimen_merge_matches_append_data_to_key(n_aliquots, monkeypatch, synthetic_case,
+                                                   appended_process_nested_list):
+    case = synthetic_case(n_aliquots)
+    map_index = mapping.plan_map_index(mapping.get_mapping_plan("case"))
+
+    merged = utils.map_data(case, map_index, verbose=False)['mapped_data']
+    with monkeypatch.context() as m:
+        m.setattr(utils, "process_nested_list", appended_process_nested_list)
+        appended = utils.map_data(case, map_index, verbose=False)['mapped_data']
+    assert merged == appended
+
+
+def test_fixture_cases_merge_matches_append_data_to_key(monkeypatch, appended_process_nested_list):
+    cases = utils.load_ndjson("./tests/fixtures/case/cases.ndjson")
+    map_index = mapping.plan_map_index(mapping.get_mapping_plan("case"))
+
+    merged = [utils.map_data(case, map_index, verbose=False)['mapped_data'] for case in cases]
+    with monkeypatch.context() as m:
+        m.setattr(utils, "process_nested_list", appended_process_nested_list)
+        appended = [utils.map_data(case, map_index, verbose=False)['mapped_data'] for case in cases]
+    assert merged == appended
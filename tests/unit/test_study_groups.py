@@ -0,0 +1,51 @@
+import pytest
+import orjson
+from fhirizer import utils
+
+
+def test_study_groups(tmp_path, write_meta):
+    write_meta(tmp_path,
+               studies=[("s1", "TCGA-A"), ("s2", "TCGA-B"), ("s3", "TCGA-C")],
+               subjects=[("rs1", "s1", "p2"), ("rs2", "s2", "p1"), ("rs3", "s1", "p1"),
+                         ("rs4", "s1", "p-missing"), ("rs5", "s-missing", "p3"), ("rs6", "s1", "p3")],
+               # p3 repeated as in an appended META file
+               patients=["p1", "p2", "p3", "p3"])
+
+    groups = utils.study_groups(meta_path=str(tmp_path), out_path=str(tmp_path))
+
+    assert [group.identifier[0].value for group in groups] == ["TCGA-A/p2/p1/p3/p3", "TCGA-B/p1"]
+    assert [m.entity.reference for m in groups[0].member] == ["Patient/p2", "Patient/p1", "Patient/p3", "Patient/p3"]
+    assert groups[0].id == utils.create_researchstudy_group(
+        [utils.Reference(reference=f"Patient/{p}") for p in ["p2", "p1", "p3", "p3"]], study_name="TCGA-A",
+        project_id="GDC", namespace=utils.uuid3(utils.NAMESPACE_DNS, 'gdc.cancer.gov')).id
+    assert utils.load_ndjson(str(tmp_path / "Group.ndjson")) == [orjson.loads(g.model_dump_json()) for g in groups]
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_study_groups_reads_parts(tmp_path, compression, write_meta):
+    plain_dir, rolled_dir = tmp_path / "plain", tmp_path / "rolled"
+    meta = dict(studies=[("s1", "TCGA-A")], subjects=[(f"rs{i}", "s1", f"p{i}") for i in range(20)],
+                patients=[f"p{i}" for i in range(20)])
+    plain_dir.mkdir()
+    write_meta(plain_dir, **meta)
+    rolled_dir.mkdir()
+    utils.configure_ndjson_output(compression=compression, max_bytes=200)
+    try:
+        write_meta(rolled_dir, **meta)
+    finally:
+        utils.configure_ndjson_output()
+    assert len(utils.ndjson_paths(rolled_dir / "Patient.ndjson")) > 1
+
+    groups = utils.study_groups(meta_path=str(rolled_dir), out_path=str(rolled_dir))
+    assert [m.entity.reference for m in groups[0].member] == [f"Patient/p{i}" for i in range(20)]
+    assert groups == utils.study_groups(meta_path=str(plain_dir), out_path=str(plain_dir))
+
+
+def test_study_groups_match_nested_loop(tmp_path, write_meta, nested_loop_study_groups):
+    write_meta(tmp_path,
+               studies=[(f"study-{i}", f"PROJECT-{i}") for i in range(5)],
+               subjects=[(f"subject-{i}", f"study-{(i * 7) % 5}", f"patient-{i}") for i in range(200)],
+               patients=[f"patient-{i}" for i in range(200) if i % 9])
+
+    groups = utils.study_groups(meta_path=str(tmp_path), out_path=str(tmp_path))
+    assert [g.model_dump_json() for g in groups] == [g.model_dump_json() for g in nested_loop_study_groups(tmp_path)]